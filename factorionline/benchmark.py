@@ -0,0 +1,355 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import statistics
+
+name = 'Benchmark' # For log
+
+
+STARTUP_SCRIPT = '''
+import time
+start = time.perf_counter()
+from factorionline.factorionline import Factorionline
+from factorionline.logger import Log
+from factorionline.events import Event
+imported = time.perf_counter()
+app = Factorionline(Log(debug=False))
+built = time.perf_counter()
+# Primer tick: el orquestador atiende un evento inocuo
+app.events.publish(Event.RETRY_ENTRY)
+app.handleEvent(app.events.get())
+tick = time.perf_counter()
+print(imported - start, built - start, tick - start)
+'''
+
+
+def startup (runs:int=5, top:int=10) -> dict:
+    """Mide el arranque en procesos nuevos: tiempo de import, de construir
+    `Factorionline` y hasta el primer tick del orquestador. También lista los
+    módulos más pesados según `python -X importtime`."""
+    samples = []
+    for _ in range(runs):
+        wall = time.perf_counter()
+        result = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], capture_output=True, text=True, check=True)
+        wall = time.perf_counter() - wall
+        samples.append([float(value) for value in result.stdout.split()] + [wall])
+
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import factorionline.factorionline'],
+        capture_output=True, text=True, check=True
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        modules.append((int(cumulative), module.strip()))
+    modules.sort(reverse=True)
+
+    report = {
+        'import': statistics.median(sample[0] for sample in samples),
+        'construct': statistics.median(sample[1] for sample in samples),
+        'first_tick': statistics.median(sample[2] for sample in samples),
+        'process': statistics.median(sample[3] for sample in samples),
+        'heaviest_imports': [(module, cumulative / 1e6) for cumulative, module in modules[:top]],
+    }
+    print(f'Import:         {report["import"]*1000:8.1f} ms')
+    print(f'Construct:      {report["construct"]*1000:8.1f} ms')
+    print(f'First tick:     {report["first_tick"]*1000:8.1f} ms')
+    print(f'Process total:  {report["process"]*1000:8.1f} ms')
+    for module, seconds in report['heaviest_imports']:
+        print(f'  {seconds*1000:8.1f} ms  {module}')
+    return report
+
+
+def makeSaves (root:str, files:int, size_mb:int) -> list:
+    """Crea `files` partidas sintéticas de `size_mb` MB con contenido aleatorio."""
+    os.makedirs(root, exist_ok=True)
+    paths = []
+    for i in range(files):
+        path = os.path.join(root, f'world-{i}.zip')
+        with open(path, 'wb') as file:
+            for _ in range(size_mb):
+                file.write(os.urandom(1024 * 1024))
+        paths.append(path)
+    return paths
+
+
+def mirror (files:int=4, size_mb:int=100) -> dict:
+    """Compara `rmtree`+`copytree` contra el mirror incremental sobre un set
+    de partidas de `files` x `size_mb` MB: sin cambios y con una partida modificada."""
+    from .mirror import mirror as incremental
+
+    def copytree (src, dst):
+        shutil.rmtree(dst, ignore_errors=True)
+        shutil.copytree(src, dst)
+
+    def timed (fn, *args) -> float:
+        start = time.perf_counter()
+        fn(*args)
+        return time.perf_counter() - start
+
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, 'src')
+        paths = makeSaves(src, files, size_mb)
+        for label, fn in (('rmtree+copytree', copytree), ('incremental', incremental)):
+            dst = os.path.join(tmp, label)
+            timed(fn, src, dst)
+            unchanged = timed(fn, src, dst)
+            with open(paths[0], 'r+b') as file:
+                file.write(os.urandom(4096))
+            changed = timed(fn, src, dst)
+            report[label] = {'unchanged': unchanged, 'one_changed': changed}
+    print(f'Save set: {files} x {size_mb} MB')
+    for label, times in report.items():
+        print(f'  {label:16} unchanged {times["unchanged"]*1000:9.1f} ms   one changed {times["one_changed"]*1000:9.1f} ms')
+    return report
+
+
+def makeHistory (path:str, commits:int, size_mb:int) -> None:
+    """Repo bare en `path` con `commits` snapshots de una partida de `size_mb` MB."""
+    work = path + '.work'
+    git = lambda *args: subprocess.run(['git', '-C', work, *args], check=True, capture_output=True)
+    os.makedirs(work)
+    git('init', '-q', '-b', 'main')
+    git('config', 'user.name', 'benchmark')
+    git('config', 'user.email', 'benchmark@factorionline')
+    for i in range(commits):
+        makeSaves(work, 1, size_mb)
+        git('add', '-A')
+        git('commit', '-q', '-m', f'snapshot {i}')
+    subprocess.run(['git', 'clone', '-q', '--bare', work, path], check=True, capture_output=True)
+    shutil.rmtree(work)
+
+
+def clone (lengths:tuple=(1, 10, 50), size_mb:int=5) -> dict:
+    """Tiempo y tamaño del clon completo contra el superficial según cuántos
+    snapshots tenga la historia."""
+    def timed_clone (url, dst, *args) -> tuple:
+        start = time.perf_counter()
+        subprocess.run(['git', 'clone', '-q', *args, url, dst], check=True, capture_output=True)
+        elapsed = time.perf_counter() - start
+        size = sum(os.path.getsize(os.path.join(dirpath, filename))
+                   for dirpath, _, filenames in os.walk(os.path.join(dst, '.git')) for filename in filenames)
+        return elapsed, size
+
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for length in lengths:
+            bare = os.path.join(tmp, f'history-{length}.git')
+            makeHistory(bare, length, size_mb)
+            # file:// para que git respete --depth en un clon local
+            url = 'file://' + bare.replace(os.sep, '/')
+            report[length] = {
+                'full': timed_clone(url, os.path.join(tmp, f'full-{length}')),
+                'shallow': timed_clone(url, os.path.join(tmp, f'shallow-{length}'), '--depth', '1'),
+            }
+    print(f'Snapshot size: {size_mb} MB')
+    for length, results in report.items():
+        (full, full_size), (shallow, shallow_size) = results['full'], results['shallow']
+        print(f'  {length:4} commits  full {full*1000:9.1f} ms {full_size/2**20:8.1f} MB   '
+              f'shallow {shallow*1000:9.1f} ms {shallow_size/2**20:8.1f} MB')
+    return report
+
+
+def evolve (data:bytearray, rng, edits:int) -> bytearray:
+    """Siguiente versión sintética de una partida: algunas zonas reescritas,
+    algunas inserciones (desplazan todo lo que sigue) y algo añadido al final."""
+    data = bytearray(data)
+    for _ in range(edits):
+        offset = rng.randrange(len(data))
+        if rng.random() < 0.5:
+            data[offset:offset + 4096] = rng.randbytes(4096)
+        else:
+            data[offset:offset] = rng.randbytes(rng.randrange(1, 512))
+    data += rng.randbytes(64 * 1024)
+    return data
+
+
+def chunks (versions:int=10, size_mb:int=50, edits:int=20) -> dict:
+    """Guarda una serie de versiones que evolucionan en un `ChunkStore` y
+    reporta deduplicación y velocidad. Compara con chunks de tamaño fijo,
+    que pierden todo lo que va detrás de una inserción."""
+    import random
+    import hashlib
+    from .chunkstore import ChunkStore
+
+    rng = random.Random(1)
+    data = bytearray(rng.randbytes(size_mb * 1024 * 1024))
+    fixed = {}
+    logical = 0
+    elapsed = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ChunkStore(os.path.join(tmp, 'store'))
+        path = os.path.join(tmp, 'world.zip')
+        for _ in range(versions):
+            with open(path, 'wb') as file:
+                file.write(data)
+            logical += len(data)
+            start = time.perf_counter()
+            store.put(path)
+            elapsed += time.perf_counter() - start
+            for offset in range(0, len(data), 64 * 1024):
+                chunk = bytes(data[offset:offset + 64 * 1024])
+                fixed[hashlib.sha256(chunk).digest()] = len(chunk)
+            data = evolve(data, rng, edits)
+        report = store.report()
+    fixed_stored = sum(fixed.values())
+    result = {
+        'versions': versions, 'logical_mb': logical / 2**20,
+        'cdc_stored_mb': report.stored_bytes / 2**20, 'cdc_ratio': report.ratio,
+        'fixed_stored_mb': fixed_stored / 2**20, 'fixed_ratio': logical / fixed_stored,
+        'throughput_mb_s': logical / 2**20 / elapsed,
+    }
+    print(f'{versions} versions of {size_mb} MB, {edits} edits each: {result["logical_mb"]:.1f} MB logical')
+    print(f'  content-defined  {result["cdc_stored_mb"]:9.1f} MB stored  ratio {result["cdc_ratio"]:5.2f}x  '
+          f'saved {result["logical_mb"] - result["cdc_stored_mb"]:9.1f} MB')
+    print(f'  fixed 64 KiB     {result["fixed_stored_mb"]:9.1f} MB stored  ratio {result["fixed_ratio"]:5.2f}x')
+    print(f'  chunking speed   {result["throughput_mb_s"]:9.1f} MB/s')
+    return result
+
+
+PROTOTYPES = (b'transport-belt', b'fast-transport-belt', b'inserter', b'fast-inserter', b'assembling-machine-2',
+              b'electric-mining-drill', b'stone-furnace', b'steel-chest', b'small-electric-pole', b'pipe',
+              b'underground-belt', b'splitter', b'iron-plate', b'copper-cable', b'electronic-circuit')
+
+
+def levelData (rng, size:int) -> bytes:
+    """Datos con la forma de un `level.dat` descomprimido: registros de
+    entidades con nombre de prototipo, posición cercana a la anterior,
+    dirección y algo de estado. Con bytes aleatorios no hay nada que comprimir."""
+    import struct
+    parts = []
+    total = 0
+    x = y = 0.0
+    while total < size:
+        prototype = rng.choice(PROTOTYPES)
+        x += rng.choice((0.5, 1.0, 1.0, 2.0, -30.0))
+        y += rng.choice((0.0, 0.0, 1.0, -1.0))
+        record = (struct.pack('<B', len(prototype)) + prototype + struct.pack('<ffBH', x, y, rng.randrange(8), rng.randrange(200))
+                  + bytes(rng.choice((0, 0, 0, 1, 2, 255)) for _ in range(rng.randrange(4, 24))))
+        parts.append(record)
+        total += len(record)
+    return b''.join(parts)[:size]
+
+
+def editLevel (data:bytes, rng, edits:int) -> bytes:
+    """Siguiente versión: algunas zonas con entidades nuevas y algunas inserciones."""
+    data = bytearray(data)
+    for _ in range(edits):
+        offset = rng.randrange(len(data))
+        if rng.random() < 0.5:
+            data[offset:offset + 4096] = levelData(rng, 4096)
+        else:
+            data[offset:offset] = levelData(rng, rng.randrange(1, 2048))
+    return bytes(data)
+
+
+def compression (versions:int=6, size_mb:int=20, edits:int=20, bandwidths:tuple=(2, 10, 50, 1000)) -> dict:
+    """Ratio y velocidad de zstd (con y sin diccionario entrenado con las
+    versiones anteriores) contra el zlib nivel 6 de git, sobre partidas
+    sintéticas enteras y sobre los payloads de delta entre versiones. Con
+    eso estima cuánto tarda la subida para cada ancho de banda (Mbit/s) y
+    qué nivel elige `Compressor`."""
+    import random
+    import zlib
+    from .compression import Compressor, zstd, PROFILES
+    from .transport import signature, delta
+
+    rng = random.Random(1)
+    history = [levelData(rng, size_mb * 1024 * 1024)]
+    for _ in range(versions - 1):
+        history.append(editLevel(history[-1], rng, edits))
+    full = history[-1]
+    payloads = [delta(new, signature(old)) or new for old, new in zip(history[-3:-1], history[-2:])]
+
+    def measure (compress) -> tuple:
+        start = time.perf_counter()
+        full_size = len(compress(full))
+        seconds = time.perf_counter() - start
+        delta_size = sum(len(compress(payload)) for payload in payloads)
+        return full_size / len(full), len(full) / 2**20 / seconds, delta_size / sum(map(len, payloads))
+
+    rows = [('zlib-6 (git)', *measure(lambda data: zlib.compress(data, 6)))]
+    rows += [(f'zlib-{level}', *measure(lambda data: zlib.compress(data, level))) for level in (1, 9)]
+    report = {'rows': rows, 'choices': {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        codec = Compressor(tmp)
+        if zstd():
+            for level, _, _ in PROFILES['zstd']:
+                compressor = codec.zstdCompressor(level)
+                rows.append((f'zstd-{level}', *measure(compressor.compress)))
+            samples = []
+            for index, version in enumerate(history[:-2]):
+                path = os.path.join(tmp, f'world-{index}.dat')
+                with open(path, 'wb') as file:
+                    file.write(version)
+                samples.append(path)
+            start = time.perf_counter()
+            dict_id = codec.train(samples)
+            report['train_seconds'] = time.perf_counter() - start
+            if dict_id:
+                for level in (1, 3, 9):
+                    compressor = codec.zstdCompressor(level, dict_id)
+                    rows.append((f'zstd-{level}+dict', *measure(compressor.compress)))
+        # Calibra el modelo con un par de compresiones reales antes de elegir
+        for payload in (full[:4 * 1024 * 1024], *payloads):
+            codec.compress(payload, codec.methods[0])
+        for mbit in bandwidths:
+            report['choices'][mbit] = codec.choose(mbit * 1e6 / 8)
+
+    print(f'{versions} versions of {size_mb} MB, {edits} edits each; deltas of {sum(map(len, payloads)) / 2**10:.0f} KiB')
+    print(f'  {"method":14} {"full ratio":>10} {"MB/s":>8} {"delta ratio":>12}   ' +
+          '  '.join(f'{mbit:>5} Mbit' for mbit in bandwidths))
+    for label, ratio, speed, delta_ratio in rows:
+        # Segundos hasta subir la partida entera: comprimir y mandar
+        upload = [size_mb / speed + size_mb * 8 * ratio / mbit for mbit in bandwidths]
+        print(f'  {label:14} {ratio:10.3f} {speed:8.1f} {delta_ratio:12.3f}   ' + '  '.join(f'{s:9.2f}s' for s in upload))
+    print('  adaptive level: ' + ', '.join(f'{mbit} Mbit -> {method}-{level}' for mbit, (method, level) in report['choices'].items()))
+    if 'train_seconds' in report:
+        print(f'  dictionary trained in {report["train_seconds"]:.2f}s')
+    return report
+
+
+def main():  # pragma: no cover
+    parser = argparse.ArgumentParser(description="Factorionline benchmarks")
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+    startup_parser = subparsers.add_parser('startup', help="Import time and time-to-first-tick")
+    startup_parser.add_argument("--runs", "-r", type=int, default=5, help="Fresh processes to measure")
+    mirror_parser = subparsers.add_parser('mirror', help="Incremental mirror against rmtree+copytree")
+    mirror_parser.add_argument("--files", "-f", type=int, default=4, help="Number of save files")
+    mirror_parser.add_argument("--size", "-s", type=int, default=100, help="Size of each save in MB")
+    clone_parser = subparsers.add_parser('clone', help="Full against shallow clone as history grows")
+    clone_parser.add_argument("--lengths", "-l", type=int, nargs='+', default=[1, 10, 50], help="History lengths to measure")
+    clone_parser.add_argument("--size", "-s", type=int, default=5, help="Size of each snapshot in MB")
+    chunks_parser = subparsers.add_parser('chunks', help="Chunk store dedup over a series of evolving saves")
+    chunks_parser.add_argument("--versions", "-v", type=int, default=10, help="Number of save versions")
+    chunks_parser.add_argument("--size", "-s", type=int, default=50, help="Size of the first version in MB")
+    chunks_parser.add_argument("--edits", "-e", type=int, default=20, help="Edits between versions")
+    compression_parser = subparsers.add_parser('compression', help="zstd levels and dictionary against git's zlib")
+    compression_parser.add_argument("--versions", "-v", type=int, default=6, help="Number of save versions")
+    compression_parser.add_argument("--size", "-s", type=int, default=20, help="Size of each save in MB")
+    compression_parser.add_argument("--edits", "-e", type=int, default=20, help="Edits between versions")
+    compression_parser.add_argument("--bandwidths", "-b", type=float, nargs='+', default=[2, 10, 50, 1000], help="Upload speeds in Mbit/s")
+    args = parser.parse_args()
+
+    match (args.benchmark):
+        case 'startup':
+            startup(args.runs)
+        case 'mirror':
+            mirror(args.files, args.size)
+        case 'clone':
+            clone(tuple(args.lengths), args.size)
+        case 'chunks':
+            chunks(args.versions, args.size, args.edits)
+        case 'compression':
+            compression(args.versions, args.size, args.edits, tuple(args.bandwidths))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+import os
+import sys
+import json
+import mmap
+import random
+import shutil
+import hashlib
+
+from dataclasses import dataclass, field
+
+name = 'ChunkStore' # For log
+MANIFEST_SUFFIX = '.chunks.json'
+WINDOW = 16
+BLOCK_SIZE = 8 * 1024 * 1024
+
+
+def gearTable () -> bytes:
+    """Mapea cada byte a 0 o 1, mitad y mitad, siempre igual entre clientes.
+    El 0 va a 0 para que las zonas vacías no generen cortes."""
+    values = [0] * 128 + [1] * 128
+    random.Random(0x5EED).shuffle(values)
+    zero = values.index(0)
+    values[0], values[zero] = values[zero], values[0]
+    return bytes(values)
+
+
+TABLE = gearTable()
+ANCHOR = b'\x01' * WINDOW
+
+
+def chunkBoundaries (data, min_size:int, max_size:int):
+    """Cortes content-defined de `data` (bytes o mmap). Se corta tras una
+    ventana de `WINDOW` bytes cuyo mapeo por `TABLE` es todo unos
+    (probabilidad 2^-16, unos 64 KiB de media), nunca antes de `min_size` ni
+    después de `max_size`. Como depende sólo del contenido, insertar bytes
+    sólo cambia los chunks de alrededor. `translate` y `find` corren en C,
+    no hay bucle por byte en Python."""
+    size = len(data)
+    start = 0
+    marks, marks_start = b'', 0
+    while start < size:
+        end = min(start + max_size, size)
+        if end - start <= min_size:
+            yield end
+            return
+        low = start + min_size - WINDOW
+        if low < marks_start or end > marks_start + len(marks):
+            marks_start = low
+            marks = data[low:max(end, low + BLOCK_SIZE)].translate(TABLE)
+        found = marks.find(ANCHOR, low - marks_start, end - marks_start)
+        start = end if found < 0 else marks_start + found + WINDOW
+        yield start
+
+
+@dataclass
+class ChunkManifest:
+    """Una versión de un archivo: su hash y la lista de `(hash, tamaño)` de sus chunks."""
+    name:str
+    size:int
+    sha256:str
+    mtime_ns:int
+    chunks:list = field(default_factory=list)
+
+    def dump (self) -> bytes:
+        return json.dumps({
+            'name': self.name, 'size': self.size, 'sha256': self.sha256, 'mtime_ns': self.mtime_ns,
+            'chunks': [f'{digest}:{size}' for digest, size in self.chunks],
+        }, indent=0).encode()
+
+    @classmethod
+    def load (cls, path:str) -> 'ChunkManifest':
+        with open(path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        chunks = [(digest, int(size)) for digest, size in (chunk.split(':') for chunk in data['chunks'])]
+        return cls(data['name'], data['size'], data['sha256'], data['mtime_ns'], chunks)
+
+
+
+@dataclass
+class DedupReport:
+    versions:int = 0
+    chunks:int = 0
+    unique_chunks:int = 0
+    # Lo que ocuparían todas las versiones enteras
+    logical_bytes:int = 0
+    # Lo que ocupan los chunks únicos en disco
+    stored_bytes:int = 0
+
+    @property
+    def ratio (self) -> float:
+        return self.logical_bytes / self.stored_bytes if self.stored_bytes else 1.0
+
+    @property
+    def saved_bytes (self) -> int:
+        return self.logical_bytes - self.stored_bytes
+
+
+
+class ChunkStore:
+    """Almacén de chunks direccionado por contenido.
+
+    `objects/ab/<sha256>` guarda cada chunk una sola vez y
+    `versions/<sha256>.json` el `ChunkManifest` de cada versión guardada.
+    Todo son archivos inmutables, así que se puede commitear tal cual: git
+    tampoco guarda dos veces un chunk repetido entre versiones."""
+    def __init__(self, root:str, min_size:int=16 * 1024, max_size:int=1024 * 1024):
+        self.root = root
+        self.min_size = min_size
+        self.max_size = max_size
+
+
+    def objectPath (self, digest:str) -> str:
+        return os.path.join(self.root, 'objects', digest[:2], digest[2:])
+
+
+    def versionPath (self, digest:str) -> str:
+        return os.path.join(self.root, 'versions', digest + '.json')
+
+
+    def writeOnce (self, path:str, data:bytes) -> bool:
+        """Escribe `path` si no existe. Retorna `True` si lo escribió."""
+        if os.path.exists(path):
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as file:
+            file.write(data)
+        os.replace(temp_path, path)
+        return True
+
+
+    def put (self, path:str, name:str=None) -> tuple:
+        """Trocea `path` y guarda los chunks nuevos. Retorna el
+        `ChunkManifest` y las rutas (relativas a `root`) que se escribieron."""
+        written = []
+        stat = os.stat(path)
+        sha = hashlib.sha256()
+        manifest = ChunkManifest(name or os.path.basename(path), stat.st_size, None, stat.st_mtime_ns)
+        with open(path, 'rb') as file:
+            if stat.st_size:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    start = 0
+                    for end in chunkBoundaries(data, self.min_size, self.max_size):
+                        chunk = data[start:end]
+                        sha.update(chunk)
+                        digest = hashlib.sha256(chunk).hexdigest()
+                        if self.writeOnce(self.objectPath(digest), chunk):
+                            written.append(os.path.relpath(self.objectPath(digest), self.root))
+                        manifest.chunks.append((digest, end - start))
+                        start = end
+        manifest.sha256 = sha.hexdigest()
+        if self.writeOnce(self.versionPath(manifest.sha256), manifest.dump()):
+            written.append(os.path.relpath(self.versionPath(manifest.sha256), self.root))
+        return manifest, written
+
+
+    def materialise (self, manifest:ChunkManifest, dst:str) -> None:
+        """Rearma el archivo en `dst` desde sus chunks, verificando el hash
+        completo antes de publicarlo con `os.replace`."""
+        sha = hashlib.sha256()
+        temp_path = dst + '.tmp'
+        with open(temp_path, 'wb') as target:
+            for digest, _ in manifest.chunks:
+                with open(self.objectPath(digest), 'rb') as source:
+                    chunk = source.read()
+                sha.update(chunk)
+                target.write(chunk)
+        if sha.hexdigest() != manifest.sha256:
+            os.remove(temp_path)
+            raise ValueError(f'Chunk store corrupted, {manifest.name} does not match its manifest')
+        os.utime(temp_path, ns=(manifest.mtime_ns, manifest.mtime_ns))
+        os.replace(temp_path, dst)
+
+
+    def report (self) -> DedupReport:
+        """Ahorro de todas las versiones guardadas contra guardarlas enteras."""
+        report = DedupReport()
+        unique = {}
+        versions_dir = os.path.join(self.root, 'versions')
+        if os.path.isdir(versions_dir):
+            for entry in os.scandir(versions_dir):
+                if not entry.name.endswith('.json'):
+                    continue
+                manifest = ChunkManifest.load(entry.path)
+                report.versions += 1
+                report.logical_bytes += manifest.size
+                report.chunks += len(manifest.chunks)
+                unique.update(manifest.chunks)
+        report.unique_chunks = len(unique)
+        report.stored_bytes = sum(unique.values())
+        return report
+
+
+
+def publish (repo_dir:str, saves_dir:str, store:ChunkStore) -> int:
+    """Deja en `saves_dir` las partidas de `repo_dir`: cada `*.chunks.json`
+    se rearma desde `store` si el archivo no coincide (tamaño y mtime), el
+    resto se copia. Borra lo que ya no está. Retorna cuántos archivos escribió."""
+    os.makedirs(saves_dir, exist_ok=True)
+    expected = set()
+    written = 0
+    for entry in os.scandir(repo_dir):
+        if not entry.is_file():
+            continue
+        if entry.name.endswith(MANIFEST_SUFFIX):
+            manifest = ChunkManifest.load(entry.path)
+            target = os.path.join(saves_dir, entry.name[:-len(MANIFEST_SUFFIX)])
+            wanted = (manifest.size, manifest.mtime_ns)
+            source = None
+        else:
+            target = os.path.join(saves_dir, entry.name)
+            stat = entry.stat()
+            wanted = (stat.st_size, stat.st_mtime_ns)
+            source = entry.path
+        expected.add(os.path.basename(target))
+        try:
+            stat = os.stat(target)
+            if (stat.st_size, stat.st_mtime_ns) == wanted:
+                continue
+        except FileNotFoundError:
+            pass
+        if source:
+            shutil.copy2(source, target + '.tmp')
+            os.replace(target + '.tmp', target)
+        else:
+            store.materialise(manifest, target)
+        written += 1
+    for entry in os.scandir(saves_dir):
+        if entry.name not in expected:
+            if entry.is_dir():
+                shutil.rmtree(entry.path)
+            else:
+                os.remove(entry.path)
+    return written
+
+
+def collect (saves_dir:str, repo_dir:str, store:ChunkStore, changed:list, removed:list) -> list:
+    """Guarda en `store` las partidas que cambiaron y escribe su manifiesto
+    en `repo_dir` como `<partida>.chunks.json`. Si el repo tenía el archivo
+    tal cual, se reemplaza. Retorna las rutas absolutas que cambiaron."""
+    touched = []
+    for relpath in changed:
+        manifest, written = store.put(os.path.join(saves_dir, relpath), os.path.basename(relpath))
+        touched += [os.path.join(store.root, path) for path in written]
+        target = os.path.join(repo_dir, relpath)
+        manifest_path = target + MANIFEST_SUFFIX
+        os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+        with open(manifest_path, 'wb') as file:
+            file.write(manifest.dump())
+        touched.append(manifest_path)
+        if os.path.exists(target):
+            os.remove(target)
+            touched.append(target)
+    for relpath in removed:
+        for path in (os.path.join(repo_dir, relpath) + MANIFEST_SUFFIX, os.path.join(repo_dir, relpath)):
+            if os.path.exists(path):
+                os.remove(path)
+                touched.append(path)
+    return touched
+
+
+def main():  # pragma: no cover
+    from .filemanager import factorionline_path
+    report = ChunkStore(os.path.join(sys.argv[1] if len(sys.argv) > 1 else factorionline_path, 'Chunks')).report()
+    print(f'Versions:      {report.versions}')
+    print(f'Chunks:        {report.chunks} ({report.unique_chunks} unique)')
+    print(f'Logical size:  {report.logical_bytes / 2**20:10.1f} MB')
+    print(f'Stored size:   {report.stored_bytes / 2**20:10.1f} MB')
+    print(f'Saved:         {report.saved_bytes / 2**20:10.1f} MB (ratio {report.ratio:.2f}x)')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+import os
+import time
+import zlib
+
+name = 'Compression' # For log
+MB = 1024 * 1024
+# Primer byte de cada payload comprimido
+HEADERS = {'none': b'N', 'zlib': b'Z', 'zstd': b'S'}
+METHODS = {header: method for method, header in HEADERS.items()}
+# (nivel, MB/s comprimiendo, tamaño final / original) medidos con `benchmark compression`
+# sobre partidas sintéticas. Sólo son el punto de partida: `Compressor` los escala con lo que mide
+PROFILES = {
+    'zstd': ((1, 170, 0.33), (3, 90, 0.325), (6, 42, 0.31), (9, 19, 0.30), (12, 10, 0.298), (19, 1, 0.28)),
+    'zlib': ((1, 45, 0.35), (6, 7.5, 0.31), (9, 2.2, 0.30)),
+}
+DEFAULT_LEVELS = {'zstd': 3, 'zlib': 6, 'none': 0}
+DICT_SIZE = 112 * 1024
+DICT_SUFFIX = '.dict'
+# Por debajo de esto no vale la pena comprimir ni medir velocidad
+MIN_SIZE = 256
+MIN_TIMED_SIZE = 64 * 1024
+
+
+def zstd ():
+    """`zstandard` si está instalado. Es opcional: sin él se usa zlib."""
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+
+class BandwidthMeter:
+    """Media móvil del ancho de banda efectivo de las transferencias, en
+    bytes/s. Las transferencias chicas se ignoran porque las domina la latencia."""
+    def __init__(self, alpha:float=0.3, min_bytes:int=MIN_TIMED_SIZE):
+        self.alpha = alpha
+        self.min_bytes = min_bytes
+        self.bandwidth = None
+
+
+    def record (self, size:int, seconds:float) -> None:
+        if size < self.min_bytes or seconds <= 0:
+            return
+        rate = size / seconds
+        self.bandwidth = rate if self.bandwidth is None else self.bandwidth + self.alpha * (rate - self.bandwidth)
+
+
+
+class Compressor:
+    """Compresión de los payloads del transporte con zstd (o zlib si no está
+    `zstandard`), eligiendo el nivel según el ancho de banda medido.
+
+    Para cada nivel estima el tiempo por byte: comprimir (`1 / velocidad`)
+    más subir lo que queda (`ratio / ancho de banda`), y elige el menor. Con
+    una conexión lenta conviene un nivel alto, en una red local ni comprimir.
+    Velocidad y ratio de `PROFILES` se escalan con cada compresión medida, así
+    se adaptan a la máquina y a lo que hay en las partidas.
+
+    Con `dictionary_dir` guarda ahí los diccionarios zstd entrenados con las
+    partidas anteriores (`<dict_id>.dict`) y comprime con el más nuevo. Cada
+    frame zstd lleva el id de su diccionario, el otro lado tiene que tenerlo."""
+    def __init__(self, dictionary_dir:str=None, alpha:float=0.2):
+        self.dictionary_dir = dictionary_dir
+        self.alpha = alpha
+        self.zstd = zstd()
+        self.methods = (['zstd'] if self.zstd else []) + ['zlib', 'none']
+        # Factores de velocidad y ratio medidos contra `PROFILES`, por método
+        self.scales = {method: [1.0, 1.0] for method in PROFILES}
+        # Veces seguidas que se eligió no comprimir; cada tanto se vuelve a medir
+        self.raw_streak = 0
+        self.dictionaries = {}
+        self.compressors = {}
+
+
+    def choose (self, bandwidth:float, methods:list=None) -> tuple:
+        """`(método, nivel)` para el `bandwidth` medido (bytes/s), entre los
+        `methods` que entiende el otro lado. Sin medida usa el nivel por defecto."""
+        methods = [method for method in self.methods if method in (methods or self.methods)]
+        compressed = [method for method in methods if method in PROFILES]
+        if not compressed:
+            return 'none', 0
+        if not bandwidth:
+            return compressed[0], DEFAULT_LEVELS[compressed[0]]
+        best, best_cost = ('none', 0), 1 / bandwidth
+        for method in compressed:
+            speed_scale, ratio_scale = self.scales[method]
+            for level, speed, ratio in PROFILES[method]:
+                cost = 1 / (speed * MB * speed_scale) + min(1.0, ratio * ratio_scale) / bandwidth
+                if cost < best_cost:
+                    best, best_cost = (method, level), cost
+        if best[0] == 'none':
+            self.raw_streak += 1
+            if self.raw_streak % 16 == 0:
+                # Los datos pueden haber vuelto a ser comprimibles
+                return compressed[0], PROFILES[compressed[0]][0][0]
+        else:
+            self.raw_streak = 0
+        return best
+
+
+    def learn (self, method:str, level:int, size:int, compressed_size:int, seconds:float) -> None:
+        profile = next((entry for entry in PROFILES[method] if entry[0] == level), None)
+        if not profile or size < MIN_SIZE:
+            return
+        scales = self.scales[method]
+        scales[1] += self.alpha * (compressed_size / size / profile[2] - scales[1])
+        if size >= MIN_TIMED_SIZE and seconds > 0:
+            scales[0] += self.alpha * (size / seconds / MB / profile[1] - scales[0])
+
+
+    def compress (self, data:bytes, method:str='zstd', level:int=None, dict_id:int=None) -> bytes:
+        """`data` comprimido, precedido del byte de su método."""
+        if method == 'zstd' and not self.zstd:
+            method = 'zlib'
+        if method == 'none' or len(data) < MIN_SIZE:
+            return HEADERS['none'] + data
+        level = DEFAULT_LEVELS[method] if level is None else level
+        start = time.perf_counter()
+        if method == 'zstd':
+            compressed = self.zstdCompressor(level, dict_id).compress(data)
+        else:
+            compressed = zlib.compress(data, level)
+        self.learn(method, level, len(data), len(compressed), time.perf_counter() - start)
+        return HEADERS[method] + compressed
+
+
+    def decompress (self, payload:bytes) -> bytes:
+        method, data = METHODS.get(payload[:1]), payload[1:]
+        match (method):
+            case 'none':
+                return data
+            case 'zlib':
+                try:
+                    return zlib.decompress(data)
+                except zlib.error as e:
+                    raise ValueError(f'Corrupted payload: {e}')
+            case 'zstd':
+                if not self.zstd:
+                    raise ValueError('Payload compressed with zstd but zstandard is not installed')
+                try:
+                    dict_id = self.zstd.get_frame_parameters(data).dict_id
+                    dictionary = self.dictionary(dict_id) if dict_id else None
+                    return self.zstd.ZstdDecompressor(dict_data=dictionary).decompress(data)
+                except self.zstd.ZstdError as e:
+                    raise ValueError(f'Corrupted payload: {e}')
+        raise ValueError(f'Unknown compression header {payload[:1]!r}')
+
+
+    def zstdCompressor (self, level:int, dict_id:int=None) -> 'zstandard.ZstdCompressor':
+        """Se reutilizan: preparar un diccionario cuesta más que comprimir un payload chico."""
+        key = (level, dict_id)
+        if key not in self.compressors:
+            dictionary = self.dictionary(dict_id) if dict_id else None
+            self.compressors[key] = self.zstd.ZstdCompressor(level=level, dict_data=dictionary)
+        return self.compressors[key]
+
+
+    def dictionaryPath (self, dict_id:int) -> str:
+        return os.path.join(self.dictionary_dir, f'{dict_id}{DICT_SUFFIX}')
+
+
+    def dictionaryIds (self) -> list:
+        """Ids de los diccionarios guardados, del más viejo al más nuevo."""
+        if not self.dictionary_dir or not os.path.isdir(self.dictionary_dir):
+            return []
+        entries = [entry for entry in os.scandir(self.dictionary_dir)
+                   if entry.name.endswith(DICT_SUFFIX) and entry.name[:-len(DICT_SUFFIX)].isdigit()]
+        entries.sort(key=lambda entry: entry.stat().st_mtime_ns)
+        return [int(entry.name[:-len(DICT_SUFFIX)]) for entry in entries]
+
+
+    @property
+    def current (self) -> int:
+        """Diccionario con el que se comprime, o `None`."""
+        if not self.zstd:
+            return None
+        ids = self.dictionaryIds()
+        return ids[-1] if ids else None
+
+
+    def dictionaryData (self, dict_id:int) -> bytes:
+        with open(self.dictionaryPath(dict_id), 'rb') as file:
+            return file.read()
+
+
+    def dictionary (self, dict_id:int) -> 'zstandard.ZstdCompressionDict':
+        if dict_id not in self.dictionaries:
+            try:
+                self.dictionaries[dict_id] = self.zstd.ZstdCompressionDict(self.dictionaryData(dict_id))
+            except (OSError, TypeError) as e:
+                raise ValueError(f'Missing compression dictionary {dict_id}: {e}')
+        return self.dictionaries[dict_id]
+
+
+    def addDictionary (self, dict_id:int, data:bytes) -> None:
+        """Guarda un diccionario entrenado acá o recibido del otro lado. Pasa a ser el actual."""
+        os.makedirs(self.dictionary_dir, exist_ok=True)
+        temp_path = self.dictionaryPath(dict_id) + '.tmp'
+        with open(temp_path, 'wb') as file:
+            file.write(data)
+        os.replace(temp_path, self.dictionaryPath(dict_id))
+
+
+    def needsTraining (self, max_age:float) -> bool:
+        if not self.zstd or not self.dictionary_dir:
+            return False
+        current = self.current
+        return current is None or time.time() - os.path.getmtime(self.dictionaryPath(current)) > max_age
+
+
+    def train (self, paths:list, sample_size:int=16 * 1024, max_bytes:int=8 * MB) -> int:
+        """Entrena un diccionario con muestras repartidas de los archivos de
+        `paths` y lo guarda. Salta lo que ya viene comprimido (zips, o
+        `level.dat` comprimidos) porque no le enseña nada. Retorna su id, o
+        `None` si no hubo muestras suficientes."""
+        if not self.zstd or not self.dictionary_dir:
+            return None
+        sizes = {path: os.path.getsize(path) for path in paths if os.path.isfile(path)}
+        total = sum(sizes.values())
+        if not total:
+            return None
+        # Fracción de cada archivo que se muestrea, para no pasar de max_bytes
+        step = max(sample_size, total * sample_size // max_bytes)
+        samples = []
+        for path, size in sizes.items():
+            with open(path, 'rb') as file:
+                for offset in range(0, size, step):
+                    file.seek(offset)
+                    sample = file.read(sample_size)
+                    if len(zlib.compress(sample, 1)) < len(sample) * 0.9:
+                        samples.append(sample)
+        if len(samples) < 8:
+            return None
+        try:
+            dictionary = self.zstd.train_dictionary(DICT_SIZE, samples)
+        except self.zstd.ZstdError:
+            return None
+        dict_id = dictionary.dict_id()
+        self.addDictionary(dict_id, dictionary.as_bytes())
+        self.dictionaries[dict_id] = dictionary
+        return dict_id
@@ -0,0 +1,267 @@
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+
+from contextlib import contextmanager
+
+from .storage import StorageBackend, StorageError, DirectoryBackend, S3Backend, LocalS3Client, GitBackend
+from .transport import listFiles
+
+name = 'Conformance' # For log
+
+
+class ConformanceError(Exception):
+    pass
+
+
+
+def expect (condition:bool, message:str) -> None:
+    if not condition:
+        raise ConformanceError(message)
+
+
+def writeTree (root:str, files:dict) -> None:
+    """Deja `root` con exactamente `files` (`{ruta: bytes}`)."""
+    if os.path.isdir(root):
+        shutil.rmtree(root)
+    for relpath, data in files.items():
+        path = os.path.join(root, *relpath.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(data)
+    os.makedirs(root, exist_ok=True)
+
+
+def sameTree (root:str, files:dict) -> bool:
+    if set(listFiles(root)) != set(files):
+        return False
+    for relpath, data in files.items():
+        with open(os.path.join(root, *relpath.split('/')), 'rb') as file:
+            if file.read() != data:
+                return False
+    return True
+
+
+FIRST = {'world.zip': os.urandom(300 * 1024), 'notes.txt': b'hello', 'empty.dat': b'', 'sub/level.dat': b'x' * 5000}
+SECOND = {'world.zip': FIRST['world.zip'][:1000] + os.urandom(1000) + FIRST['world.zip'][2000:], 'notes.txt': b'hello',
+          'empty.dat': b'', 'other.zip': os.urandom(2000)}
+
+
+# Cada check recibe un backend vacío y una carpeta temporal
+
+def checkEmpty (backend:StorageBackend, tmp:str) -> None:
+    expect(backend.head() is None, 'A new backend has a head')
+    expect(backend.listVersions() == [], 'A new backend lists versions')
+
+
+def checkRoundTrip (backend:StorageBackend, tmp:str) -> None:
+    src, dst = os.path.join(tmp, 'src'), os.path.join(tmp, 'dst')
+    writeTree(src, FIRST)
+    version = backend.put(src, None, 'first')
+    expect(backend.head() is None, 'put moved the head before compareAndSwap')
+    expect(backend.compareAndSwap(None, version.id), 'compareAndSwap from an empty head failed')
+    expect(backend.head() == version.id, 'head is not the published version')
+    changed = backend.fetch(version.id, dst)
+    expect(sameTree(dst, FIRST), 'fetched files differ from the ones put')
+    expect(sorted(changed) == sorted(FIRST), f'fetch reported {sorted(changed)} as changed')
+
+
+def checkIncremental (backend:StorageBackend, tmp:str) -> None:
+    src, dst = os.path.join(tmp, 'src'), os.path.join(tmp, 'dst')
+    writeTree(src, FIRST)
+    first = backend.put(src, None, 'first')
+    backend.compareAndSwap(None, first.id)
+    backend.fetch(first.id, dst)
+    writeTree(src, SECOND)
+    second = backend.put(src, first.id, 'second')
+    expect(backend.compareAndSwap(first.id, second.id), 'compareAndSwap from the current head failed')
+    changed = backend.fetch(second.id, dst)
+    expect(sameTree(dst, SECOND), 'incremental fetch left different files')
+    expected = {'world.zip', 'other.zip', 'sub/level.dat'}
+    expect(set(changed) == expected, f'fetch reported {sorted(changed)} as changed instead of {sorted(expected)}')
+    backend.fetch(first.id, dst)
+    expect(sameTree(dst, FIRST), 'fetching an older version did not restore it')
+
+
+def checkHistory (backend:StorageBackend, tmp:str) -> None:
+    src = os.path.join(tmp, 'src')
+    parent = None
+    ids = []
+    for index in range(3):
+        writeTree(src, {'world.zip': bytes([index]) * 1000})
+        version = backend.put(src, parent, f'version {index}')
+        expect(backend.compareAndSwap(parent, version.id), f'could not publish version {index}')
+        parent = version.id
+        ids.append(version.id)
+    versions = backend.listVersions()
+    expect([version.id for version in versions] == ids[::-1], 'listVersions is not newest first')
+    expect([version.parent for version in versions] == [ids[1], ids[0], None], 'parents do not chain')
+    expect([version.id for version in backend.listVersions(limit=2)] == ids[:0:-1], 'limit is not honoured')
+
+
+def checkConflict (backend:StorageBackend, tmp:str) -> None:
+    src = os.path.join(tmp, 'src')
+    writeTree(src, FIRST)
+    first = backend.put(src, None)
+    backend.compareAndSwap(None, first.id)
+    writeTree(src, SECOND)
+    second = backend.put(src, first.id)
+    stale = backend.put(src, None)
+    expect(not backend.compareAndSwap(None, stale.id), 'compareAndSwap from None succeeded over an existing head')
+    expect(not backend.compareAndSwap(stale.id, second.id), 'compareAndSwap from a wrong head succeeded')
+    expect(backend.head() == first.id, 'a failed compareAndSwap moved the head')
+
+
+def checkConcurrentSwap (backend:StorageBackend, tmp:str, clients:int=4) -> None:
+    """Varios clientes publican desde la misma base: gana exactamente uno."""
+    src = os.path.join(tmp, 'src')
+    writeTree(src, FIRST)
+    base = backend.put(src, None)
+    backend.compareAndSwap(None, base.id)
+    candidates = []
+    for index in range(clients):
+        writeTree(src, {'world.zip': bytes([index]) * 1000})
+        candidates.append(backend.put(src, base.id).id)
+    results = []
+    barrier = threading.Barrier(clients)
+
+    def publish (version_id:str) -> None:
+        barrier.wait()
+        try:
+            results.append((backend.compareAndSwap(base.id, version_id), version_id))
+        except StorageError as e:
+            results.append((e, version_id))
+
+    threads = [threading.Thread(target=publish, args=(version_id,)) for version_id in candidates]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    errors = [result for result, _ in results if isinstance(result, StorageError)]
+    expect(not errors, f'a losing compareAndSwap raised instead of returning False: {errors[:1]}')
+    winners = [version_id for won, version_id in results if won is True]
+    expect(len(winners) == 1, f'{len(winners)} clients won the same compareAndSwap')
+    expect(backend.head() == winners[0], 'head is not the winning version')
+
+
+def checkUnknownVersion (backend:StorageBackend, tmp:str) -> None:
+    try:
+        backend.fetch('0' * 40, os.path.join(tmp, 'dst'))
+    except StorageError:
+        return
+    raise ConformanceError('fetching an unknown version did not raise StorageError')
+
+
+CHECKS = (checkEmpty, checkRoundTrip, checkIncremental, checkHistory, checkConflict, checkConcurrentSwap, checkUnknownVersion)
+
+
+@contextmanager
+def directoryBackend (tmp:str):
+    yield DirectoryBackend(os.path.join(tmp, 'remote'))
+
+
+@contextmanager
+def localS3Backend (tmp:str, latency:float=0):
+    yield S3Backend('factorionline', 'saves', client=LocalS3Client(latency))
+
+
+@contextmanager
+def gitBackend (tmp:str):
+    """Un remoto bare en disco y un repo local que lo tiene de `origin`, sin red."""
+    from .gitengine import GitEngine
+    remote, local = os.path.join(tmp, 'remote.git'), os.path.join(tmp, 'local')
+    subprocess.run(['git', 'init', '--quiet', '--bare', remote], check=True)
+    subprocess.run(['git', 'init', '--quiet', local], check=True)
+    subprocess.run(['git', '-C', local, 'remote', 'add', 'origin', remote], check=True)
+    for key, value in (('user.name', 'factorionline'), ('user.email', 'factorionline@localhost')):
+        subprocess.run(['git', '-C', local, 'config', key, value], check=True)
+    engine = GitEngine(local)
+    try:
+        yield GitBackend(engine, subdir='Factorionline')
+    finally:
+        engine.close()
+
+
+BACKENDS = {'directory': directoryBackend, 's3-local': localS3Backend, 'git': gitBackend}
+
+
+def run (factory) -> list:
+    """Corre todos los checks, cada uno con un backend nuevo. Retorna `(check, error)`; `error` es `None` si pasó."""
+    results = []
+    for check in CHECKS:
+        with tempfile.TemporaryDirectory() as tmp:
+            try:
+                with factory(tmp) as backend:
+                    check(backend, tmp)
+                results.append((check.__name__, None))
+            except (ConformanceError, StorageError, OSError) as e:
+                results.append((check.__name__, e))
+    return results
+
+
+def throughput (factory, files:int=4, size_mb:int=20, edits:int=10) -> dict:
+    """Tiempos de subir y bajar `files` partidas de `size_mb` MB, y de
+    publicar y traer una versión donde cambió una sola."""
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp, factory(tmp) as backend:
+        src, dst = os.path.join(tmp, 'src'), os.path.join(tmp, 'dst')
+        saves = {f'world-{index}.zip': os.urandom(size_mb * 1024 * 1024) for index in range(files)}
+        writeTree(src, saves)
+        total = files * size_mb
+
+        start = time.perf_counter()
+        first = backend.put(src, None)
+        backend.compareAndSwap(None, first.id)
+        report['put_mb_s'] = total / (time.perf_counter() - start)
+        start = time.perf_counter()
+        backend.fetch(first.id, dst)
+        report['fetch_mb_s'] = total / (time.perf_counter() - start)
+
+        data = bytearray(saves['world-0.zip'])
+        for offset in range(0, len(data), len(data) // edits):
+            data[offset:offset + 4096] = os.urandom(4096)
+        with open(os.path.join(src, 'world-0.zip'), 'wb') as file:
+            file.write(data)
+        trips = backend.round_trips
+        start = time.perf_counter()
+        second = backend.put(src, first.id)
+        backend.compareAndSwap(first.id, second.id)
+        report['incremental_put_s'] = time.perf_counter() - start
+        start = time.perf_counter()
+        backend.fetch(second.id, dst)
+        report['incremental_fetch_s'] = time.perf_counter() - start
+        report['incremental_round_trips'] = backend.round_trips - trips
+    return report
+
+
+def main():  # pragma: no cover
+    parser = argparse.ArgumentParser(description="StorageBackend conformance and throughput suite")
+    parser.add_argument("backends", nargs='*', help=f"Backends to check ({', '.join(BACKENDS)}), all by default")
+    parser.add_argument("--files", "-f", type=int, default=4, help="Number of save files for throughput")
+    parser.add_argument("--size", "-s", type=int, default=20, help="Size of each save in MB")
+    parser.add_argument("--no-throughput", action='store_true', help="Only run the conformance checks")
+    args = parser.parse_args()
+    for backend in args.backends:
+        if backend not in BACKENDS:
+            parser.error(f'unknown backend {backend}')
+
+    failed = False
+    for backend in args.backends or BACKENDS:
+        print(backend)
+        for check, error in run(BACKENDS[backend]):
+            failed |= error is not None
+            print(f'  {"FAIL" if error else "ok  "} {check}' + (f': {error}' if error else ''))
+        if not args.no_throughput:
+            report = throughput(BACKENDS[backend], args.files, args.size)
+            print(f'  put {report["put_mb_s"]:8.1f} MB/s   fetch {report["fetch_mb_s"]:8.1f} MB/s   '
+                  f'one save changed: put {report["incremental_put_s"]*1000:7.1f} ms, '
+                  f'fetch {report["incremental_fetch_s"]*1000:7.1f} ms, {report["incremental_round_trips"]} round trips')
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
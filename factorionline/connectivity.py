@@ -0,0 +1,116 @@
+import time
+import random
+import asyncio
+import threading
+
+from .logger import Log
+
+name = 'Connectivity' # For log
+
+
+class ConnectivityMonitor:
+    """Mantiene el estado de conexión a internet.
+
+    Las operaciones remotas exitosas (Firestore, git) cuentan como prueba de
+    conexión vía `reportSuccess`, así que sólo se hace un sondeo activo cuando
+    no hubo actividad en `idle_interval` segundos. Sin conexión reintenta con
+    backoff exponencial y jitter. Los cambios de estado se notifican a los
+    suscriptores en lugar de consultarse."""
+    def __init__(self, logger:Log, target:tuple=('8.8.8.8', 53), probe_timeout:float=3,
+                 idle_interval:float=60, backoff_base:float=2, backoff_max:float=300):
+        self.logger = logger
+        self.target = target
+        self.probe_timeout = probe_timeout
+        self.idle_interval = idle_interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.online = False
+        self.failures = 0
+        self.last_success = 0
+        self.running = False
+        self.loop = None
+        self.subscribers = []
+        self.lock = threading.Lock()
+        self._wake = None
+
+
+    def subscribe (self, callback) -> None:
+        """`callback(online:bool)` se llama en cada cambio de estado."""
+        with self.lock:
+            self.subscribers.append(callback)
+
+
+    def _setOnline (self, online:bool) -> None:
+        with self.lock:
+            if online == self.online:
+                return
+            self.online = online
+            callbacks = list(self.subscribers)
+        self.logger.debug(f'Connectivity changed: {online}', name, style='green' if online else 'red')
+        for callback in callbacks:
+            callback(online)
+
+
+    def reportSuccess (self) -> None:
+        """Una operación remota funcionó. Thread-safe."""
+        self.last_success = time.monotonic()
+        self.failures = 0
+        self._setOnline(True)
+
+
+    def reportFailure (self) -> None:
+        """Una operación remota falló, se sondea de inmediato. Thread-safe."""
+        self.wake()
+
+
+    def wake (self) -> None:
+        if self.loop and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._wake.set)
+
+
+    async def probe (self) -> bool:
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(*self.target), self.probe_timeout)
+            writer.close()
+            return True
+        except (OSError, asyncio.TimeoutError):
+            return False
+
+
+    async def check (self) -> bool:
+        """Sondea el destino ahora y actualiza el estado."""
+        if await self.probe():
+            self.reportSuccess()
+        else:
+            self.failures += 1
+            self._setOnline(False)
+        return self.online
+
+
+    def nextDelay (self) -> float:
+        if self.online:
+            return max(0, self.last_success + self.idle_interval - time.monotonic())
+        delay = min(self.backoff_max, self.backoff_base * 2 ** self.failures)
+        return random.uniform(delay / 2, delay)
+
+
+    async def run (self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self.running = True
+        await self.check()
+        while self.running:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.nextDelay())
+                woken = True
+            except asyncio.TimeoutError:
+                woken = False
+            self._wake.clear()
+            idle = time.monotonic() - self.last_success >= self.idle_interval
+            if woken or idle or not self.online:
+                await self.check()
+
+
+    def stop (self) -> None:
+        self.running = False
+        self.wake()
@@ -1,130 +1,465 @@
 import os
-import socket
 import time
+import uuid
 import asyncio
-import firebase_admin
-from datetime import datetime
-from firebase_admin import credentials, firestore_async
-
+import threading
+import collections
+import concurrent.futures
+from dataclasses import asdict
 
 from .logger import Log
-from .fatorioerror import FactorioError, ErrorFixed
+from .events import Event, EventBus
+from .lease import Lease, LeaseBackend, LeaseWatch
+from .connectivity import ConnectivityMonitor
+from .recovery import CircuitBreaker, CircuitOpen
 
 
 name = 'DataProvier' # For log
-cred = {}
-cred = credentials.Certificate(cred)
-app = firebase_admin.initialize_app(cred, {
-            'databaseURL': 'factorionline-61308.firebaseapp.com'
-        })
-db = firestore_async.client()
+_app = None
+_db = None
+_db_lock = threading.Lock()
+
+
+def database ():
+    """Inicializa Firebase en el primer uso y retorna el cliente async de Firestore.
+    Importar este módulo no carga firebase_admin."""
+    global _app, _db
+    with _db_lock:
+        if _db is None:
+            import firebase_admin
+            from firebase_admin import credentials, firestore_async
+            cred = {}
+            cred = credentials.Certificate(cred)
+            _app = firebase_admin.initialize_app(cred, {
+                        'databaseURL': 'factorionline-61308.firebaseapp.com'
+                    })
+            _db = firestore_async.client()
+    return _db
+
+
+
+class FirestoreLeaseBackend(LeaseBackend):
+    """Lease guardado en `sesiones/lease`, modificado con transacciones de Firestore."""
+    def __init__(self, client=None, ttl:float=90):
+        super().__init__(ttl)
+        self._client = client
+
+
+    @property
+    def client (self):
+        if self._client is None:
+            self._client = database()
+        return self._client
+
+
+    @property
+    def ref (self):
+        return self.client.collection('sesiones').document('lease')
+
+
+    @property
+    def state_ref (self):
+        return self.client.collection('data').document('server_state')
+
+
+    async def _transact (self, fn):
+        from firebase_admin import firestore_async
+        @firestore_async.async_transactional
+        async def transaction_fn (transaction):
+            snapshot = await self.ref.get(transaction=transaction)
+            self.round_trips += 1
+            doc, result = fn(snapshot.to_dict() if snapshot.exists else None)
+            if doc is not None:
+                transaction.set(self.ref, doc)
+                self.round_trips += 1
+            return result
+        return await transaction_fn(self.client.transaction())
+
+
+    async def heartbeat (self, lease:Lease) -> tuple:
+        from firebase_admin import firestore_async
+        # Un solo get_all lee el lease y server_state, el set va en el commit
+        @firestore_async.async_transactional
+        async def transaction_fn (transaction):
+            docs = {}
+            async for snapshot in self.client.get_all([self.ref, self.state_ref], transaction=transaction):
+                docs[snapshot.id] = snapshot.to_dict() if snapshot.exists else None
+            self.round_trips += 1
+            server_online = (docs.get(self.state_ref.id) or {}).get('online', False)
+            doc = docs.get(self.ref.id)
+            if not doc or doc['token'] != lease.token or doc['holder'] != lease.holder:
+                return None, server_online
+            renewed = Lease(lease.holder, lease.user, lease.token, time.time() + self.ttl)
+            transaction.set(self.ref, asdict(renewed))
+            self.round_trips += 1
+            return renewed, server_online
+        return await transaction_fn(self.client.transaction())
+
+
+    def watch (self, callback) -> LeaseWatch:
+        from firebase_admin import firestore
+        # Los listeners sólo existen en el cliente síncrono
+        database()
+        ref = firestore.client().collection('sesiones').document('lease')
+        def on_snapshot (docs, changes, read_time):
+            doc = docs[0] if docs else None
+            callback(Lease(**doc.to_dict()) if doc and doc.exists else None)
+        return LeaseWatch(ref.on_snapshot(on_snapshot).unsubscribe)
 
 
 class DataProvider:
-    def __init__(self, logger:Log):
+    def __init__(self, logger:Log, events:EventBus, lease_backend:LeaseBackend=None):
         self.logger = logger
+        self.events = events
         self.user = os.getlogin()
+        # Identifica a esta instancia, el mismo usuario puede abrir dos clientes
+        self.client_id = f'{self.user}:{uuid.uuid4().hex[:8]}'
+        self.lease_backend = lease_backend if lease_backend else FirestoreLeaseBackend()
+        self.lease = None
+        self.connectivity = ConnectivityMonitor(self.logger)
+        self.connectivity.subscribe(self.onConnectivityChange)
+        self.breaker = CircuitBreaker('firestore')
         self.running = False
-        self.check = False
         self.online = False
         self.heartbeat = False
         self.available = False
-        self.lost_connection = False
+        self.check_interval = 60
+        self.heartbeat_interval = 30
+        self.presence_interval = 60
+        self.connect_timeout = 15
+        self.presence_watch = None
+        self._expiry_timer = None
+        # (round trips, latencia en segundos) de los últimos heartbeats
+        self.heartbeat_stats = collections.deque(maxlen=100)
+        self.loop = None
+        self.tasks = []
 
 
     async def checkForUsersOnline (self):
-        data = await db.collection('sesiones').document('last_report').get()
-        if self.online and data:
-            data = data.to_dict()
-            last_report = data.get('datetime', '')
-            user = data.get('user', '')
-            try:
-                difference = datetime.now() - datetime.fromisoformat(last_report)
-                if data and user != self.user and difference.total_seconds() <= 60*5:
-                    return True
-                else:
-                    return False
-            except:
-                return True
-        else:
+        """Retorna `True` si otro cliente tiene el lease vigente."""
+        if not self.online:
             return True
+        lease = await self.remote(self.lease_backend.current())
+        return bool(lease) and lease.holder != self.client_id
         
 
     def run (self):
         self.logger.info('Running DataProvider.', name, style='bold green')
         self.running = True
-        asyncio.run(self.mainloop())
+        self.loop = asyncio.new_event_loop()
+        try:
+            self.loop.run_until_complete(self.mainloop())
+        finally:
+            self.loop.close()
+            self.loop = None
+        self.logger.info('DataProvider stoped.', name)
 
 
     async def mainloop (self):
-        sec = 0
-        self.online = await self.testConnection()
-        self.last_check = self.online
+        self._check_event = asyncio.Event()
+        self._presence_event = asyncio.Event()
+        # Presencia en tiempo real si el backend lo soporta, si no se consulta cada presence_interval
+        self.presence_watch = self.lease_backend.watch(self.onPresenceChange)
+        self.tasks = [
+            asyncio.create_task(self.connectivity.run()),
+            asyncio.create_task(self.connectivityLoop()),
+            asyncio.create_task(self.heartbeatLoop()),
+            asyncio.create_task(self.presenceLoop()),
+        ]
+        try:
+            await asyncio.gather(*self.tasks)
+        except asyncio.CancelledError:
+            pass
+
+
+    async def _wait (self, interval:float, wake:asyncio.Event) -> None:
+        """Duerme `interval` segundos o hasta que se active `wake`."""
+        try:
+            await asyncio.wait_for(wake.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+        wake.clear()
+
+
+    async def connectivityLoop (self):
         while self.running:
-            time.sleep(1)
-            sec += 1
-            if sec >= 60 or self.check:
-                if self.check:
-                    self.check = False
-                self.online = await self.testConnection()
-                if self.online:
-                    if self.heartbeat:
-                        await self.updateHeartbeat()
+            await self._wait(self.check_interval, self._check_event)
+            if not self.connectivity.online:
+                continue
+            if self.heartbeat and self.lease and self.online:
+                # El heartbeat ya comprueba server_state en su misma transacción.
+                # Sin conexión el heartbeat no corre, así que hay que probar acá
+                continue
+            was_online = self.online
+            self.online = await self.testConnection()
+            if self.online and not was_online and self.heartbeat and self.lease:
+                # El lease no se renovó mientras no había conexión
+                try:
+                    await self.updateHeartbeat()
+                except Exception as e:
+                    self.logger.error(f'Heartbeat failed: {e}', name)
+            if self.online:
+                # Con suscripción sólo hace falta releer al reconectar
+                if not was_online or not self.presence_watch:
+                    self._presence_event.set()
+            elif was_online:
+                self.available = False
+                self.events.publish(Event.LOST_CONNECTION)
+
+
+    def onConnectivityChange (self, online:bool) -> None:
+        """Callback de ConnectivityMonitor. Puede llegar desde cualquier hilo."""
+        if online:
+            # Vuelve internet, falta confirmar el estado del servidor
+            self.requestCheck()
+        elif self.online:
+            self.online = False
+            self.available = False
+            self.events.publish(Event.LOST_CONNECTION)
+
+
+    async def remote (self, coro):
+        """Ejecuta una operación de Firestore e informa el resultado al monitor
+        de conexión. Lanza `CircuitOpen` sin llamar a Firestore si viene fallando."""
+        if not self.breaker.allow():
+            coro.close()
+            raise CircuitOpen(self.breaker.name)
+        try:
+            result = await coro
+        except Exception:
+            self.breaker.failure()
+            self.connectivity.reportFailure()
+            raise
+        self.breaker.success()
+        self.connectivity.reportSuccess()
+        return result
+
+
+    async def heartbeatLoop (self):
+        while self.running:
+            if self.online and self.heartbeat:
+                try:
+                    await self.updateHeartbeat()
+                except Exception as e:
+                    self.logger.error(f'Heartbeat failed: {e}', name)
+            await asyncio.sleep(self.heartbeat_interval)
+
+
+    async def presenceLoop (self):
+        while self.running:
+            interval = None if self.presence_watch else self.presence_interval
+            await self._wait(interval, self._presence_event)
+            if self.online:
+                try:
                     self.available = not await self.checkForUsersOnline()
-                elif self.last_check:
-                    self.lost_connection = True
-                    self.available = False
-                self.last_check = self.online
-                sec = 0
-        self.logger.info('DataProvider stoped.', name)
+                except Exception as e:
+                    self.logger.error(f'Presence could not be read: {e}', name)
+                    continue
+                if self.available:
+                    self.events.publish(Event.AVAILABLE)
+
+
+    def onPresenceChange (self, lease:Lease) -> None:
+        """Callback de la suscripción al lease. Puede llegar desde cualquier hilo."""
+        if self.loop and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._applyPresence, lease)
+
+
+    def _applyPresence (self, lease:Lease) -> None:
+        if self._expiry_timer:
+            self._expiry_timer.cancel()
+            self._expiry_timer = None
+        now = time.time()
+        taken = bool(lease) and lease.holder != self.client_id and not lease.expired(now)
+        if taken:
+            # Si el otro cliente se cae no habrá más snapshots, se reevalúa al vencer
+            self._expiry_timer = self.loop.call_later(lease.expires - now, self._applyPresence, lease)
+        if not self.online:
+            return
+        was_available = self.available
+        self.available = not taken
+        if self.available and not was_available:
+            self.events.publish(Event.AVAILABLE)
+
+
+    def submit (self, coro):
+        """Agenda una corrutina en el loop de DataProvider desde otro hilo.
+        Retorna un `concurrent.futures.Future`."""
+        if not self.loop:
+            raise RuntimeError('DataProvider is not running.')
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+
+    def requestCheck (self) -> None:
+        """Fuerza una comprobación de conexión inmediata. Thread-safe."""
+        if self.loop and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._check_event.set)
+
+
+    def _cancelTasks (self) -> None:
+        for task in self.tasks:
+            task.cancel()
 
 
     async def updateHeartbeat (self):
-        """Actualiza en el servidor que el cliente sigue en linea. Retorna `False` si falla."""
-        ref = db.collection('sesiones').document('last_report')
-        await ref.set({'datetime': datetime.now().isoformat(), 'user': self.user})
-        self.logger.debug(f'Heartbeat: {datetime.now().isoformat()}', name)
-        if await self.checkForUsersOnline():
+        """Renueva el lease, verifica que siga siendo nuestro y comprueba el
+        estado del servidor en una sola operación. Retorna `False` si falla."""
+        if not self.lease:
             return False
-        else:
-            return True
+        start = time.perf_counter()
+        round_trips = self.lease_backend.round_trips
+        lease, server_online = await self.remote(self.lease_backend.heartbeat(self.lease))
+        round_trips = self.lease_backend.round_trips - round_trips
+        latency = time.perf_counter() - start
+        self.heartbeat_stats.append((round_trips, latency))
+        self.logger.debug(f'Heartbeat: {round_trips} round trips, {latency*1000:.0f} ms', name)
+        if not server_online:
+            self.online = False
+            self.available = False
+            self.events.publish(Event.LOST_CONNECTION)
+        if not lease:
+            self.logger.warning(f'Lease lost. Token: {self.lease.token}', name)
+            self.lease = None
+            self.heartbeat = False
+            self.events.publish(Event.LEASE_LOST)
+            return False
+        self.lease = lease
+        return server_online
 
-    
-    def connect (self) -> bool:
-        """Permite enviar al servidor una actualización constante del estado de conxión, para evitar que otro usuario se conecte a la vez."""
+
+    def heartbeatReport (self) -> dict:
+        """Promedios de round trips y latencia por heartbeat."""
+        if not self.heartbeat_stats:
+            return {'ticks': 0, 'round_trips': 0, 'latency': 0}
+        ticks = len(self.heartbeat_stats)
+        return {
+            'ticks': ticks,
+            'round_trips': sum(trips for trips, _ in self.heartbeat_stats) / ticks,
+            'latency': sum(latency for _, latency in self.heartbeat_stats) / ticks,
+        }
+
+
+    async def acquireLease (self) -> bool:
+        self.lease = await self.remote(self.lease_backend.acquire(self.client_id, self.user))
+        if self.lease:
+            self.logger.debug(f'Lease acquired. Token: {self.lease.token}', name)
+        return bool(self.lease)
+
+
+    async def releaseLease (self) -> None:
+        lease, self.lease = self.lease, None
+        if lease:
+            await self.remote(self.lease_backend.release(lease))
+            self.logger.debug(f'Lease released. Token: {lease.token}', name)
+
+
+    def borrowLease (self) -> bool:
+        """Fence para subir cambios pendientes. Dentro de una sesión valida el
+        lease; fuera de ella lo toma si está libre. Thread-safe."""
         if self.heartbeat:
-            self.logger.info('DataProvider already connected.')
-            return 0
-        self.check = True
-        time.sleep(4)
-        if self.online:
-            if self.available:
-                self.heartbeat = True
-                self.logger.debug('DataProvider connected.', name, style='bold')
-                return 0
-            else:
+            return self.validateLease()
+        if not self.loop:
+            return False
+        try:
+            return self.submit(self.acquireLease()).result(timeout=10)
+        except Exception as e:
+            self.logger.error(f'Lease could not be borrowed: {e}', name)
+            return False
+
+
+    def returnLease (self) -> None:
+        """Suelta el lease tomado por `borrowLease` si no hay una sesión en curso."""
+        if self.heartbeat or not self.lease or not self.loop:
+            return
+        try:
+            self.submit(self.releaseLease()).result(timeout=3)
+        except Exception as e:
+            self.logger.error(f'Lease could not be released: {e}', name)
+
+
+    def validateLease (self) -> bool:
+        """Comprueba que nuestro fencing token siga vigente. Thread-safe."""
+        if not self.lease or not self.loop:
+            return False
+        try:
+            return self.submit(self.lease_backend.validate(self.lease.token)).result(timeout=10)
+        except Exception as e:
+            self.logger.error(f'Lease could not be validated: {e}', name)
+            return False
+
+    
+    async def handshake (self, timeout:float) -> int:
+        """Comprueba la conexión y toma el lease en un solo recorrido.
+        Retorna `0` si se conectó, `1` si alguien más está jugando y `2` si no hay conexión."""
+        async def roundTrip () -> int:
+            if not self.connectivity.online:
+                await self.connectivity.check()
+            self.online = await self.testConnection()
+            if not self.online:
+                return 2
+            if not await self.acquireLease():
                 return 1
-        else:
+            self.heartbeat = True
+            self.logger.debug('DataProvider connected.', name, style='bold')
+            return 0
+        try:
+            return await asyncio.wait_for(roundTrip(), timeout)
+        except asyncio.TimeoutError:
+            self.logger.warning(f'Connect timed out after {timeout}s.', name)
             return 2
+        except Exception as e:
+            self.logger.error(f'Connect failed: {e}', name)
+            return 2
+
+
+    def connect (self, timeout:float=None) -> concurrent.futures.Future:
+        """Permite enviar al servidor una actualización constante del estado de conxión, para evitar que otro usuario se conecte a la vez.
+        Retorna un `Future` que se resuelve con el resultado de `handshake` en cuanto termina el recorrido de red."""
+        if self.heartbeat:
+            self.logger.info('DataProvider already connected.')
+            future = concurrent.futures.Future()
+            future.set_result(0)
+            return future
+        if not self.loop:
+            future = concurrent.futures.Future()
+            future.set_result(2)
+            return future
+        return self.submit(self.handshake(timeout or self.connect_timeout))
     
 
     def disconnect (self) -> None:
         self.heartbeat = False
+        if self.lease and self.loop:
+            try:
+                self.submit(self.releaseLease()).result(timeout=3)
+            except Exception as e:
+                self.logger.error(f'Lease could not be released: {e}', name)
         self.logger.info('DataProvider dissconected.', name)
 
     
     def stop (self):
         self.disconnect()
         self.running = False
+        self.connectivity.stop()
+        if self.presence_watch:
+            self.presence_watch.unsubscribe()
+            self.presence_watch = None
+        if self.loop and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._cancelTasks)
         
 
     async def testConnection (self) -> bool:
         """Retorna el estado del server, devuelve False si el server no está
         activo o si no hay respuesta, devuelve True en caso contrario"""
-        if not self.testInternetConnection():
+        if not self.connectivity.online:
             self.logger.debug(f'Connection tested: {False}', name, style='red')
             return False
-        data = await db.collection('data').document('server_state').get()
+        try:
+            data = await self.remote(database().collection('data').document('server_state').get())
+        except Exception as e:
+            self.logger.error(f'Server state could not be read: {e}', name)
+            return False
+        is_online = False
         if data:
             is_online = data.to_dict().get('online', False)
         self.logger.debug(f'Connection tested: {is_online}', name)
@@ -134,11 +469,3 @@ class DataProvider:
         else:
             self.online = False
             return False
-    
-    def testInternetConnection (self):
-        try:
-            socket.setdefaulttimeout(3)
-            socket.socket(socket.AF_INET, socket.SOCK_STREAM).connect(('8.8.8.8', 53))
-            return True
-        except socket.error:
-            return False
\ No newline at end of file
@@ -0,0 +1,132 @@
+import queue
+import threading
+import time
+
+from dataclasses import dataclass, field
+
+name = 'Events' # For log
+
+
+@dataclass
+class Event:
+    """Evento publicado en el bus interno."""
+    PROCESS_STARTED = 'process_started'
+    PROCESS_STOPPED = 'process_stopped'
+    AVAILABLE = 'available'
+    LOST_CONNECTION = 'lost_connection'
+    LEASE_LOST = 'lease_lost'
+    PATH_DISAPPEARED = 'path_disappeared'
+    RETRY_ENTRY = 'retry_entry'
+    ERROR_FIXED = 'error_fixed'
+    RECOVERY_FAILED = 'recovery_failed'
+    GO_OFFLINE = 'go_offline'
+    STOP = 'stop'
+
+    id:str
+    data:any = None
+    time:float = field(default_factory=time.monotonic)
+
+
+
+class EventBus:
+    """Cola de eventos thread-safe. Los productores (`processListening`,
+    `DataProvider`, `FileManager`) publican y el orquestador consume
+    bloqueándose en `get`, así no gasta CPU mientras no pasa nada."""
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.subscribers = {}
+        self.lock = threading.Lock()
+
+
+    def publish (self, id:str, data:any=None) -> None:
+        event = Event(id, data)
+        with self.lock:
+            callbacks = list(self.subscribers.get(id, []))
+        for callback in callbacks:
+            callback(event)
+        self.queue.put(event)
+
+
+    def subscribe (self, id:str, callback) -> None:
+        """Registra un callback que se ejecuta en el hilo del productor."""
+        with self.lock:
+            self.subscribers.setdefault(id, []).append(callback)
+
+
+    def unsubscribe (self, id:str, callback) -> None:
+        with self.lock:
+            if callback in self.subscribers.get(id, []):
+                self.subscribers[id].remove(callback)
+
+
+    def get (self, timeout:float=None) -> Event:
+        """Espera al siguiente evento. Retorna `None` si vence el timeout."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+
+class SessionState:
+    IDLE = 'idle'
+    CONNECTING = 'connecting'
+    LOCKED = 'locked'
+    PLAYING = 'playing'
+    FLUSHING = 'flushing'
+
+
+
+class InvalidTransition(Exception):
+    pass
+
+
+
+class SessionStateMachine:
+    """Máquina de estados de la sesión de juego.
+    idle → connecting → locked → playing → flushing → idle"""
+    transitions = {
+        SessionState.IDLE: {SessionState.CONNECTING, SessionState.PLAYING},
+        SessionState.CONNECTING: {SessionState.LOCKED, SessionState.PLAYING, SessionState.IDLE},
+        SessionState.LOCKED: {SessionState.CONNECTING, SessionState.PLAYING, SessionState.IDLE},
+        SessionState.PLAYING: {SessionState.FLUSHING, SessionState.CONNECTING, SessionState.LOCKED},
+        SessionState.FLUSHING: {SessionState.IDLE, SessionState.CONNECTING},
+    }
+    def __init__(self, logger=None):
+        self.logger = logger
+        self.state = SessionState.IDLE
+        self.history = [(None, SessionState.IDLE, time.time())]
+        self.lock = threading.Lock()
+
+
+    def transition (self, new_state:str) -> bool:
+        """Cambia de estado y guarda el timestamp. Retorna `False` si ya se
+        estaba en ese estado."""
+        with self.lock:
+            if new_state == self.state:
+                return False
+            if new_state not in self.transitions[self.state]:
+                raise InvalidTransition(f'{self.state} -> {new_state}')
+            self.history.append((self.state, new_state, time.time()))
+            old_state, self.state = self.state, new_state
+        if self.logger:
+            self.logger.debug(f'Session: {old_state} -> {new_state}', name)
+        return True
+
+
+    def isIn (self, *states:str) -> bool:
+        return self.state in states
+
+
+    def timestamps (self) -> dict:
+        """Retorna el último instante en que se entró a cada estado."""
+        with self.lock:
+            return {new_state: moment for _, new_state, moment in self.history}
+
+
+    def timeIn (self, state:str) -> float:
+        """Segundos que lleva la sesión en `state`, o `0` si no es el estado actual."""
+        with self.lock:
+            if self.state != state:
+                return 0
+            return time.time() - self.history[-1][2]
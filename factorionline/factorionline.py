@@ -1,9 +1,8 @@
 import subprocess
 import sys
 import threading
+import traceback
 import pathlib
-import psutil
-import time
 import os
 
 
@@ -13,7 +12,11 @@ from .filemanager import FileManager, factorionline_path
 from .register_hkey_aumid import register_hkey
 from .dataprovider import DataProvider
 from .utilities import Notification
-from .fatorioerror import FactorioError, ErrorFixed
+from .fatorioerror import FactorioError
+from .recovery import RecoveryManager, RetryPolicy
+from .events import Event, EventBus, SessionState, SessionStateMachine, InvalidTransition
+from .processwatcher import ProcessWatcher
+from .maintenance import MaintenanceScheduler
 name = 'Factorionline' # For log
 
 class Factorionline:
@@ -24,13 +27,19 @@ class Factorionline:
         self.process_active = False
         self.notify_online = True
         self.notified_offline = False
-        self.on_entry = False
-        self.do_stop = False
-        self.on_exit = False
-        self.do_disconnect = False
-        self.connecting = False
-        self.filemanager = FileManager(self.logger)
-        self.dataprovider = DataProvider(self.logger)
+        self.events = EventBus()
+        self.session = SessionStateMachine(self.logger)
+        self.filemanager = FileManager(self.logger, self.events)
+        self.dataprovider = DataProvider(self.logger, self.events)
+        self.process_watcher = ProcessWatcher(self.logger, self.events, self.factorio_process_name)
+        # Fencing: FileManager no hace push si el lease no es nuestro
+        self.filemanager.fence = self.dataprovider.borrowLease
+        self.filemanager.fence_release = self.dataprovider.returnLease
+        self.filemanager.connectivity = self.dataprovider.connectivity
+        self.maintenance = MaintenanceScheduler(self.logger, factorionline_path)
+        self.recovery = RecoveryManager(self.logger, self.events)
+        self.recovery.register(FactorioError.ConnectionError, self.repairConnection,
+                               RetryPolicy(max_attempts=10, base_delay=1, factor=1.5, max_delay=10, deadline=60))
 
     def asktask (self):
         try:
@@ -85,131 +94,167 @@ class Factorionline:
         # Inicia el mainloop de la conexión a la base de datos
         threading.Thread(target=self.dataprovider.run).start()
         threading.Thread(target=self.filemanager.run).start()
+        # Sólo trabaja mientras el juego está cerrado; ProcessWatcher lo corrige al arrancar
+        threading.Thread(target=self.maintenance.run, daemon=True).start()
+        self.maintenance.setIdle(True)
         self.running = True
         threading.Thread(target=self.processListening).start()
         self.mainLoop()
 
 
     def mainLoop (self):
+        # Se bloquea esperando eventos, no hace polling
         while self.running:
+            event = self.events.get()
             try:
-                if self.on_entry:
-                    self.onEntry()
-                if self.on_exit:
-                    self.onExit()
-                if self.do_stop:
-                    self.stop()
-                if self.do_disconnect:
-                    self.disconnect()
-                if self.connecting:
-                    if self.dataprovider.available:
-                        if self.notify_online and not self.process_active:
-                            self.notifyUser('online_avaible')
-                        if self.process_active:
-                            self.on_entry = True
-                        self.connecting = False
-                if self.dataprovider.lost_connection:
-                    self.logger.debug('Connection Lost', name)
-                    self.dataprovider.lost_connection = False
-                    self.notified_offline = True
-                    raise FactorioError(FactorioError.LostConnectionError)
-                if self.filemanager.path_disapears:
-                    self.logger.warning('Root path disapears.')
-                    if self.setUp():
-                        self.filemanager.path_disapears = False
-                        threading.Thread(target=self.filemanager.run).start()
+                self.handleEvent(event)
+            except InvalidTransition as e:
+                # Un evento fuera de orden no tiene que matar el loop
+                self.logger.error(f'Invalid session transition on {event.id}: {e}', name)
             except FactorioError as fe:
                 error_id = fe.args[0].get('id')
                 self.logger.warning(error_id, name)
                 match (fe.args[0]):
                     case FactorioError.ConnectionError:
-                        self.connecting = True
+                        self.enterState(SessionState.CONNECTING)
                         if not self.notified_offline:
                             self.notifyUser('offline_mode')
                             self.notified_offline = True
                     case FactorioError.LostConnectionError:
-                        self.connecting = True
+                        self.enterState(SessionState.CONNECTING)
                         if self.process_active:
                             self.notifyUser('offline')
                     case FactorioError.SomeoneAlreadyPlaying:
-                        self.connecting = True
+                        self.enterState(SessionState.LOCKED)
                         self.notifyUser('someone_already_playing')
                     case _:
                         self.logger.error(error_id, name)
-            except ErrorFixed:
-                if self.process_active:
-                    self.on_entry = True
-        time.sleep(1)
+                # La reparación corre en segundo plano y avisa con ERROR_FIXED
+                self.recovery.recover(fe.error)
+            except Exception as e:
+                # Si el loop muere la app sigue en la bandeja sin hacer nada: se registra y se sigue con el próximo evento
+                self.logger.error(f'Unhandled error on {event.id}: {e!r}\n{traceback.format_exc()}', name)
+
+
+    def enterState (self, state:str) -> None:
+        """Transición desde el manejo de errores: si no es válida desde el
+        estado actual se registra y se sigue, el error igual se recupera."""
+        try:
+            self.session.transition(state)
+        except InvalidTransition as e:
+            self.logger.warning(f'Ignoring session transition {e}', name)
+
+
+    def handleEvent (self, event:Event) -> None:
+        match (event.id):
+            case Event.PROCESS_STARTED:
+                self.process_active = True
+                self.maintenance.setIdle(False)
+                self.filemanager.prefetcher.setIdle(False)
+                self.notified_offline = False
+                self.onEntry()
+            case Event.PROCESS_STOPPED:
+                self.process_active = False
+                self.onExit()
+                self.maintenance.setIdle(True)
+                self.filemanager.prefetcher.setIdle(True)
+            case Event.RETRY_ENTRY | Event.ERROR_FIXED:
+                if self.process_active and not self.session.isIn(SessionState.PLAYING):
+                    self.onEntry()
+            case Event.RECOVERY_FAILED:
+                self.logger.error(f'Recovery failed. ID: {event.data.get("id")}', name)
+            case Event.AVAILABLE:
+                # Quien soltó el lease pudo haber subido partidas
+                self.filemanager.prefetcher.wake()
+                if self.session.isIn(SessionState.CONNECTING, SessionState.LOCKED):
+                    if self.notify_online and not self.process_active:
+                        self.notifyUser('online_avaible')
+                    if self.process_active:
+                        self.onEntry()
+                    else:
+                        self.session.transition(SessionState.IDLE)
+            case Event.LOST_CONNECTION:
+                self.logger.debug('Connection Lost', name)
+                self.notified_offline = True
+                raise FactorioError(FactorioError.LostConnectionError)
+            case Event.LEASE_LOST:
+                if self.session.isIn(SessionState.PLAYING):
+                    raise FactorioError(FactorioError.SomeoneAlreadyPlaying)
+            case Event.PATH_DISAPPEARED:
+                self.logger.warning('Root path disapears.')
+                if self.setUp():
+                    threading.Thread(target=self.filemanager.run).start()
+            case Event.GO_OFFLINE:
+                self.onExit()
+            case Event.STOP:
+                if self.running:
+                    self.stop()
 
 
-    
     def onEntry (self):
         if not os.path.exists(factorionline_path):
             self.logger.warning('Root directory isn\'t exists.', name)
             if not self.setUp():
                 self.stop()
                 return False
-        self.on_entry = False
         self.logger.debug('On entry.', name)
         # Aqui va la logica al entrar al juego
-        if self.dataprovider.online:
-            response = self.dataprovider.connect()
-            if response == 0:
-                if not self.filemanager.activate():
-                    raise FactorioError(FactorioError.FileManagerFail)
-                self.notifyUser('online')
-                return True
-            elif response == 1:
-                raise FactorioError(FactorioError.SomeoneAlreadyPlaying)
-            else:
-                raise FactorioError(FactorioError.ConnectionError, self.dataprovider)
+        self.session.transition(SessionState.CONNECTING)
+        # Se resuelve en cuanto termina el recorrido de red, no hay espera fija
+        response = self.dataprovider.connect().result()
+        if response == 0:
+            if not self.filemanager.activate():
+                raise FactorioError(FactorioError.FileManagerFail)
+            self.session.transition(SessionState.PLAYING)
+            self.recovery.cancel(FactorioError.ConnectionError)
+            self.notifyUser('online')
+            return True
+        elif response == 1:
+            raise FactorioError(FactorioError.SomeoneAlreadyPlaying)
         else:
-            raise FactorioError(FactorioError.ConnectionError, self.dataprovider)
+            raise FactorioError(FactorioError.ConnectionError)
+
+
+    def repairConnection (self) -> bool:
+        """Reparación de ConnectionError, la ejecuta RecoveryManager."""
+        if self.dataprovider.online:
+            return True
+        self.dataprovider.requestCheck()
         return False
 
 
     def disconnect (self):
-        self.dataprovider.disconnect()
         self.filemanager.deactivate()
+        # Con el lease aún tomado, así otros clientes ven la partida al quedar libre
+        self.filemanager.flushOutbox()
+        self.dataprovider.disconnect()
 
 
     def onExit (self):
-        self.on_exit = False
-        if not self.connecting:
+        if self.session.isIn(SessionState.PLAYING):
+            self.session.transition(SessionState.FLUSHING)
             self.disconnect()
+            self.session.transition(SessionState.IDLE)
         self.logger.debug('Exit.', name)
 
 
     def processListening (self) -> None:
-        def checkProcess () -> bool:
-            """Busca si factorio está en ejecución"""
-            for proceso in psutil.process_iter(['name']):
-                if proceso.info['name'] == self.factorio_process_name:
-                    return True
-            return False
-        
-
         self.logger.info('Running Factorionline.', name, style='bold green')
-        self.process_active = False
-        # Mainloop
-        while self.running:
-            if checkProcess():
-                if not self.process_active:
-                    self.process_active = True
-                    self.on_entry = True
-                    self.notified_offline = False
-            else:
-                if self.process_active:
-                    self.process_active = False
-                    self.on_exit = True
-            time.sleep(1)
+        # Bloquea hasta que se llame a process_watcher.stop()
+        self.process_watcher.run()
         self.logger.info('Factorionline stoped.', name)
 
 
     def stop (self) -> None:
         self.running = False
-        self.dataprovider.stop()
+        # Despierta al mainLoop si está esperando un evento
+        self.events.publish(Event.STOP)
+        self.process_watcher.stop()
+        self.maintenance.stop()
+        self.recovery.stop()
+        # FileManager primero: vaciar el outbox necesita el lease de DataProvider
         self.filemanager.stop()
+        self.dataprovider.stop()
 
     
     def notifyUser (self, id:str) -> None:
@@ -279,7 +324,7 @@ class Factorionline:
         self.logger.debug(f'Notification actioned. Response: {response}', name)
         match (response):
             case 'offline':
-                self.onExit()
+                self.events.publish(Event.GO_OFFLINE)
             case 'dont_notify_online':
                 self.notify_online = False
             case 'open_factorio':
@@ -293,6 +338,7 @@ class Factorionline:
 
 
     def killFactorioProcess (self) -> bool:
+        import psutil
         killed = True
         for proceso in psutil.process_iter(['name']):
             if proceso.info['name'] == self.factorio_process_name:
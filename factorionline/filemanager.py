@@ -1,18 +1,24 @@
 import getpass
 import os
-import re
-import git
 import time
 import shutil
+import threading
 import subprocess
 
 from datetime import datetime
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
-from rich.progress import Progress, BarColumn, TextColumn, TransferSpeedColumn, TimeElapsedColumn
 
 from .logger import Log
 from .utilities import Notification
+from .events import Event, EventBus
+from .mirror import mirror, isLink, linkDir
+from .savedetector import SaveDetector
+from .manifest import ManifestIndex
+from .outbox import PushOutbox
+from .prefetch import Prefetcher
+from .gitengine import GitEngine, GitProgress
+from . import savecodec
+from . import chunkstore
+from .transport import Transport, GitTransport
 
 name = 'FileManager' # For log
 repo_url = 'https://github.com/Saul-TC/factorionline.git'
@@ -20,36 +26,71 @@ factorionline_path = os.path.join(os.getenv('APPDATA'), 'Factorio\\factorionline
 factorio_saves_path = os.path.join(os.getenv('APPDATA'), r'Factorio\saves\Factorionline')
 
 
-class ChangeHandler(FileSystemEventHandler):
-    def __init__(self):
-        super().__init__()
-        self.active = False
-        self.changed = False
-    def on_deleted (self, event):
-        if self.active:
-            self.changed = True
-    def activate (self):
-        self.active = True
-    def deactivate (self):
-        self.active = False
-
-    
-
 class FileManager:
-    def __init__(self, logger:Log):
+    def __init__(self, logger:Log, events:EventBus):
         self.logger = logger
-        self.repo = None
-        self.origin = None
+        self.events = events
+        # Repo abierto durante toda la sesión
+        self.git = GitEngine(factorionline_path)
+        self.repo_url = repo_url
+        # Por dónde viajan las partidas. Con un `DeltaTransport` (pasarle `dictionary_dir`
+        # para comprimir con diccionarios zstd) o un `storage.StorageTransport` sobre
+        # cualquier `StorageBackend`, git queda como historia local. Los dos necesitan
+        # un `state_path` (dentro de .git) para saber qué cambios locales faltan subir
+        self.transport:Transport = GitTransport(self.git)
         self.activated = False
         self.running = False
         self.path_exists = False
-        self.path_disapears = False
-        self.observer = Observer()
-        self.change_handler = ChangeHandler()
+        self.observer = None
+        self.save_detector = SaveDetector()
+        self.manifest = None
+        # fence() toma o valida el lease antes del push, fence_release() suelta el que se tomó sólo para subir
+        self.fence = None
+        self.fence_release = None
+        self.connectivity = None
+        self.outbox = None
+        self.outbox_deadline = 15
+        # Al cerrar, si el outbox ya venía fallando, no se espera más que esto
+        self.stop_deadline = 2
+        # Cómo se agrupan los autosaves en commits:
+        # 'each' un commit por guardado, 'session' uno por sesión de juego,
+        # 'interval' uno cada `squash_interval` segundos
+        self.commit_policy = 'session'
+        self.squash_interval = 600
+        self.squash = None
+        self.push_lock = threading.Lock()
+        # La historia son snapshots binarios, no hace falta bajarla entera.
+        # `None` clona la historia completa
+        self.clone_depth = 1
+        # `None` respeta el límite shallow del clon y sólo trae los commits nuevos.
+        # Con un número git re-corta la historia a esa profundidad: más que
+        # `clone_depth` baja snapshots viejos y 1 deja el pull sin base común
+        self.fetch_depth = None
+        self.prefetcher = Prefetcher(self.logger, self.fetchRepo)
+        # Un prefetch y un pull a la vez se pisarían las referencias
+        self.fetch_lock = threading.Lock()
+        # Método de copia de mirror.FileCopier: 'auto', 'reflink', 'hardlink' o 'copy'
+        self.mirror_method = 'auto'
+        # Si es True la carpeta de partidas es un enlace al worktree de git y no se copia nada
+        self.direct_worktree = False
+        # 'zip' guarda las partidas tal cual. 'unpacked' guarda sus entradas sin
+        # comprimir (ver `savecodec`) para que git haga deltas. 'chunked' las
+        # guarda en un `ChunkStore` deduplicado. Los dos últimos no admiten direct_worktree
+        self.storage_format = 'zip'
+        self.chunk_store = chunkstore.ChunkStore(os.path.join(factorionline_path, 'Chunks'))
+        # Diccionarios zstd entrenados con las partidas del mundo, junto al repo
+        self.dictionary_dir = os.path.join(factorionline_path, 'Dictionaries')
 
     
     def removeDir (self, dir:str) -> bool:
         try:
+            if isLink(dir):
+                # Sólo se quita el enlace, nunca el worktree al que apunta
+                if os.path.islink(dir):
+                    os.unlink(dir)
+                else:
+                    os.rmdir(dir)
+                return True
             shutil.rmtree(dir)
             return True
         except FileNotFoundError:
@@ -57,30 +98,17 @@ class FileManager:
     
 
     def add_safe_directory(self, path):
-        try:
-            subprocess.run(
-                ["git", "config", "--global", "--add", "safe.directory", path],
-                check=True
-            )
-            print(f"Directorio {path} agregado como seguro.")
-        except subprocess.CalledProcessError as e:
-            print(f"Error agregando directorio seguro: {e}")
+        self.ensure_safe_directory(path)
 
 
     def ensure_safe_directory(self, path):
         try:
-            result = subprocess.run(
-                ["git", "config", "--global", "--get-all", "safe.directory"],
-                capture_output=True, text=True, check=True
-            )
-            safe_dirs = result.stdout.splitlines()
-
-            if path not in safe_dirs:
-                self.add_safe_directory(path)
+            if GitEngine.addSafeDirectory(path):
+                print(f"Directorio {path} agregado como seguro.")
             else:
                 print(f"Directorio {path} ya estaba marcado como seguro.")
-        except subprocess.CalledProcessError:
-            self.add_safe_directory(path)
+        except Exception as e:
+            print(f"Error agregando directorio seguro: {e}")
 
         
     def copyDir (self, src:str, dst:str) -> bool:
@@ -91,11 +119,53 @@ class FileManager:
             return False
         
 
-    def updateDir (self, src:str, dst:str) -> bool:
-        self.removeDir(dst)
-        if self.copyDir(src, dst):
+    def updateDir (self, src:str, dst:str, source:dict=None) -> bool:
+        """Sincroniza `dst` con `src` de forma incremental. `source` es el
+        manifiesto de `src` si ya se calculó."""
+        try:
+            target = None
+            if self.manifest:
+                source = source if source is not None else self.manifest.refresh(src).entries
+                target = self.manifest.refresh(dst).entries
+            stats = mirror(src, dst, self.mirror_method, source, target)
+        except OSError as e:
+            self.logger.error(f'Could not mirror {src} -> {dst}: {e}', name)
+            return False
+        self.logger.debug(f'Mirrored {src} -> {dst}: {stats.copied} copied, {stats.deleted} deleted, '
+                          f'{stats.unchanged} unchanged, {stats.bytes_copied} bytes copied, {stats.bytes_shared} bytes shared.', name)
+        return True
+
+
+    def publishSaves (self) -> bool:
+        """Pone las partidas del repo en la carpeta de Factorio. En modo
+        `direct_worktree` la enlaza al worktree; si no se puede, copia."""
+        src = factorionline_path+'\\Factorionline'
+        if self.storage_format in ('unpacked', 'chunked'):
+            if isLink(factorio_saves_path):
+                self.removeDir(factorio_saves_path)
+            try:
+                if self.storage_format == 'chunked':
+                    written = chunkstore.publish(src, factorio_saves_path, self.chunk_store)
+                    self.logger.debug(f'Published saves: {written} materialised from chunks.', name)
+                    return True
+                stats = savecodec.publish(src, factorio_saves_path)
+            except (OSError, ValueError) as e:
+                self.logger.error(f'Could not publish saves: {e}', name)
+                return False
+            self.logger.debug(f'Published saves: {stats.packed} packed, {stats.copied} copied, '
+                              f'{stats.deleted} deleted, {stats.unchanged} unchanged.', name)
             return True
-        return False
+        if self.direct_worktree:
+            try:
+                self.removeDir(factorio_saves_path)
+                linkDir(src, factorio_saves_path)
+                return True
+            except (OSError, subprocess.CalledProcessError) as e:
+                self.logger.warning(f'Could not link saves folder, mirroring instead: {e}', name)
+        if isLink(factorio_saves_path):
+            # Quedó el enlace de una sesión en modo direct_worktree
+            self.removeDir(factorio_saves_path)
+        return self.updateDir(src, factorio_saves_path)
         
 
 
@@ -106,10 +176,11 @@ class FileManager:
             return True
         # Crear el objeto repo antes de mover la carpeta con las partidas 'Factorionline'
         try:
-            self.repo = git.Repo(factorionline_path)
-            self.origin = self.repo.remotes.origin
+            if not self.manifest:
+                # Dentro de .git para que no se suba con las partidas
+                self.manifest = ManifestIndex(os.path.join(self.git.repo.git_dir, 'factorionline-manifest.db'))
             if self.pullRepo():
-                self.change_handler.activate()
+                self.save_detector.activate()
             else:
                 return False
         except Exception as e:
@@ -118,9 +189,13 @@ class FileManager:
         
         # Mover la carpeta para que se puedan acceder desde factorio
         try:
+            from watchdog.observers import Observer
             self.observer = Observer()
-            self.updateDir(factorionline_path+'\\Factorionline', factorio_saves_path)
-            self.observer.schedule(self.change_handler, path=factorio_saves_path, recursive=True)
+            self.publishSaves()
+            # Estado base para distinguir los guardados que no cambian nada
+            self.manifest.refresh(factorio_saves_path)
+            self.startSquash()
+            self.observer.schedule(self.save_detector, path=factorio_saves_path, recursive=True)
             self.observer.start()
             self.activated = True
         except Exception as e:
@@ -137,29 +212,134 @@ class FileManager:
         self.path_exists = os.path.exists(factorionline_path)
         self.logger.info('Running FileManager', name, style='bold green')
         last_path_check = self.path_exists
+        if self.path_exists and not self.outbox:
+            self.startOutbox()
+            if isinstance(self.transport, GitTransport):
+                self.startPrefetcher()
         while self.running:
             self.path_exists = os.path.exists(factorionline_path)
             if not self.path_exists:
                 self.running = False
                 if last_path_check:
-                    self.path_disapears = True
+                    self.events.publish(Event.PATH_DISAPPEARED)
                 break
             last_path_check = self.path_exists
-            if self.change_handler.changed:
-                self.logger.info('Save file changed.')
+            # Espera un guardado completo; el timeout sólo es para revisar la ruta
+            paths = self.save_detector.wait(timeout=1)
+            if paths:
+                self.logger.info(f'Save committed: {len(paths)} file(s) changed.', name)
                 if self.activated:
-                    self.updateDir(factorio_saves_path, factorionline_path+'\\Factorionline')
-                    if not self.pushRepo():
+                    # El índice se actualiza recién con el commit hecho: si algo falla, el próximo guardado lo reintenta
+                    changes = self.manifest.scan(factorio_saves_path)
+                    if changes.empty:
+                        self.manifest.commit(changes)
+                        self.logger.info('Save content unchanged, nothing to push.', name)
+                        continue
+                    changed = self.storeSaves(changes)
+                    if changed == []:
+                        self.manifest.commit(changes)
+                        self.logger.info('Save entries unchanged, nothing to push.', name)
+                        continue
+                    commit = self.commitRepo(changed) if changed is not None else None
+                    if commit:
+                        self.manifest.commit(changes)
+                        # El push lo hace el outbox en segundo plano
+                        for path in changes.changed + changes.removed:
+                            self.outbox.put(os.path.basename(path), commit)
+                    else:
                         title = 'Error al guardar partida!'
                         message = 'Se produjo un error al intentar guardar partida.'
-                        Notification(title=title, message=message, config={'sound': 'IM'})
-                self.change_handler.changed = False
-            time.sleep(1)
+                        Notification(title=title, message=message, config={'sound': 'IM'}).show()
         self.logger.info('FileManager stoped.', name)
 
 
+    def storeSaves (self, changes) -> list:
+        """Lleva al repo los cambios de la carpeta de partidas según
+        `storage_format`. Retorna las rutas a commitear (relativas al repo),
+        o `None` si falló."""
+        src = factorionline_path+'\\Factorionline'
+        try:
+            match (self.storage_format):
+                case 'unpacked':
+                    paths = savecodec.collect(factorio_saves_path, src, changes.changed, changes.removed)
+                    paths = [os.path.join(src, path) for path in paths]
+                case 'chunked':
+                    paths = chunkstore.collect(factorio_saves_path, src, self.chunk_store, changes.changed, changes.removed)
+                case _:
+                    # Enlazada al worktree, las partidas ya están en el repo
+                    if not isLink(factorio_saves_path) and not self.updateDir(factorio_saves_path, src, changes.entries):
+                        return None
+                    paths = [os.path.join(src, path) for path in changes.changed + changes.removed]
+        except (OSError, ValueError) as e:
+            self.logger.error(f'Could not store saves: {e}', name)
+            return None
+        return [os.path.relpath(path, factorionline_path).replace(os.sep, '/') for path in paths]
+
+
+    def startOutbox (self) -> None:
+        path = os.path.join(factorionline_path, '.git', 'factorionline-outbox.json')
+        self.outbox = PushOutbox(self.logger, path, self.pushPending)
+        if self.connectivity:
+            self.outbox.online = self.connectivity.online
+            self.connectivity.subscribe(self.outbox.setOnline)
+        if self.outbox.pending:
+            self.logger.info(f'{len(self.outbox.pending)} pending push(es) from a previous run.', name)
+        threading.Thread(target=self.outbox.run, daemon=True).start()
+
+
+    def startPrefetcher (self) -> None:
+        if self.connectivity:
+            self.prefetcher.online = self.connectivity.online
+            self.connectivity.subscribe(self.prefetcher.setOnline)
+        threading.Thread(target=self.prefetcher.run, daemon=True).start()
+
+
+    def fetchRepo (self) -> bool:
+        """Fetch silencioso para el prefetcher, no toca el worktree."""
+        with self.fetch_lock:
+            fetched = self.git.fetch(self.fetch_depth)
+        if not fetched:
+            self.logger.warning(f'Prefetch failed: {self.git.last_error}', name)
+            return False
+        if self.connectivity:
+            self.connectivity.reportSuccess()
+        return True
+
+
+    def flushOutbox (self) -> bool:
+        """Sube lo pendiente antes de soltar el lease de la sesión. Sin
+        conexión no se intenta, el outbox lo reintentará después."""
+        if not self.outbox or not self.outbox.online:
+            return False
+        return self.outbox.flush(self.outbox_deadline)
+
+
+    def pushPending (self) -> bool:
+        """Push del outbox. Puede correr sin sesión activa, tras un reinicio."""
+        return self.pushRepo()
+
+
+    def startSquash (self) -> None:
+        """Empieza una sesión de juego: los guardados se irán sumando a un
+        único commit local que el outbox sube al acabar la sesión o el intervalo."""
+        self.squash = None
+        if not self.outbox:
+            return
+        match (self.commit_policy):
+            case 'session':
+                self.outbox.hold(True)
+            case 'interval':
+                self.outbox.batch_delay = self.squash_interval
+            case _:
+                self.outbox.batch_delay = 0
+
+
     def deactivate (self):
-        self.change_handler.deactivate()
+        self.save_detector.deactivate()
+        if self.outbox:
+            # Fin de la sesión, ya se puede subir su commit
+            self.outbox.hold(False)
+            self.outbox.batch_delay = 0
         self.removeDir(factorio_saves_path)
         if self.observer:
             self.observer.stop()
@@ -170,10 +350,20 @@ class FileManager:
 
     def stop (self):
         self.deactivate()
+        self.save_detector.stop()
+        self.prefetcher.stop()
+        if self.outbox:
+            self.outbox.stop()
+            # Sin conexión no se intenta: lo pendiente queda en disco para el próximo arranque
+            if self.outbox.online:
+                self.outbox.flush(self.stop_deadline if self.outbox.failures else self.outbox_deadline)
+        self.git.close()
         self.running = False
 
 
-    def git_progress(self, command, progress_regex, action, repo_path=None, notification:bool=False, text_fields:list=None):
+    def git_progress(self, run, phase:str, action:str, notification:bool=False, text_fields:list=None) -> bool:
+        """Muestra el progreso de una operación de `GitEngine`. `run(on_progress)`
+        la ejecuta; sólo se muestra la fase `phase` (p. ej. 'Receiving objects')."""
         if notification:
             noti = Notification(
                 text_fields[0],
@@ -191,7 +381,7 @@ class FileManager:
             noti.show()
 
 
-        
+        from rich.progress import Progress, BarColumn, TextColumn, TransferSpeedColumn, TimeElapsedColumn
         progress = Progress(
             TextColumn(action, style='bold cyan'),
             BarColumn(),
@@ -200,52 +390,60 @@ class FileManager:
             TimeElapsedColumn(),
             redirect_stdout=True
         )
+        percent = 0
+        def on_progress (report:GitProgress):
+            nonlocal percent
+            if report.phase == phase:
+                percent = report.percent
+                progress.update(task, completed=percent)
+                if notification:
+                    noti.update_progress_bar(percent/100)
+
+        error = None
         with progress:
-            task = progress.add_task(command, total=100)
-            if repo_path:
-                process = subprocess.Popen(
-                    ["git", "-C", repo_path] + command.split()[1:],
-                    stderr=subprocess.PIPE,
-                    text=True,
-                    creationflags=subprocess.CREATE_NO_WINDOW
-                )
-            else:
-                process = subprocess.Popen(
-                    command.split(),
-                    stderr=subprocess.PIPE,
-                    text=True,
-                    creationflags=subprocess.CREATE_NO_WINDOW
-                )
-            for line in process.stderr:
-                if 'Receiving objects' in line or 'Writing objects' in line:
-                    match = progress_regex.search(line)
-                    if match:
-                        percent = int(match.group(1))
-                        progress.update(task, completed=percent)
-                        if notification:
-                            noti.update_progress_bar(percent/100)
-            process.wait()
+            task = progress.add_task(action, total=100)
+            try:
+                success = run(on_progress)
+            except (OSError, ValueError) as e:
+                # Transportes que no son git fallan con excepción
+                success, error = False, e
     
-        if process.returncode == 0:
+        if success:
+            # Un git exitoso demuestra que hay conexión
+            if self.connectivity:
+                self.connectivity.reportSuccess()
             if notification:
                 noti.update_progress_bar(float(percent/100))
                 time.sleep(1)
                 noti.remove()
             return True
         else:
+            if notification:
+                noti.remove()
+            self.logger.error(f'{action} failed: {error or self.git.last_error}', name)
             return False
 
 
 
     def cloneRepo(self):
         self.logger.info('Cloning repo.', name, style='cyan')
-        clone_regex = re.compile(r'Receiving objects:\s+(\d+)%')
         text_fields = [
             'Estamos descargando las partidas compartidas, espere un momento.',
             'Iniciando factorionline.',
             'Clonando repositorio.'
         ]
-        if self.git_progress(f'git clone --progress {repo_url} {factorionline_path}', clone_regex, 'Cloning repo', notification=True, text_fields=text_fields):
+        if not isinstance(self.transport, GitTransport):
+            # Las partidas llegan con el primer pull del transporte
+            try:
+                self.git.init()
+                os.makedirs(self.transport.local_root, exist_ok=True)
+            except Exception as e:
+                self.logger.error(f'Could not create local repo: {e}', name)
+                return False
+            self.logger.info('Local repo created.', name)
+            return True
+        clone = lambda on_progress: self.git.clone(self.repo_url, self.clone_depth, on_progress)
+        if self.git_progress(clone, 'Receiving objects', 'Cloning repo', notification=True, text_fields=text_fields):
             self.add_safe_directory(factorionline_path)
             self.logger.info('Repo cloned.', name)
             return True
@@ -254,26 +452,109 @@ class FileManager:
 
     def pullRepo(self):
         self.logger.info('Pulling repo.', name, style='cyan')
-        pull_regex = re.compile(r'Receiving objects:\s+(\d+)%')
-        if self.git_progress("git pull --progress", pull_regex, 'Pulling repo', repo_path=factorionline_path):
-            self.logger.info('Repo pulled.', name)
+        # Espera a un prefetch en curso, después suele bastar con el fast-forward local
+        with self.fetch_lock:
+            if self.prefetcher.fresh():
+                try:
+                    self.git.fastForward()
+                    self.logger.info('Repo fast-forwarded from prefetch.', name)
+                    return True
+                except Exception as e:
+                    self.logger.warning(f'Prefetch fast-forward failed, pulling: {e}', name)
+            pull = lambda on_progress: self.transport.pull(on_progress, self.fetch_depth)
+            if self.git_progress(pull, 'Receiving objects', 'Pulling repo'):
+                self.logger.info('Repo pulled.', name)
+                self.recordPull()
+                return True
+        if not (self.outbox and self.outbox.pending) and self.resetToRemote():
             return True
         self.logger.info('Repo could not pull.', name)
         return False
 
 
+    def recordPull(self) -> None:
+        """Con un transporte que no es git, lo bajado se commitea en la historia local."""
+        report = self.transport.last_report
+        if not report:
+            return
+        self.logger.info(str(report), name)
+        if report.changed:
+            root = os.path.relpath(self.transport.local_root, factorionline_path)
+            paths = [os.path.join(root, path).replace(os.sep, '/') for path in report.changed]
+            try:
+                self.git.add(paths)
+                self.git.commit(f'Pulled {datetime.now().isoformat()}')
+            except Exception as e:
+                self.logger.error(f'Could not record pull: {e}', name)
+
+
+    def resetToRemote(self) -> bool:
+        """Si la historia remota se compactó (ver `retention`) el pull ya no
+        encaja con la local. Sin commits pendientes de subir no hay nada que
+        perder: se deja el repo igual al remoto."""
+        try:
+            # Sin profundidad: cortar la historia escondería el commit en común
+            if not self.git.resetToUpstream(self.fetch_depth):
+                return False
+            self.logger.warning('Remote history was rewritten, repo reset to remote.', name)
+            return True
+        except Exception as e:
+            self.logger.error(f'Could not reset to remote: {e}', name)
+            return False
+
+
+    def commitRepo(self, paths:list=None) -> str:
+        """Hace commit local y retorna su hash, o `None` si falla. Si se pasan
+        `paths` (relativas al repo) sólo se añaden esas en lugar de re-escanear
+        todo el worktree."""
+        # Mientras hay un push en curso no se reescribe HEAD, se hace un commit nuevo
+        squashing = self.commit_policy != 'each' and self.push_lock.acquire(blocking=False)
+        try:
+            self.git.add(paths)
+            now = datetime.now().isoformat()
+            head = self.git.head()
+            if squashing and self.squash and head and head.hexsha == self.squash['commit']:
+                # Amend: mismo padre, árbol nuevo
+                self.squash['saves'] += 1
+                message = f'{now}\n\nSession: {self.squash["started"]}\nSaves: {self.squash["saves"]}'
+                commit = self.git.commit(message, amend=True)
+            else:
+                commit = self.git.commit(now)
+                self.squash = {'commit': None, 'started': now, 'saves': 1}
+            self.squash['commit'] = commit
+            return commit
+        except Exception as e:
+            self.logger.error(f'Could not commit: {e}', name)
+            return None
+        finally:
+            if squashing:
+                self.push_lock.release()
+
+
     def pushRepo(self):
         self.logger.info('Pushing repo', name, style='cyan')
-        push_regex = re.compile(r'Writing objects:\s+(\d+)%')
-        self.repo.git.add(all=True)
-        self.repo.index.commit(datetime.now().isoformat())
+        if self.fence and not self.fence():
+            self.logger.error('Session lease is not ours. Push refused.', name)
+            return False
         text_fields = [
             'Estamos subiendo tu progreso al repositorio.',
             'Guardando progreso.',
             'Subiendo datos.'
         ]
-        if self.git_progress('git push --progress', push_regex, 'Pushing repo', repo_path=factorionline_path, notification=True, text_fields=text_fields):
-            self.logger.info('Repo pushed.', name, style='bold cyan')
-            return True
+        try:
+            with self.push_lock:
+                head = self.git.head()
+                head = head.hexsha if head else None
+                if self.git_progress(self.transport.push, 'Writing objects', 'Pushing repo', notification=True, text_fields=text_fields):
+                    self.logger.info('Repo pushed.', name, style='bold cyan')
+                    if self.transport.last_report:
+                        self.logger.info(str(self.transport.last_report), name)
+                    # Publicado: ya no se puede reescribir, el próximo guardado empieza commit
+                    if self.squash and self.squash['commit'] == head:
+                        self.squash = None
+                    return True
+        finally:
+            if self.fence_release:
+                self.fence_release()
         self.logger.info('Repo could not push.', name, style='bold cyan')
         return False
\ No newline at end of file
@@ -0,0 +1,179 @@
+import os
+import re
+import threading
+import subprocess
+
+from dataclasses import dataclass
+
+name = 'GitEngine' # For log
+PROGRESS_REGEX = re.compile(r'(?P<phase>[A-Za-z][A-Za-z ]*):\s+(?P<percent>\d+)%(?:\s+\((?P<current>\d+)/(?P<total>\d+)\))?')
+
+
+@dataclass
+class GitProgress:
+    """Una línea de progreso de git, p. ej. `Receiving objects:  42% (420/1000)`."""
+    phase:str
+    percent:int
+    current:int = 0
+    total:int = 0
+
+
+
+class GitEngine:
+    """Punto único de acceso a git para el repo de partidas.
+
+    Mantiene abierto un `git.Repo` durante toda la sesión: índice, commits y
+    referencias se manejan dentro del proceso y las lecturas de objetos van
+    por los `cat-file --batch` persistentes de GitPython, sin lanzar un git
+    por operación. Sólo lo que necesita red (clone, fetch, pull, push) corre
+    como subproceso, con los argumentos en lista y el progreso parseado a
+    `GitProgress`."""
+    def __init__(self, path:str):
+        self.path = path
+        self._repo = None
+        self.last_error = ''
+        self.lock = threading.RLock()
+
+
+    @property
+    def repo (self) -> 'git.Repo':
+        with self.lock:
+            if self._repo is None:
+                import git
+                self._repo = git.Repo(self.path)
+            return self._repo
+
+
+    def close (self) -> None:
+        """Suelta el repo y termina sus procesos `cat-file` persistentes."""
+        with self.lock:
+            if self._repo is not None:
+                self._repo.close()
+                self._repo = None
+
+
+    def progress (self, args:list, on_progress=None, cwd:str=None) -> bool:
+        """Corre `git <args>` informando el avance a `on_progress(GitProgress)`.
+        Sin `cwd` corre dentro del repo."""
+        command = ['git', '-C', cwd if cwd else self.path, *args]
+        # text=True convierte los '\r' del progreso en saltos de línea
+        process = subprocess.Popen(
+            command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+            creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+        )
+        errors = []
+        for line in process.stderr:
+            match = PROGRESS_REGEX.search(line)
+            if not match:
+                errors.append(line)
+                continue
+            if on_progress:
+                on_progress(GitProgress(
+                    match.group('phase').strip(), int(match.group('percent')),
+                    int(match.group('current') or 0), int(match.group('total') or 0)
+                ))
+        process.wait()
+        if process.returncode != 0:
+            self.last_error = ''.join(errors[-5:]).strip()
+        return process.returncode == 0
+
+
+    def clone (self, url:str, depth:int=None, on_progress=None) -> bool:
+        parent, target = os.path.split(os.path.normpath(self.path))
+        depth = ['--depth', str(depth)] if depth else []
+        return self.progress(['clone', '--progress', *depth, url, target], on_progress, cwd=parent)
+
+
+    def init (self) -> None:
+        """Repo local vacío, para cuando las partidas no vienen de un remoto de git."""
+        with self.lock:
+            import git
+            self._repo = git.Repo.init(self.path)
+
+
+    def pull (self, depth:int=None, on_progress=None) -> bool:
+        depth = ['--depth', str(depth)] if depth else []
+        return self.progress(['pull', '--progress', *depth], on_progress)
+
+
+    def push (self, on_progress=None) -> bool:
+        return self.progress(['push', '--progress'], on_progress)
+
+
+    def fetch (self, depth:int=None, remote:str='origin', *refs) -> bool:
+        depth = [f'--depth={depth}'] if depth else []
+        return self.progress(['fetch', '--quiet', *depth, remote, *refs])
+
+
+    def add (self, paths:list=None) -> None:
+        """Como `git add -A -- paths` pero escribiendo los blobs y el índice
+        dentro del proceso. Sin `paths` re-escanea todo el worktree."""
+        with self.lock:
+            if not paths:
+                self.repo.git.add(all=True)
+                return
+            index = self.repo.index
+            present = [path for path in paths if os.path.isfile(os.path.join(self.path, path))]
+            removed = [path for path in paths if path not in present and (path, 0) in index.entries]
+            if present:
+                index.add(present)
+            if removed:
+                index.remove(removed)
+
+
+    def head (self) -> 'git.Commit':
+        """Commit de HEAD, o `None` en un repo sin commits."""
+        with self.lock:
+            return self.repo.head.commit if self.repo.head.is_valid() else None
+
+
+    def commit (self, message:str, amend:bool=False) -> str:
+        """Commit del índice. Con `amend` reemplaza HEAD manteniendo sus padres."""
+        with self.lock:
+            head = self.head()
+            if amend and head:
+                commit = self.repo.index.commit(message, parent_commits=head.parents, head=True)
+            else:
+                commit = self.repo.index.commit(message)
+            return commit.hexsha
+
+
+    def fastForward (self) -> None:
+        with self.lock:
+            self.repo.git.merge('--ff-only', '@{u}')
+
+
+    def resetToUpstream (self, depth:int=None) -> bool:
+        """Deja el branch igual a su upstream sólo si la historia remota se
+        reescribió (no queda ningún commit en común) y el worktree está
+        limpio. Retorna `False` si no hace falta o no se pudo; un pull que
+        falló por red, locks o un merge no llega a resetear nada."""
+        with self.lock:
+            if self.repo.is_dirty(untracked_files=True):
+                self.last_error = 'Worktree has uncommitted changes, not resetting'
+                return False
+            branch = self.repo.active_branch
+            tracking = branch.tracking_branch()
+            if not tracking or not self.fetch(depth, tracking.remote_name, branch.name):
+                return False
+            if self.repo.merge_base(tracking.commit, branch.commit):
+                # Historia relacionada: el pull falló por otra cosa
+                return False
+            self.repo.git.reset('--hard', tracking.name)
+            return True
+
+
+    @staticmethod
+    def addSafeDirectory (path:str) -> bool:
+        """Marca `path` como `safe.directory` en la config global, sin lanzar git.
+        Retorna `False` si ya estaba."""
+        import git
+        with git.GitConfigParser(git.config.get_config_path('global'), read_only=False) as config:
+            try:
+                safe_dirs = config.get_values('safe', 'directory')
+            except Exception:
+                safe_dirs = []
+            if path in safe_dirs:
+                return False
+            config.add_value('safe', 'directory', path)
+        return True
@@ -0,0 +1,185 @@
+import time
+import sqlite3
+import asyncio
+import threading
+
+from dataclasses import dataclass, asdict
+
+name = 'Lease' # For log
+
+
+@dataclass
+class Lease:
+    """Permiso temporal para jugar la partida compartida.
+    `token` crece cada vez que cambia el dueño (fencing token)."""
+    holder:str
+    user:str
+    token:int
+    expires:float
+
+    def expired (self, now:float=None) -> bool:
+        return (now or time.time()) >= self.expires
+
+
+
+class LeaseWatch:
+    """Suscripción activa a los cambios del lease."""
+    def __init__(self, unsubscribe):
+        self.unsubscribe = unsubscribe
+
+
+
+class LeaseBackend:
+    """Interfaz del lock de sesión. Las subclases sólo implementan
+    `_transact`, que ejecuta `fn` sobre el documento del lease de forma
+    atómica (compare-and-set).
+
+    `fn` recibe el documento actual (`dict` o `None`) y retorna una tupla
+    `(nuevo_documento, resultado)`. Si `nuevo_documento` es `None` no se escribe nada."""
+    def __init__(self, ttl:float=90):
+        self.ttl = ttl
+        # Peticiones de red hechas, para medir el coste de cada operación
+        self.round_trips = 0
+
+
+    async def _transact (self, fn):
+        raise NotImplementedError
+
+
+    async def acquire (self, holder:str, user:str) -> Lease:
+        """Toma el lease si está libre, vencido o ya es nuestro. Retorna `None`
+        si otro cliente lo tiene."""
+        def fn (doc):
+            now = time.time()
+            if doc and doc['holder'] != holder and doc['expires'] > now:
+                return None, None
+            token = doc['token'] if doc else 0
+            if not doc or doc['holder'] != holder or doc['expires'] <= now:
+                token += 1
+            lease = Lease(holder, user, token, now + self.ttl)
+            return asdict(lease), lease
+        return await self._transact(fn)
+
+
+    async def renew (self, lease:Lease) -> Lease:
+        """Extiende el lease. Retorna `None` si alguien más lo tomó."""
+        def fn (doc):
+            if not doc or doc['token'] != lease.token or doc['holder'] != lease.holder:
+                return None, None
+            renewed = Lease(lease.holder, lease.user, lease.token, time.time() + self.ttl)
+            return asdict(renewed), renewed
+        return await self._transact(fn)
+
+
+    async def heartbeat (self, lease:Lease) -> tuple:
+        """Renueva el lease y comprueba el estado del servidor en una sola
+        operación. Retorna `(lease_renovado, servidor_en_linea)`; el lease es
+        `None` si alguien más lo tomó."""
+        return await self.renew(lease), True
+
+
+    async def release (self, lease:Lease) -> bool:
+        """Libera el lease conservando el token para que siga siendo monótono."""
+        def fn (doc):
+            if not doc or doc['token'] != lease.token or doc['holder'] != lease.holder:
+                return None, False
+            return dict(doc, expires=0), True
+        return await self._transact(fn)
+
+
+    async def current (self) -> Lease:
+        """Retorna el lease vigente, o `None` si está libre."""
+        def fn (doc):
+            if not doc or doc['expires'] <= time.time():
+                return None, None
+            return None, Lease(**doc)
+        return await self._transact(fn)
+
+
+    async def validate (self, token:int) -> bool:
+        """Retorna `True` si `token` sigue siendo el dueño vigente del lease."""
+        lease = await self.current()
+        return bool(lease) and lease.token == token
+
+
+    def watch (self, callback) -> LeaseWatch:
+        """Llama a `callback(lease)` con el estado actual y en cada cambio del
+        lease, desde cualquier hilo. Retorna `None` si el backend no soporta
+        suscripciones y hay que consultar con `current`."""
+        return None
+
+
+
+class InMemoryLeaseBackend(LeaseBackend):
+    """Backend local para pruebas sin conexión. Se puede compartir entre hilos."""
+    def __init__(self, ttl:float=90):
+        super().__init__(ttl)
+        self.doc = None
+        self.lock = threading.Lock()
+        self.watchers = []
+
+
+    async def _transact (self, fn):
+        with self.lock:
+            self.round_trips += 1
+            doc, result = fn(dict(self.doc) if self.doc else None)
+            if doc is not None:
+                self.doc = doc
+            watchers = list(self.watchers) if doc is not None else []
+        for callback in watchers:
+            callback(Lease(**doc))
+        return result
+
+
+    def watch (self, callback) -> LeaseWatch:
+        with self.lock:
+            self.watchers.append(callback)
+            doc = self.doc
+        callback(Lease(**doc) if doc else None)
+        def unsubscribe ():
+            with self.lock:
+                if callback in self.watchers:
+                    self.watchers.remove(callback)
+        return LeaseWatch(unsubscribe)
+
+
+
+class SQLiteLeaseBackend(LeaseBackend):
+    """Backend sobre un archivo SQLite. Sirve para probar contención entre
+    procesos sin conexión."""
+    def __init__(self, path:str, ttl:float=90):
+        super().__init__(ttl)
+        self.path = path
+        with sqlite3.connect(self.path) as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS lease ('
+                'id INTEGER PRIMARY KEY CHECK (id = 0), '
+                'holder TEXT, user TEXT, token INTEGER, expires REAL)'
+            )
+
+
+    def _transactSync (self, fn):
+        connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            row = connection.execute('SELECT holder, user, token, expires FROM lease WHERE id = 0').fetchone()
+            current = dict(zip(('holder', 'user', 'token', 'expires'), row)) if row else None
+            doc, result = fn(current)
+            if doc is not None:
+                connection.execute(
+                    'INSERT OR REPLACE INTO lease (id, holder, user, token, expires) VALUES (0, ?, ?, ?, ?)',
+                    (doc['holder'], doc['user'], doc['token'], doc['expires'])
+                )
+            connection.execute('COMMIT')
+            return result
+        except Exception:
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            raise
+        finally:
+            connection.close()
+
+
+    async def _transact (self, fn):
+        self.round_trips += 1
+        return await asyncio.to_thread(self._transactSync, fn)
@@ -1,33 +1,32 @@
-import rich
-import inspect
 import logging
 
-from rich.logging import RichHandler
-from rich.text import Text
-from rich.console import Console
-from rich.traceback import install
 from datetime import datetime
 from dataclasses import dataclass
 from collections import namedtuple
 
-# Instalar el manejador de excepciones de Rich para mostrar trazas bonitas
-install(show_locals=True)
 
-# Configurar el logger con RichHandler
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="%(message)s",
-    datefmt="[%X]",
-    handlers=[RichHandler(
-        rich_tracebacks=True,
-        tracebacks_show_locals=True,
-        show_time=True,
-        show_path=True,
-        markup=True,
-        omit_repeated_times=False,
-        tracebacks_extra_lines=2
-    )]
-)
+def configureRich (show_locals:bool=False) -> None:
+    """Configura el logger con RichHandler. Sólo se llama si hay que mostrar
+    logs, así el arranque sin debug no carga rich."""
+    from rich.logging import RichHandler
+    if show_locals:
+        # Instalar el manejador de excepciones de Rich para mostrar trazas bonitas
+        from rich.traceback import install
+        install(show_locals=True)
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format="%(message)s",
+        datefmt="[%X]",
+        handlers=[RichHandler(
+            rich_tracebacks=True,
+            tracebacks_show_locals=show_locals,
+            show_time=True,
+            show_path=True,
+            markup=True,
+            omit_repeated_times=False,
+            tracebacks_extra_lines=2
+        )]
+    )
 
 @dataclass
 class LogEventContainer:
@@ -59,11 +58,17 @@ class Log:
         'red',
         'white on red'
     ]
-    def __init__(self, debug=True):
-        self.console = Console()
-        self.console.clear()
+    def __init__(self, debug=True, show_locals:bool=False):
         self.logger = logging.getLogger('Logger')
         self._debug = debug
+        self.console = None
+        if debug:
+            from rich.console import Console
+            configureRich(show_locals)
+            self.console = Console()
+            # Sin terminal (pythonw, tarea programada) no hay nada que limpiar
+            if self.console.is_terminal:
+                self.console.clear()
 
 
     def _log (self, level:int, text:str, parent:any=None, style:str='') -> None:
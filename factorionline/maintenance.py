@@ -0,0 +1,197 @@
+import os
+import sys
+import json
+import time
+import shutil
+import signal
+import threading
+import subprocess
+
+from dataclasses import dataclass
+
+from .logger import Log
+from .retention import repoSize
+
+name = 'Maintenance' # For log
+DAY = 86400
+
+
+@dataclass
+class MaintenanceTask:
+    name:str
+    args:tuple
+    # Segundos mínimos entre dos ejecuciones
+    interval:float
+    # Locks (relativos a .git) que deja el task si se lo mata a medias
+    locks:tuple = ()
+
+
+TASKS = (
+    MaintenanceTask('repack', ('repack', '-d', '-l', '-q'), DAY),
+    MaintenanceTask('commit-graph', ('commit-graph', 'write', '--reachable'), DAY,
+                    ('objects/info/commit-graph.lock', 'objects/info/commit-graphs/commit-graph-chain.lock')),
+    MaintenanceTask('prune', ('prune', '--expire=2.weeks.ago'), 7 * DAY),
+    MaintenanceTask('gc', ('gc', '--quiet', '--prune=2.weeks.ago'), 7 * DAY, ('gc.pid', 'packed-refs.lock')),
+)
+
+
+class MaintenanceScheduler:
+    """Mantenimiento de git del repo de partidas mientras no se juega.
+
+    Tras `idle_delay` segundos sin el juego abierto corre los tasks que
+    tocan, uno por uno y con prioridad baja de CPU y disco. `setIdle(False)`
+    mata el task en curso al instante. Duración y espacio recuperado de cada
+    ejecución se guardan en `.git/factorionline-maintenance.json`."""
+    def __init__(self, logger:Log, repo_path:str, tasks:tuple=TASKS, idle_delay:float=120):
+        self.logger = logger
+        self.repo_path = repo_path
+        self.tasks = tasks
+        self.idle_delay = idle_delay
+        self.idle = False
+        self.idle_since = 0
+        self.running = False
+        self.process = None
+        self.cancelled = False
+        self.condition = threading.Condition()
+        self.stats_path = os.path.join(repo_path, '.git', 'factorionline-maintenance.json')
+
+
+    def setIdle (self, idle:bool) -> None:
+        with self.condition:
+            if idle and not self.idle:
+                self.idle_since = time.monotonic()
+            self.idle = idle
+            if not idle:
+                self.cancel()
+            self.condition.notify()
+
+
+    def cancel (self) -> None:
+        """Mata el task en curso. Se llama con `condition` tomado."""
+        if self.process and self.process.poll() is None:
+            self.cancelled = True
+            # gc lanza repack y otros hijos, hay que matar el árbol entero
+            try:
+                if sys.platform == 'win32':
+                    subprocess.run(['taskkill', '/T', '/F', '/PID', str(self.process.pid)], capture_output=True,
+                                   creationflags=subprocess.CREATE_NO_WINDOW)
+                else:
+                    os.killpg(self.process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                # Terminó solo entre `poll` y `killpg`: su resultado vale
+                self.cancelled = False
+            except OSError as e:
+                self.logger.warning(f'Could not kill maintenance task: {e}', name)
+
+
+    def loadStats (self) -> dict:
+        try:
+            with open(self.stats_path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+
+    def saveStats (self, stats:dict) -> None:
+        temp_path = self.stats_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(stats, file, indent=2)
+        os.replace(temp_path, self.stats_path)
+
+
+    def nextDue (self) -> float:
+        """Segundos hasta que toque el próximo task, 0 si ya hay alguno pendiente."""
+        stats = self.loadStats()
+        now = time.time()
+        return max(0, min(stats.get(task.name, {}).get('last_run', 0) + task.interval - now for task in self.tasks))
+
+
+    def command (self, args:tuple) -> tuple:
+        """Comando y flags de `Popen` para correr git con prioridad baja."""
+        command = ['git', '-C', self.repo_path, *args]
+        if sys.platform == 'win32':
+            return command, {'creationflags': subprocess.IDLE_PRIORITY_CLASS | subprocess.CREATE_NO_WINDOW}
+        if shutil.which('ionice'):
+            command = ['ionice', '-c', '3'] + command
+        return command, {'preexec_fn': lambda: os.nice(19), 'start_new_session': True}
+
+
+    def runTask (self, task:MaintenanceTask) -> dict:
+        command, options = self.command(task.args)
+        size_before = repoSize(self.repo_path)
+        start = time.monotonic()
+        with self.condition:
+            if not self.idle or not self.running:
+                return None
+            self.cancelled = False
+            self.process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, **options)
+        _, stderr = self.process.communicate()
+        with self.condition:
+            returncode, cancelled = self.process.returncode, self.cancelled
+            self.process = None
+        result = {'last_run': time.time(), 'duration': round(time.monotonic() - start, 3)}
+        if cancelled:
+            for lock in task.locks:
+                lock_path = os.path.join(self.repo_path, '.git', lock)
+                if os.path.exists(lock_path):
+                    os.remove(lock_path)
+            result['status'] = 'cancelled'
+            # No cuenta como ejecutado, se reintenta en el próximo rato libre
+            result['last_run'] = self.loadStats().get(task.name, {}).get('last_run', 0)
+            self.logger.info(f'{task.name} cancelled after {result["duration"]:.1f}s.', name)
+            return result
+        result['reclaimed'] = size_before - repoSize(self.repo_path)
+        if returncode == 0:
+            result['status'] = 'ok'
+            self.logger.info(f'{task.name} took {result["duration"]:.1f}s, reclaimed {result["reclaimed"] / 2**20:.1f} MB.', name)
+        else:
+            result['status'] = 'failed'
+            self.logger.error(f'{task.name} failed: {stderr.strip()}', name)
+        return result
+
+
+    def runDue (self) -> None:
+        stats = self.loadStats()
+        now = time.time()
+        for task in self.tasks:
+            if stats.get(task.name, {}).get('last_run', 0) + task.interval > now:
+                continue
+            result = self.runTask(task)
+            if result is None:
+                return
+            stats[task.name] = result
+            self.saveStats(stats)
+            if result['status'] == 'cancelled':
+                return
+
+
+    def run (self) -> None:
+        self.running = True
+        self.logger.info('Running MaintenanceScheduler', name, style='bold green')
+        while True:
+            with self.condition:
+                while self.running:
+                    if self.idle and os.path.isdir(os.path.join(self.repo_path, '.git')):
+                        remaining = max(self.idle_since + self.idle_delay - time.monotonic(), self.nextDue())
+                        if remaining <= 0:
+                            break
+                        self.condition.wait(remaining)
+                    else:
+                        self.condition.wait()
+                if not self.running:
+                    break
+            try:
+                self.runDue()
+            except Exception as e:
+                self.logger.error(f'Maintenance failed: {e}', name)
+                with self.condition:
+                    # No insistir hasta el próximo rato libre
+                    self.idle_since = time.monotonic()
+        self.logger.info('MaintenanceScheduler stoped.', name)
+
+
+    def stop (self) -> None:
+        with self.condition:
+            self.running = False
+            self.cancel()
+            self.condition.notify()
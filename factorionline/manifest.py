@@ -0,0 +1,102 @@
+import os
+import sqlite3
+import threading
+import concurrent.futures
+
+from dataclasses import dataclass, field
+
+from .mirror import buildManifest, hashFile
+
+name = 'Manifest' # For log
+
+
+@dataclass
+class ManifestChanges:
+    """Resultado de `ManifestIndex.scan`. `stale` son los archivos que se
+    hashearon de nuevo y se escriben en el índice con `commit`."""
+    root:str
+    entries:dict
+    changed:list = field(default_factory=list)
+    removed:list = field(default_factory=list)
+    stale:list = field(default_factory=list)
+
+    @property
+    def empty (self) -> bool:
+        return not self.changed and not self.removed
+
+
+
+class ManifestIndex:
+    """Índice persistente en SQLite de (tamaño, mtime, inodo, hash) por archivo.
+
+    Sólo se vuelven a hashear los archivos cuyo stat cambió, en un pool de
+    hilos y leyendo con mmap. Así se sabe qué partidas cambiaron de verdad sin
+    que git tenga que re-escanear todo el worktree."""
+    def __init__(self, path:str, workers:int=None):
+        self.path = path
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS files ('
+                'root TEXT, path TEXT, size INTEGER, mtime_ns INTEGER, inode INTEGER, hash TEXT, '
+                'PRIMARY KEY (root, path))'
+            )
+
+
+    def refresh (self, root:str) -> ManifestChanges:
+        """Escanea `root`, actualiza el índice y retorna qué archivos cambiaron
+        de contenido desde la última vez."""
+        changes = self.scan(root)
+        self.commit(changes)
+        return changes
+
+
+    def scan (self, root:str) -> ManifestChanges:
+        """Como `refresh` pero sin tocar el índice: si lo que se hace con los
+        cambios falla, el próximo `scan` los vuelve a reportar."""
+        root = os.path.normpath(root)
+        entries = buildManifest(root)
+        with self.lock:
+            rows = {
+                path: (size, mtime_ns, inode, digest)
+                for path, size, mtime_ns, inode, digest in self.connection.execute(
+                    'SELECT path, size, mtime_ns, inode, hash FROM files WHERE root = ?', (root,)
+                )
+            }
+        stale = []
+        for relpath, entry in entries.items():
+            row = rows.get(relpath)
+            if row and row[:3] == (entry.size, entry.mtime_ns, entry.inode):
+                entry.hash = row[3]
+            else:
+                stale.append(relpath)
+        with concurrent.futures.ThreadPoolExecutor(self.workers) as pool:
+            for relpath, digest in zip(stale, pool.map(hashFile, [entries[relpath].path for relpath in stale])):
+                entries[relpath].hash = digest
+
+        changes = ManifestChanges(root, entries, stale=stale)
+        changes.changed = sorted(relpath for relpath in stale if relpath not in rows or rows[relpath][3] != entries[relpath].hash)
+        changes.removed = sorted(rows.keys() - entries.keys())
+        return changes
+
+
+    def commit (self, changes:ManifestChanges) -> None:
+        """Guarda en el índice lo visto por `scan`."""
+        entries = changes.entries
+        with self.lock, self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO files (root, path, size, mtime_ns, inode, hash) VALUES (?, ?, ?, ?, ?, ?)',
+                [(changes.root, relpath, entries[relpath].size, entries[relpath].mtime_ns, entries[relpath].inode, entries[relpath].hash)
+                 for relpath in changes.stale]
+            )
+            self.connection.executemany(
+                'DELETE FROM files WHERE root = ? AND path = ?',
+                [(changes.root, relpath) for relpath in changes.removed]
+            )
+
+
+    def close (self) -> None:
+        with self.lock:
+            self.connection.close()
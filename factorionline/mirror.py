@@ -0,0 +1,232 @@
+import os
+import sys
+import stat
+import errno
+import shutil
+import filecmp
+import mmap
+import hashlib
+
+from dataclasses import dataclass
+
+name = 'Mirror' # For log
+CHUNK_SIZE = 1024 * 1024
+FICLONE = 0x40049409 # ioctl de Linux para reflinks (btrfs, xfs)
+
+
+def hashFile (path:str) -> str:
+    """SHA-256 del archivo leído con mmap. hashlib suelta el GIL con bloques
+    grandes, así que varias llamadas en hilos distintos corren en paralelo."""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        if size:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+                for offset in range(0, size, CHUNK_SIZE):
+                    sha.update(view[offset:offset + CHUNK_SIZE])
+    return sha.hexdigest()
+
+
+@dataclass
+class FileEntry:
+    size:int
+    mtime_ns:int
+    path:str
+    hash:str = None
+    inode:int = 0
+
+    def digest (self) -> str:
+        """Hash del contenido, se calcula sólo la primera vez que hace falta."""
+        if self.hash is None:
+            self.hash = hashFile(self.path)
+        return self.hash
+
+
+
+@dataclass
+class MirrorStats:
+    copied:int = 0
+    deleted:int = 0
+    unchanged:int = 0
+    bytes_copied:int = 0
+    # Bytes publicados sin escribir datos nuevos en disco (reflink, hardlink)
+    bytes_shared:int = 0
+
+
+
+class FileCopier:
+    """Copia archivos con el método más barato que soporte el sistema de archivos.
+
+    Métodos:
+    - 'auto': reflink, luego `copy_file_range`, luego copia normal.
+    - 'reflink': clon copy-on-write, sólo si el disco lo soporta.
+    - 'hardlink': ambos nombres apuntan a los mismos datos. Sólo es seguro si
+      quien escribe reemplaza el archivo en vez de modificarlo en el sitio.
+    - 'copy': copia normal con `shutil.copy2`.
+
+    Un método que falla por falta de soporte no se vuelve a intentar."""
+    SHARED = ('reflink', 'hardlink')
+    def __init__(self, method:str='auto'):
+        self.method = method
+        self.unsupported = set()
+
+
+    def copy (self, src:str, dst:str) -> str:
+        """Copia `src` en `dst` (que no debe existir). Retorna el método usado."""
+        match (self.method):
+            case 'auto':
+                candidates = ('reflink', 'copy_file_range')
+            case 'copy':
+                candidates = ()
+            case _:
+                candidates = (self.method,)
+        methods = {'reflink': self.reflink, 'copy_file_range': self.copyRange, 'hardlink': self.hardlink}
+        for method in candidates:
+            if method in self.unsupported:
+                continue
+            try:
+                methods[method](src, dst)
+                return method
+            except OSError as e:
+                if os.path.lexists(dst):
+                    os.remove(dst)
+                if e.errno in (errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.ENOSYS, errno.EPERM, None):
+                    self.unsupported.add(method)
+                else:
+                    raise
+        shutil.copy2(src, dst)
+        return 'copy'
+
+
+    def reflink (self, src:str, dst:str) -> None:
+        if not sys.platform.startswith('linux'):
+            raise OSError(errno.EOPNOTSUPP, 'reflink not supported on this platform')
+        import fcntl
+        with open(src, 'rb') as source, open(dst, 'wb') as target:
+            fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+        shutil.copystat(src, dst)
+
+
+    def copyRange (self, src:str, dst:str) -> None:
+        if not hasattr(os, 'copy_file_range'):
+            raise OSError(errno.ENOSYS, 'copy_file_range not available')
+        with open(src, 'rb') as source, open(dst, 'wb') as target:
+            remaining = os.fstat(source.fileno()).st_size
+            while remaining > 0:
+                copied = os.copy_file_range(source.fileno(), target.fileno(), remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+        shutil.copystat(src, dst)
+
+
+    def hardlink (self, src:str, dst:str) -> None:
+        os.link(src, dst)
+
+
+
+def buildManifest (root:str) -> dict:
+    """Retorna `{ruta_relativa: FileEntry}` de todos los archivos bajo `root`."""
+    manifest = {}
+    if not os.path.isdir(root):
+        return manifest
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            stat = os.stat(path)
+            manifest[os.path.relpath(path, root)] = FileEntry(stat.st_size, stat.st_mtime_ns, path, inode=stat.st_ino)
+    return manifest
+
+
+def sameFile (a:FileEntry, b:FileEntry) -> bool:
+    if a.size != b.size:
+        return False
+    if a.mtime_ns == b.mtime_ns:
+        return True
+    if a.hash is not None and b.hash is not None:
+        return a.hash == b.hash
+    # Sin hashes previos, comparar byte a byte corta en la primera diferencia
+    return filecmp.cmp(a.path, b.path, shallow=False)
+
+
+def isLink (path:str) -> bool:
+    """`True` si `path` es un symlink o una junction de Windows."""
+    if os.path.islink(path):
+        return True
+    try:
+        reparse_tag = getattr(os.lstat(path), 'st_reparse_tag', 0)
+    except FileNotFoundError:
+        return False
+    return reparse_tag and reparse_tag == getattr(stat, 'IO_REPARSE_TAG_MOUNT_POINT', None)
+
+
+def linkDir (target:str, link:str) -> None:
+    """Crea `link` apuntando a la carpeta `target`. En Windows, si no hay
+    permiso para symlinks, usa una junction que no lo necesita."""
+    try:
+        os.symlink(target, link, target_is_directory=True)
+    except OSError:
+        if sys.platform != 'win32':
+            raise
+        import subprocess
+        subprocess.run(['cmd', '/c', 'mklink', '/J', link, target], check=True,
+                       stdout=subprocess.DEVNULL, creationflags=subprocess.CREATE_NO_WINDOW)
+
+
+def stagingPath (dst:str) -> str:
+    """Carpeta de staging junto a `dst`, en el mismo disco para que `os.replace` sea atómico."""
+    parent, base = os.path.split(os.path.normpath(dst))
+    return os.path.join(parent, f'.{base}.staging')
+
+
+def mirror (src:str, dst:str, method:str='auto', source:dict=None, target:dict=None) -> MirrorStats:
+    """Deja `dst` igual a `src` copiando sólo lo nuevo o modificado y borrando
+    lo que ya no existe. Cada archivo se escribe primero en una carpeta de
+    staging y se publica con `os.replace`, así `dst` nunca desaparece ni
+    expone archivos a medio copiar. `method` es el de `FileCopier`.
+    `source` y `target` son manifiestos ya calculados (p. ej. por `ManifestIndex`)."""
+    stats = MirrorStats()
+    copier = FileCopier(method)
+    source = source if source is not None else buildManifest(src)
+    target = target if target is not None else buildManifest(dst)
+    staging = stagingPath(dst)
+    os.makedirs(dst, exist_ok=True)
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    try:
+        staged = []
+        for relpath, entry in source.items():
+            current = target.get(relpath)
+            if current and sameFile(entry, current):
+                stats.unchanged += 1
+                continue
+            staged_path = os.path.join(staging, relpath)
+            os.makedirs(os.path.dirname(staged_path), exist_ok=True)
+            if copier.copy(entry.path, staged_path) in FileCopier.SHARED:
+                stats.bytes_shared += entry.size
+            else:
+                stats.bytes_copied += entry.size
+            staged.append(relpath)
+        # Publicar
+        for relpath in staged:
+            final_path = os.path.join(dst, relpath)
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(os.path.join(staging, relpath), final_path)
+            stats.copied += 1
+        for relpath in target.keys() - source.keys():
+            os.remove(os.path.join(dst, relpath))
+            stats.deleted += 1
+        syncDirs(src, dst)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return stats
+
+
+def syncDirs (src:str, dst:str) -> None:
+    """Crea las carpetas vacías de `src` en `dst` y borra las que sobran."""
+    for dirpath, _, _ in os.walk(src):
+        os.makedirs(os.path.join(dst, os.path.relpath(dirpath, src)), exist_ok=True)
+    for dirpath, _, _ in os.walk(dst, topdown=False):
+        relpath = os.path.relpath(dirpath, dst)
+        if relpath != '.' and not os.path.isdir(os.path.join(src, relpath)) and not os.listdir(dirpath):
+            os.rmdir(dirpath)
@@ -0,0 +1,156 @@
+import os
+import json
+import time
+import random
+import threading
+
+from .logger import Log
+from .recovery import RetryPolicy
+
+name = 'Outbox' # For log
+
+
+class PushOutbox:
+    """Cola persistente de pushes pendientes.
+
+    Cada guardado hace commit local y se anota aquí; un hilo aparte hace el
+    push cuando hay conexión, con backoff si falla. Se guarda en disco para
+    reintentar tras reiniciar la app y sólo se conserva el último estado de
+    cada partida (el push sube todos los commits locales de una vez).
+
+    `batch_delay` retrasa el push hasta que lo más viejo pendiente tenga esa
+    edad y `hold` lo pausa del todo; así los autosaves se agrupan en un único
+    commit antes de subirlo."""
+    def __init__(self, logger:Log, path:str, push, policy:RetryPolicy=None):
+        self.logger = logger
+        self.path = path
+        self.push = push
+        self.policy = policy if policy else RetryPolicy(base_delay=5, factor=2, max_delay=600)
+        self.pending = self.load()
+        self.online = True
+        self.held = False
+        self.batch_delay = 0
+        self.running = False
+        self.failures = 0
+        self.next_attempt = 0
+        self.condition = threading.Condition()
+        self.push_lock = threading.Lock()
+
+
+    def load (self) -> dict:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+
+    def save (self) -> None:
+        """Escribe el outbox de forma atómica. Se llama con `condition` tomado."""
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.pending, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.path)
+
+
+    def put (self, world:str, commit:str) -> None:
+        with self.condition:
+            # `time` es cuándo se anotó por primera vez, para `batch_delay`
+            since = self.pending.get(world, {}).get('time', time.time())
+            self.pending[world] = {'commit': commit, 'time': since}
+            self.save()
+            self.next_attempt = 0
+            self.condition.notify()
+
+
+    def setOnline (self, online:bool) -> None:
+        """Callback de ConnectivityMonitor: al volver la conexión se reintenta ya."""
+        with self.condition:
+            self.online = online
+            if online:
+                self.next_attempt = 0
+            self.condition.notify()
+
+
+    def hold (self, held:bool) -> None:
+        """Pausa o reanuda los pushes en segundo plano. `flush` no se pausa."""
+        with self.condition:
+            self.held = held
+            self.condition.notify()
+
+
+    def readyAt (self) -> float:
+        """Instante (monotonic) desde el que se puede hacer push, o `None` si
+        no hay que hacerlo. Se llama con `condition` tomado."""
+        if not self.pending or not self.online or self.held:
+            return None
+        oldest = min(entry['time'] for entry in self.pending.values())
+        batch_ready = time.monotonic() + oldest + self.batch_delay - time.time()
+        return max(self.next_attempt, batch_ready)
+
+
+    def pushOnce (self) -> bool:
+        """Intenta subir todo lo pendiente. Retorna `True` si no queda nada."""
+        with self.push_lock:
+            with self.condition:
+                if not self.pending:
+                    return True
+                snapshot = dict(self.pending)
+            try:
+                pushed = self.push()
+            except Exception as e:
+                self.logger.error(f'Push failed: {e}', name)
+                pushed = False
+            with self.condition:
+                if pushed:
+                    # Lo anotado durante el push queda para la siguiente vuelta
+                    for world, entry in snapshot.items():
+                        if self.pending.get(world) == entry:
+                            del self.pending[world]
+                    self.failures = 0
+                    self.next_attempt = 0
+                else:
+                    delay = self.policy.delay(self.failures)
+                    self.failures += 1
+                    self.next_attempt = time.monotonic() + random.uniform(delay / 2, delay)
+                    self.logger.warning(f'{len(snapshot)} pending push(es), retrying in {self.next_attempt - time.monotonic():.0f}s.', name)
+                self.save()
+                return not self.pending
+
+
+    def run (self) -> None:
+        self.running = True
+        while True:
+            with self.condition:
+                while self.running:
+                    ready_at = self.readyAt()
+                    if ready_at is not None and time.monotonic() >= ready_at:
+                        break
+                    self.condition.wait(None if ready_at is None else ready_at - time.monotonic())
+                if not self.running:
+                    break
+            self.pushOnce()
+
+
+    def flush (self, deadline:float) -> bool:
+        """Intenta vaciar el outbox en menos de `deadline` segundos. Lo que no
+        se suba queda en disco para el próximo arranque."""
+        limit = time.monotonic() + deadline
+        attempt = 0
+        while time.monotonic() < limit:
+            if self.pushOnce():
+                return True
+            delay = min(self.policy.delay(attempt), limit - time.monotonic())
+            attempt += 1
+            if delay > 0:
+                time.sleep(delay)
+        self.logger.warning(f'Outbox not flushed, {len(self.pending)} push(es) kept for next start.', name)
+        return False
+
+
+    def stop (self) -> None:
+        with self.condition:
+            self.running = False
+            self.condition.notify()
@@ -0,0 +1,108 @@
+import time
+import threading
+
+from .logger import Log
+
+name = 'Prefetcher' # For log
+
+
+class Prefetcher:
+    """Trae los objetos remotos al repo local mientras el juego está cerrado,
+    para que al abrirlo sólo haga falta un fast-forward local.
+
+    Hace `fetch()` cada `interval` segundos si hay conexión, y enseguida
+    cuando `wake()` avisa que el remoto pudo cambiar (otro jugador soltó el
+    lease o volvió la conexión). `fresh()` dice si lo traído sigue al día."""
+    def __init__(self, logger:Log, fetch, interval:float=600, max_age:float=1800, retry_delay:float=60):
+        self.logger = logger
+        self.fetch = fetch
+        self.interval = interval
+        self.max_age = max_age
+        self.retry_delay = retry_delay
+        self.idle = True
+        self.online = True
+        self.running = False
+        # `stale`: hubo un aviso de cambio remoto después del último fetch
+        self.stale = True
+        self.generation = 0
+        self.fetched_at = None
+        self.next_attempt = 0
+        self.condition = threading.Condition()
+
+
+    def setIdle (self, idle:bool) -> None:
+        with self.condition:
+            self.idle = idle
+            self.condition.notify()
+
+
+    def setOnline (self, online:bool) -> None:
+        """Callback de ConnectivityMonitor. Sin conexión no se ven los avisos
+        de presencia, así que al volver se asume que el remoto cambió."""
+        with self.condition:
+            if online and not self.online:
+                self.markStale()
+            self.online = online
+            self.condition.notify()
+
+
+    def wake (self) -> None:
+        with self.condition:
+            self.markStale()
+            self.condition.notify()
+
+
+    def markStale (self) -> None:
+        """Se llama con `condition` tomado."""
+        self.stale = True
+        self.generation += 1
+        self.next_attempt = 0
+
+
+    def fresh (self) -> bool:
+        with self.condition:
+            return (not self.stale and self.fetched_at is not None
+                    and time.monotonic() - self.fetched_at < self.max_age)
+
+
+    def readyAt (self) -> float:
+        """Instante (monotonic) del próximo fetch, o `None` si no toca. Se
+        llama con `condition` tomado."""
+        if not self.idle or not self.online:
+            return None
+        due = 0 if self.stale or self.fetched_at is None else self.fetched_at + self.interval
+        return max(due, self.next_attempt)
+
+
+    def run (self) -> None:
+        self.running = True
+        while True:
+            with self.condition:
+                while self.running:
+                    ready_at = self.readyAt()
+                    if ready_at is not None and time.monotonic() >= ready_at:
+                        break
+                    self.condition.wait(None if ready_at is None else ready_at - time.monotonic())
+                if not self.running:
+                    break
+                generation = self.generation
+            start = time.monotonic()
+            try:
+                fetched = self.fetch()
+            except Exception as e:
+                self.logger.error(f'Prefetch failed: {e}', name)
+                fetched = False
+            with self.condition:
+                if fetched:
+                    self.fetched_at = time.monotonic()
+                    # Un aviso durante el fetch puede no estar incluido
+                    self.stale = self.generation != generation
+                    self.logger.debug(f'Prefetched in {self.fetched_at - start:.1f}s.', name)
+                else:
+                    self.next_attempt = time.monotonic() + self.retry_delay
+
+
+    def stop (self) -> None:
+        with self.condition:
+            self.running = False
+            self.condition.notify()
@@ -0,0 +1,109 @@
+import os
+import select
+import sys
+import threading
+
+from .logger import Log
+from .events import Event, EventBus
+
+name = 'ProcessWatcher' # For log
+
+
+class ProcessWatcher:
+    """Detecta cuándo se abre y se cierra un proceso por nombre.
+
+    Mientras el proceso no existe hace un escaneo de baja frecuencia
+    (`scan_interval`). Cuando lo encuentra se queda bloqueado sobre su PID:
+    en Linux con `pidfd_open`, en el resto con `psutil.Process.wait`."""
+    def __init__(self, logger:Log, events:EventBus, process_name:str, scan_interval:float=2):
+        self.logger = logger
+        self.events = events
+        self.process_name = process_name
+        self.scan_interval = scan_interval
+        self.running = False
+        self.active = False
+        self.pid = None
+        self._stopped = threading.Event()
+        # Pipe para despertar el select de `waitForExit`; vive lo que dura `run`
+        self._wakeup_r = self._wakeup_w = None
+        self._wakeup_lock = threading.Lock()
+
+
+    def find (self) -> 'psutil.Process':
+        """Busca el proceso por nombre. Retorna `None` si no está en ejecución."""
+        import psutil
+        for proceso in psutil.process_iter(['name']):
+            if proceso.info['name'] == self.process_name:
+                return proceso
+        return None
+
+
+    def run (self) -> None:
+        self.running = True
+        self._stopped.clear()
+        with self._wakeup_lock:
+            self._wakeup_r, self._wakeup_w = os.pipe()
+        try:
+            self.watch()
+        finally:
+            with self._wakeup_lock:
+                os.close(self._wakeup_r)
+                os.close(self._wakeup_w)
+                self._wakeup_r = self._wakeup_w = None
+
+
+    def watch (self) -> None:
+        while self.running:
+            proceso = self.find()
+            if not proceso:
+                self._stopped.wait(self.scan_interval)
+                continue
+            self.pid = proceso.pid
+            self.active = True
+            self.logger.debug(f'Process found. PID: {self.pid}', name)
+            self.events.publish(Event.PROCESS_STARTED, self.pid)
+            if not self.waitForExit(proceso):
+                # Se detuvo el watcher con el proceso aún vivo
+                break
+            self.active = False
+            self.pid = None
+            self.logger.debug('Process exited.', name)
+            self.events.publish(Event.PROCESS_STOPPED)
+
+
+    def waitForExit (self, proceso:'psutil.Process') -> bool:
+        """Bloquea hasta que el proceso termine. Retorna `False` si se llamó
+        a `stop` antes."""
+        import psutil
+        if sys.platform.startswith('linux') and hasattr(os, 'pidfd_open'):
+            try:
+                pidfd = os.pidfd_open(proceso.pid)
+            except ProcessLookupError:
+                return True
+            except OSError:
+                pidfd = None
+            if pidfd is not None:
+                try:
+                    ready, _, _ = select.select([pidfd, self._wakeup_r], [], [])
+                    if self._wakeup_r in ready:
+                        os.read(self._wakeup_r, 64)
+                    return pidfd in ready
+                finally:
+                    os.close(pidfd)
+        while self.running:
+            try:
+                proceso.wait(timeout=1)
+                return True
+            except psutil.TimeoutExpired:
+                continue
+            except psutil.NoSuchProcess:
+                return True
+        return False
+
+
+    def stop (self) -> None:
+        self.running = False
+        self._stopped.set()
+        with self._wakeup_lock:
+            if self._wakeup_w is not None:
+                os.write(self._wakeup_w, b'\0')
@@ -0,0 +1,144 @@
+import time
+import threading
+
+from dataclasses import dataclass
+
+from .logger import Log
+from .events import Event, EventBus
+
+name = 'Recovery' # For log
+
+
+@dataclass
+class RetryPolicy:
+    """Cómo reintentar la reparación de un error."""
+    max_attempts:int = 5
+    base_delay:float = 1
+    factor:float = 2
+    max_delay:float = 30
+    deadline:float = 60
+
+    def delay (self, attempt:int) -> float:
+        return min(self.max_delay, self.base_delay * self.factor ** attempt)
+
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+
+class CircuitBreaker:
+    """Deja de llamar a un backend que falla seguido. Tras `failure_threshold`
+    fallos consecutivos se abre durante `reset_timeout` segundos; luego deja
+    pasar una llamada de prueba (half-open) que lo cierra o lo vuelve a abrir."""
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    def __init__(self, name:str, failure_threshold:int=5, reset_timeout:float=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self.lock = threading.Lock()
+
+
+    def allow (self) -> bool:
+        with self.lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return self.state == self.CLOSED
+
+
+    def success (self) -> None:
+        with self.lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+
+    def failure (self) -> None:
+        with self.lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+
+class RecoveryManager:
+    """Ejecuta las reparaciones de errores en segundo plano según su
+    `RetryPolicy` y publica `ERROR_FIXED` o `RECOVERY_FAILED` en el bus.
+    El orquestador nunca espera a una reparación."""
+    def __init__(self, logger:Log, events:EventBus):
+        self.logger = logger
+        self.events = events
+        self.repairs = {}
+        self.active = {}
+        self.lock = threading.Lock()
+
+
+    def register (self, error:dict, repair, policy:RetryPolicy) -> None:
+        """`repair()` debe retornar `True` cuando el error quedó resuelto."""
+        self.repairs[error['id']] = (repair, policy)
+
+
+    def recover (self, error:dict) -> bool:
+        """Agenda la reparación de `error`. Retorna `False` si no tiene reparación."""
+        error_id = error.get('id')
+        if error_id not in self.repairs:
+            return False
+        with self.lock:
+            if error_id in self.active:
+                return True
+            cancel = threading.Event()
+            self.active[error_id] = cancel
+        repair, policy = self.repairs[error_id]
+        threading.Thread(target=self._run, args=(error, repair, policy, cancel), daemon=True).start()
+        return True
+
+
+    def _run (self, error:dict, repair, policy:RetryPolicy, cancel:threading.Event) -> None:
+        error_id = error.get('id')
+        self.logger.info(f'Fixing error. ID: {error_id}', name)
+        start = time.monotonic()
+        fixed = False
+        for attempt in range(policy.max_attempts):
+            try:
+                fixed = repair()
+            except Exception as e:
+                self.logger.warning(f'Repair attempt {attempt + 1} raised: {e}', name)
+            if fixed or cancel.is_set():
+                break
+            delay = policy.delay(attempt)
+            if time.monotonic() - start + delay > policy.deadline:
+                break
+            if cancel.wait(delay):
+                break
+        with self.lock:
+            self.active.pop(error_id, None)
+        if cancel.is_set():
+            return
+        if fixed:
+            self.logger.debug(f'Error fixed. ID: {error_id}', name)
+            self.events.publish(Event.ERROR_FIXED, error)
+        else:
+            self.logger.error(f'Couldn\'t fix error. ID: {error_id}', name)
+            self.events.publish(Event.RECOVERY_FAILED, error)
+
+
+    def cancel (self, error:dict) -> None:
+        with self.lock:
+            cancel = self.active.pop(error.get('id'), None)
+        if cancel:
+            cancel.set()
+
+
+    def stop (self) -> None:
+        with self.lock:
+            cancels = list(self.active.values())
+            self.active.clear()
+        for cancel in cancels:
+            cancel.set()
@@ -1,12 +1,13 @@
 import argparse
 import pathlib
 
-# noinspection PyCompatibility
-import winreg
 from typing import Optional
 
 
 def register_hkey(appId: str, appName: str, iconPath: Optional[pathlib.Path]):
+    # winreg sólo existe en Windows, se importa al registrar para que el paquete cargue en otros sistemas
+    # noinspection PyCompatibility
+    import winreg
     if iconPath is not None:
         if not iconPath.exists():
             raise ValueError(f"Could not register the application: File {iconPath} does not exist")
@@ -0,0 +1,195 @@
+import os
+import time
+import argparse
+import threading
+import subprocess
+
+from dataclasses import dataclass
+
+from .logger import Log
+
+name = 'Retention' # For log
+
+
+@dataclass
+class RetentionReport:
+    kept:int = 0
+    dropped:int = 0
+    head:str = None
+    pushed:bool = False
+    size_before:int = 0
+    size_after:int = 0
+
+    @property
+    def reclaimed (self) -> int:
+        return self.size_before - self.size_after
+
+
+
+class RetentionError(Exception):
+    pass
+
+
+
+def git (repo_path:str, *args, input:str=None, env:dict=None) -> str:
+    creationflags = getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+    result = subprocess.run(
+        ['git', '-C', repo_path, *args], input=input, capture_output=True, text=True,
+        env={**os.environ, **env} if env else None, creationflags=creationflags
+    )
+    if result.returncode != 0:
+        raise RetentionError(f'git {args[0]} failed: {result.stderr.strip()}')
+    return result.stdout
+
+
+def repoSize (repo_path:str) -> int:
+    """Bytes que ocupan los objetos del repo local."""
+    stats = dict(line.split(': ') for line in git(repo_path, 'count-objects', '-v').splitlines())
+    return (int(stats.get('size', 0)) + int(stats.get('size-pack', 0))) * 1024
+
+
+def history (repo_path:str, ref:str) -> list:
+    """Commits de `ref` siguiendo al primer padre, del más nuevo al más viejo.
+    Cada uno es un dict con hash, árbol, autor, fecha y mensaje."""
+    fields = ('commit', 'tree', 'author_name', 'author_email', 'author_date',
+              'committer_name', 'committer_email', 'committer_date', 'timestamp', 'message')
+    output = git(repo_path, 'log', '--first-parent', '--format=%H%x00%T%x00%an%x00%ae%x00%aI%x00%cn%x00%ce%x00%cI%x00%at%x00%B%x1e', ref)
+    commits = []
+    for record in output.split('\x1e'):
+        record = record.strip('\n')
+        if record:
+            commit = dict(zip(fields, record.split('\x00')))
+            commit['timestamp'] = int(commit['timestamp'])
+            commits.append(commit)
+    return commits
+
+
+def shallowCommits (repo_path:str) -> set:
+    """Commits del borde de un clon superficial: tienen padres que no se bajaron."""
+    path = git(repo_path, 'rev-parse', '--git-path', 'shallow').strip()
+    path = path if os.path.isabs(path) else os.path.join(repo_path, path)
+    try:
+        with open(path, 'r') as file:
+            return set(file.read().split())
+    except FileNotFoundError:
+        return set()
+
+
+def selectKept (commits:list, keep_sessions:int=None, keep_days:float=None) -> list:
+    """Los commits a conservar: los últimos `keep_sessions` (con el squash de
+    autosaves hay uno por sesión) y/o los de los últimos `keep_days` días.
+    Siempre se conserva al menos el último."""
+    kept = len(commits)
+    if keep_sessions is not None:
+        kept = min(kept, keep_sessions)
+    if keep_days is not None:
+        limit = time.time() - keep_days * 86400
+        kept = min(kept, sum(1 for commit in commits if commit['timestamp'] >= limit))
+    return commits[:max(kept, 1)]
+
+
+def rewrite (repo_path:str, kept:list) -> str:
+    """Crea una historia nueva con los árboles y metadatos de `kept` (del más
+    nuevo al más viejo) empezando desde un commit raíz. Retorna el nuevo HEAD."""
+    parent = None
+    for commit in reversed(kept):
+        env = {
+            'GIT_AUTHOR_NAME': commit['author_name'], 'GIT_AUTHOR_EMAIL': commit['author_email'],
+            'GIT_AUTHOR_DATE': commit['author_date'], 'GIT_COMMITTER_NAME': commit['committer_name'],
+            'GIT_COMMITTER_EMAIL': commit['committer_email'], 'GIT_COMMITTER_DATE': commit['committer_date'],
+        }
+        args = ['commit-tree', commit['tree']] + (['-p', parent] if parent else [])
+        parent = git(repo_path, *args, input=commit['message'], env=env).strip()
+    return parent
+
+
+def compact (repo_path:str, keep_sessions:int=None, keep_days:float=None, fence=None, fence_release=None,
+             remote:str='origin', dry_run:bool=False, logger:Log=None) -> RetentionReport:
+    """Reescribe la historia del repo de partidas dejando sólo las últimas
+    sesiones o días y la sube con force push.
+
+    Sólo corre si `fence()` confirma que tenemos el lease de sesión, así
+    nadie puede hacer push mientras tanto; además el push usa
+    `--force-with-lease` contra el HEAD remoto leído. Se niega si hay commits
+    locales sin subir. Los demás clientes se reponen en su próximo pull."""
+    if keep_sessions is None and keep_days is None:
+        raise ValueError('keep_sessions or keep_days is required')
+    report = RetentionReport()
+    branch = git(repo_path, 'rev-parse', '--abbrev-ref', 'HEAD').strip()
+    remote_ref = f'{remote}/{branch}'
+    report.size_before = repoSize(repo_path)
+
+    if not dry_run and fence and not fence():
+        raise RetentionError('Session lease is not ours, history not rewritten.')
+    try:
+        # Sólo hace falta la parte de la historia que se conserva
+        if keep_days is not None:
+            git(repo_path, 'fetch', f'--shallow-since={int(keep_days * 86400)} seconds ago', remote, branch)
+        else:
+            git(repo_path, 'fetch', f'--depth={keep_sessions + 1}', remote, branch)
+        old_head = git(repo_path, 'rev-parse', remote_ref).strip()
+        if git(repo_path, 'rev-parse', 'HEAD').strip() != old_head:
+            raise RetentionError('Local commits not pushed yet, history not rewritten.')
+
+        commits = history(repo_path, remote_ref)
+        kept = selectKept(commits, keep_sessions, keep_days)
+        report.kept = len(kept)
+        # En un clon superficial sólo se cuentan los commits bajados
+        report.dropped = len(commits) - len(kept)
+        oldest = kept[-1]['commit']
+        has_parents = len(git(repo_path, 'rev-list', '--parents', '-n', '1', oldest).split()) > 1
+        if not has_parents and oldest not in shallowCommits(repo_path):
+            report.head = old_head
+            report.size_after = report.size_before
+            if logger:
+                logger.info('Nothing to compact.', name)
+            return report
+        report.head = rewrite(repo_path, kept)
+        if dry_run:
+            return report
+
+        git(repo_path, 'push', f'--force-with-lease=refs/heads/{branch}:{old_head}', remote, f'{report.head}:refs/heads/{branch}')
+        report.pushed = True
+    finally:
+        if not dry_run and fence_release:
+            fence_release()
+
+    # El árbol no cambia, sólo se mueven las referencias
+    git(repo_path, 'update-ref', f'refs/heads/{branch}', report.head, old_head)
+    git(repo_path, 'update-ref', f'refs/remotes/{remote_ref}', report.head)
+    git(repo_path, 'reflog', 'expire', '--expire=now', '--all')
+    git(repo_path, 'gc', '--prune=now', '--quiet')
+    report.size_after = repoSize(repo_path)
+    if logger:
+        logger.info(f'History compacted: kept {report.kept}, dropped {report.dropped}, reclaimed {report.reclaimed / 2**20:.1f} MB.', name)
+    return report
+
+
+def main():  # pragma: no cover
+    from .events import EventBus
+    from .dataprovider import DataProvider
+    from .filemanager import factorionline_path
+
+    parser = argparse.ArgumentParser(description="Drop old save snapshots from the shared repo history")
+    parser.add_argument("--sessions", "-s", type=int, help="Sessions to keep")
+    parser.add_argument("--days", "-d", type=float, help="Days of history to keep")
+    parser.add_argument("--dry-run", "-n", action='store_true', help="Build the new history without pushing it")
+    args = parser.parse_args()
+    if args.sessions is None and args.days is None:
+        parser.error('--sessions or --days is required')
+
+    logger = Log(debug=True)
+    dataprovider = DataProvider(logger, EventBus())
+    threading.Thread(target=dataprovider.run, daemon=True).start()
+    while not dataprovider.loop:
+        time.sleep(0.1)
+    try:
+        report = compact(factorionline_path, args.sessions, args.days, dataprovider.borrowLease, dataprovider.returnLease,
+                         dry_run=args.dry_run, logger=logger)
+        print(report)
+    finally:
+        dataprovider.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import os
+import json
+import shutil
+import zlib
+import zipfile
+
+from dataclasses import dataclass
+
+name = 'SaveCodec' # For log
+UNPACKED_SUFFIX = '.unpacked'
+MANIFEST_NAME = 'manifest.json'
+# Nivel de zlib según el segundo byte de la cabecera
+ZLIB_LEVELS = {0x01: 1, 0x5e: 5, 0x9c: 6, 0xda: 9}
+
+
+@dataclass
+class CodecStats:
+    packed:int = 0
+    copied:int = 0
+    deleted:int = 0
+    unchanged:int = 0
+
+
+
+def safeName (entry_name:str) -> bool:
+    """`False` para nombres de entrada que saldrían de la carpeta (zip-slip)."""
+    path = entry_name.replace('\\', '/')
+    return not path.startswith('/') and '..' not in path.split('/') and ':' not in path
+
+
+def inflate (data:bytes) -> tuple:
+    """Si `data` es un stream zlib completo retorna `(datos, nivel)`, si no `(data, None)`.
+    Las partidas guardan `level.dat*` comprimidos con zlib dentro del zip."""
+    if len(data) < 2 or data[0] != 0x78 or data[1] not in ZLIB_LEVELS:
+        return data, None
+    decompressor = zlib.decompressobj()
+    try:
+        inflated = decompressor.decompress(data)
+    except zlib.error:
+        return data, None
+    if not decompressor.eof or decompressor.unused_data:
+        return data, None
+    return inflated, ZLIB_LEVELS[data[1]]
+
+
+def writeIfChanged (path:str, data:bytes) -> bool:
+    try:
+        if os.path.getsize(path) == len(data):
+            with open(path, 'rb') as file:
+                if file.read() == data:
+                    return False
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as file:
+        file.write(data)
+    return True
+
+
+def newestMtime (root:str) -> int:
+    return max((os.stat(os.path.join(dirpath, filename)).st_mtime_ns
+                for dirpath, _, filenames in os.walk(root) for filename in filenames), default=0)
+
+
+def unpackSave (zip_path:str, dst:str) -> list:
+    """Guarda las entradas de `zip_path` sin comprimir en la carpeta `dst`,
+    en el orden del zip, más un `manifest.json` con lo necesario para
+    rehacerlo. Sólo reescribe las entradas que cambiaron, así git ve deltas
+    del tamaño de lo que cambió en el mapa. Retorna las rutas (relativas a
+    `dst`) escritas o borradas."""
+    touched = []
+    entries = []
+    with zipfile.ZipFile(zip_path) as archive:
+        infos = archive.infolist()
+        if not all(safeName(info.filename) for info in infos):
+            raise ValueError(f'Unsafe entry name in {zip_path}')
+        for info in infos:
+            entry = {
+                'name': info.filename, 'compress_type': info.compress_type, 'date_time': list(info.date_time),
+                'external_attr': info.external_attr, 'create_system': info.create_system, 'zlib': None,
+            }
+            entries.append(entry)
+            if info.is_dir():
+                continue
+            data, entry['zlib'] = inflate(archive.read(info))
+            if writeIfChanged(os.path.join(dst, info.filename), data):
+                touched.append(info.filename)
+        manifest = {'version': 1, 'comment': archive.comment.decode('latin-1'), 'entries': entries}
+    kept = {entry['name'] for entry in entries if not entry['name'].endswith('/')}
+    for dirpath, _, filenames in os.walk(dst):
+        for filename in filenames:
+            relpath = os.path.relpath(os.path.join(dirpath, filename), dst).replace(os.sep, '/')
+            if relpath != MANIFEST_NAME and relpath not in kept:
+                os.remove(os.path.join(dirpath, filename))
+                touched.append(relpath)
+    if writeIfChanged(os.path.join(dst, MANIFEST_NAME), json.dumps(manifest, indent=1).encode()):
+        touched.append(MANIFEST_NAME)
+    # Mismo mtime que el zip: así `publish` sabe que no hay que rehacerlo
+    mtime_ns = os.stat(zip_path).st_mtime_ns
+    for dirpath, _, filenames in os.walk(dst):
+        for filename in filenames:
+            os.utime(os.path.join(dirpath, filename), ns=(mtime_ns, mtime_ns))
+    return touched
+
+
+def packSave (src:str, zip_path:str) -> None:
+    """Rehace el zip a partir de una carpeta de `unpackSave`. Se escribe
+    aparte y se publica con `os.replace`, nunca queda un zip a medias."""
+    with open(os.path.join(src, MANIFEST_NAME), 'r', encoding='utf-8') as file:
+        manifest = json.load(file)
+    temp_path = zip_path + '.tmp'
+    with zipfile.ZipFile(temp_path, 'w') as archive:
+        archive.comment = manifest['comment'].encode('latin-1')
+        for entry in manifest['entries']:
+            info = zipfile.ZipInfo(entry['name'], tuple(entry['date_time']))
+            info.compress_type = entry['compress_type']
+            info.external_attr = entry['external_attr']
+            info.create_system = entry['create_system']
+            if entry['name'].endswith('/'):
+                archive.writestr(info, b'')
+                continue
+            with open(os.path.join(src, entry['name']), 'rb') as file:
+                data = file.read()
+            if entry['zlib']:
+                data = zlib.compress(data, entry['zlib'])
+            archive.writestr(info, data)
+    mtime_ns = newestMtime(src)
+    os.utime(temp_path, ns=(mtime_ns, mtime_ns))
+    os.replace(temp_path, zip_path)
+
+
+def publish (repo_dir:str, saves_dir:str) -> CodecStats:
+    """Deja en `saves_dir` las partidas de `repo_dir`: las carpetas
+    `*.zip.unpacked` se rehacen como zip sólo si cambiaron y el resto de
+    archivos se copia. Borra lo que ya no está en el repo. La carpeta de
+    partidas de Factorio es plana, no se recorren subcarpetas."""
+    stats = CodecStats()
+    os.makedirs(saves_dir, exist_ok=True)
+    expected = set()
+    for entry in os.scandir(repo_dir):
+        if entry.is_dir() and entry.name.endswith(UNPACKED_SUFFIX):
+            target = os.path.join(saves_dir, entry.name[:-len(UNPACKED_SUFFIX)])
+            expected.add(os.path.basename(target))
+            try:
+                current = os.stat(target).st_mtime_ns
+            except FileNotFoundError:
+                current = None
+            if current == newestMtime(entry.path):
+                stats.unchanged += 1
+                continue
+            packSave(entry.path, target)
+            stats.packed += 1
+        elif entry.is_file():
+            target = os.path.join(saves_dir, entry.name)
+            expected.add(entry.name)
+            source_stat = entry.stat()
+            try:
+                target_stat = os.stat(target)
+                if (target_stat.st_size, target_stat.st_mtime_ns) == (source_stat.st_size, source_stat.st_mtime_ns):
+                    stats.unchanged += 1
+                    continue
+            except FileNotFoundError:
+                pass
+            shutil.copy2(entry.path, target + '.tmp')
+            os.replace(target + '.tmp', target)
+            stats.copied += 1
+    for entry in os.scandir(saves_dir):
+        if entry.name not in expected:
+            if entry.is_dir():
+                shutil.rmtree(entry.path)
+            else:
+                os.remove(entry.path)
+            stats.deleted += 1
+    return stats
+
+
+def collect (saves_dir:str, repo_dir:str, changed:list, removed:list) -> list:
+    """Lleva al repo las partidas que cambiaron en `saves_dir` (rutas
+    relativas, como las da `ManifestIndex`). Los zip se guardan
+    desempaquetados; si el repo tenía el zip tal cual, se reemplaza.
+    Retorna las rutas del repo (relativas a `repo_dir`) que cambiaron."""
+    touched = []
+    for relpath in changed:
+        source = os.path.join(saves_dir, relpath)
+        target = os.path.join(repo_dir, relpath)
+        if relpath.lower().endswith('.zip') and zipfile.is_zipfile(source):
+            try:
+                unpacked = unpackSave(source, target + UNPACKED_SUFFIX)
+                touched += [os.path.join(relpath + UNPACKED_SUFFIX, path) for path in unpacked]
+                if os.path.exists(target):
+                    os.remove(target)
+                    touched.append(relpath)
+                continue
+            except ValueError:
+                # Zip con nombres raros: se guarda tal cual
+                pass
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copy2(source, target)
+        touched.append(relpath)
+    for relpath in removed:
+        target = os.path.join(repo_dir, relpath)
+        unpacked = target + UNPACKED_SUFFIX
+        if os.path.isdir(unpacked):
+            for dirpath, _, filenames in os.walk(unpacked):
+                touched += [os.path.relpath(os.path.join(dirpath, filename), repo_dir) for filename in filenames]
+            shutil.rmtree(unpacked)
+        if os.path.exists(target):
+            os.remove(target)
+            touched.append(relpath)
+    return touched
@@ -0,0 +1,139 @@
+import os
+import queue
+import time
+import zipfile
+import threading
+
+name = 'SaveDetector' # For log
+
+
+class SaveDetector:
+    """Handler de watchdog que detecta cuándo Factorio terminó de guardar.
+
+    Registra create/modify/move/delete por archivo y espera `quiet_period`
+    segundos sin eventos. Luego exige que el tamaño y el mtime de cada archivo
+    no cambien entre dos comprobaciones y, si `verify_zip`, que el directorio
+    central del zip se pueda leer. Toda la ráfaga se entrega junta como un
+    único "save committed" en `wait`."""
+    temp_suffixes = ('.tmp', '.temp', '.part', '.new')
+    max_verify_attempts = 5
+    def __init__(self, quiet_period:float=2, verify_zip:bool=True):
+        self.quiet_period = quiet_period
+        self.verify_zip = verify_zip
+        self.active = False
+        self.running = False
+        self.pending = {}
+        self.attempts = {}
+        self.last_event = 0
+        self.condition = threading.Condition()
+        self.commits = queue.Queue()
+        self.thread = None
+
+
+    def ignored (self, path:str) -> bool:
+        filename = os.path.basename(path)
+        return filename.startswith('.') or filename.lower().endswith(self.temp_suffixes)
+
+
+    def dispatch (self, event) -> None:
+        if not self.active or event.is_directory:
+            return
+        paths = [event.src_path]
+        if event.event_type == 'moved':
+            paths.append(event.dest_path)
+        with self.condition:
+            for path in paths:
+                if not self.ignored(path):
+                    # None: todavía no se comprobó su tamaño
+                    self.pending[path] = None
+            self.last_event = time.monotonic()
+            self.condition.notify()
+
+
+    def snapshot (self, path:str) -> tuple:
+        try:
+            stat = os.stat(path)
+            return (stat.st_size, stat.st_mtime_ns)
+        except FileNotFoundError:
+            return 'deleted'
+
+
+    def readable (self, path:str) -> bool:
+        try:
+            with zipfile.ZipFile(path) as archive:
+                archive.namelist()
+            return True
+        except (zipfile.BadZipFile, OSError):
+            return False
+
+
+    def settle (self) -> bool:
+        """Retorna `True` si todos los archivos pendientes están estables.
+        Se llama con `condition` tomado."""
+        stable = True
+        for path, previous in list(self.pending.items()):
+            current = self.snapshot(path)
+            if current != previous:
+                self.pending[path] = current
+                stable = False
+            elif self.verify_zip and current != 'deleted' and path.lower().endswith('.zip') and not self.readable(path):
+                self.attempts[path] = self.attempts.get(path, 0) + 1
+                if self.attempts[path] >= self.max_verify_attempts:
+                    # Zip corrupto, no se sube
+                    del self.pending[path]
+                    del self.attempts[path]
+                else:
+                    stable = False
+        return stable
+
+
+    def _run (self) -> None:
+        with self.condition:
+            while self.running:
+                if not self.pending:
+                    self.condition.wait()
+                    continue
+                remaining = self.last_event + self.quiet_period - time.monotonic()
+                if remaining > 0:
+                    self.condition.wait(remaining)
+                    continue
+                if not self.settle():
+                    # Sigue cambiando, otro periodo de espera
+                    self.last_event = time.monotonic()
+                    continue
+                paths = sorted(self.pending)
+                self.pending.clear()
+                self.attempts.clear()
+                if paths:
+                    self.commits.put(paths)
+
+
+    def wait (self, timeout:float=None) -> list:
+        """Bloquea hasta el próximo guardado completo y retorna las rutas
+        que cambiaron. Retorna `None` si vence el timeout."""
+        try:
+            return self.commits.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+    def activate (self) -> None:
+        self.active = True
+        if not self.running:
+            self.running = True
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+
+    def deactivate (self) -> None:
+        self.active = False
+        with self.condition:
+            self.pending.clear()
+            self.attempts.clear()
+
+
+    def stop (self) -> None:
+        self.deactivate()
+        with self.condition:
+            self.running = False
+            self.condition.notify()
@@ -0,0 +1,626 @@
+import io
+import os
+import json
+import time
+import hashlib
+import threading
+import subprocess
+
+from datetime import datetime
+from dataclasses import dataclass
+
+from .gitengine import GitEngine, GitProgress
+from .transport import Transport, SyncReport, listFiles, readFile, writeFile
+
+name = 'Storage' # For log
+
+
+@dataclass
+class Version:
+    """Una versión guardada de la carpeta de partidas."""
+    id:str
+    parent:str
+    time:float
+    message:str = ''
+
+
+
+class StorageError(OSError):
+    """Falla del almacenamiento remoto. Es un `OSError` para que lo maneje
+    quien ya maneja los errores de red y disco."""
+    pass
+
+
+
+def safePath (root:str, relpath:str) -> str:
+    path = os.path.normpath(os.path.join(root, relpath))
+    if not path.startswith(os.path.normpath(root) + os.sep):
+        raise StorageError(f'Path outside the folder: {relpath}')
+    return path
+
+
+def removeExtra (root:str, expected:set) -> list:
+    """Borra de `root` los archivos que no están en `expected`. Retorna sus rutas relativas."""
+    removed = []
+    for relpath in listFiles(root).keys() - expected:
+        os.remove(os.path.join(root, relpath))
+        removed.append(relpath)
+    return removed
+
+
+
+class StorageBackend:
+    """Interfaz del almacenamiento compartido de partidas.
+
+    Guarda versiones inmutables de una carpeta, cada una con su padre, y un
+    HEAD que apunta a la última. `put` sólo sube la versión; para publicarla
+    hay que mover HEAD con `compareAndSwap`, que falla si otro cliente lo
+    movió antes. Los errores se lanzan como `StorageError`."""
+    # Bytes de datos subidos y bajados, y peticiones hechas
+    bytes_sent = 0
+    bytes_received = 0
+    round_trips = 0
+
+    def head (self) -> str:
+        """Id de la versión publicada, o `None` si no hay ninguna."""
+        raise NotImplementedError
+
+
+    def listVersions (self, limit:int=None) -> list:
+        """`Version`es desde HEAD siguiendo a los padres, de la más nueva a la más vieja."""
+        raise NotImplementedError
+
+
+    def fetch (self, version_id:str, dst:str, on_progress=None, keep:set=frozenset()) -> list:
+        """Deja `dst` igual a la versión `version_id`, escribiendo sólo lo
+        que cambió. Las rutas de `keep` (cambios locales sin subir) no se
+        pisan ni se borran. Retorna las rutas (relativas a `dst`) escritas o
+        borradas. `on_progress(hechos, total)` informa el avance."""
+        raise NotImplementedError
+
+
+    def put (self, src:str, parent:str, message:str='', on_progress=None) -> Version:
+        """Sube el contenido de `src` como una versión nueva hija de `parent`, sin publicarla."""
+        raise NotImplementedError
+
+
+    def compareAndSwap (self, expected:str, new:str) -> bool:
+        """Mueve HEAD a `new` sólo si sigue en `expected` (`None`: si no hay
+        HEAD). Retorna `False` si otro cliente lo movió."""
+        raise NotImplementedError
+
+
+
+class ObjectBackend(StorageBackend):
+    """Backend sobre un almacén clave-valor. Los archivos se guardan por su
+    sha256 en `objects/ab/<sha256>`, así lo que no cambió entre versiones no
+    se vuelve a subir. Cada versión es `versions/<id>.json` con su padre y
+    `{ruta: [sha256, tamaño]}`, y HEAD es la clave `HEAD`.
+
+    Las subclases implementan `_read`, `_write`, `_exists`, `_readHead` y `_swapHead`."""
+    def __init__(self):
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.round_trips = 0
+
+
+    def _read (self, key:str) -> bytes:
+        """Contenido de `key`. `KeyError` si no existe."""
+        raise NotImplementedError
+
+
+    def _write (self, key:str, data:bytes) -> None:
+        raise NotImplementedError
+
+
+    def _exists (self, key:str) -> bool:
+        raise NotImplementedError
+
+
+    def _readHead (self) -> str:
+        raise NotImplementedError
+
+
+    def _swapHead (self, expected:str, new:str) -> bool:
+        raise NotImplementedError
+
+
+    def objectKey (self, sha256:str) -> str:
+        return f'objects/{sha256[:2]}/{sha256}'
+
+
+    def manifest (self, version_id:str) -> dict:
+        try:
+            self.round_trips += 1
+            return json.loads(self._read(f'versions/{version_id}.json'))
+        except KeyError:
+            raise StorageError(f'Unknown version {version_id}')
+
+
+    def head (self) -> str:
+        self.round_trips += 1
+        return self._readHead()
+
+
+    def listVersions (self, limit:int=None) -> list:
+        versions = []
+        version_id = self.head()
+        while version_id and (limit is None or len(versions) < limit):
+            manifest = self.manifest(version_id)
+            versions.append(Version(version_id, manifest['parent'], manifest['time'], manifest['message']))
+            version_id = manifest['parent']
+        return versions
+
+
+    def fetch (self, version_id:str, dst:str, on_progress=None, keep:set=frozenset()) -> list:
+        files = self.manifest(version_id)['files']
+        local = listFiles(dst)
+        changed = []
+        for done, (relpath, (sha256, _)) in enumerate(sorted(files.items()), 1):
+            if local.get(relpath) != sha256 and relpath not in keep:
+                try:
+                    self.round_trips += 1
+                    data = self._read(self.objectKey(sha256))
+                except KeyError:
+                    raise StorageError(f'Version {version_id} is missing the object of {relpath}')
+                self.bytes_received += len(data)
+                try:
+                    writeFile(safePath(dst, relpath), data, sha256)
+                except ValueError as e:
+                    raise StorageError(str(e))
+                changed.append(relpath)
+            if on_progress:
+                on_progress(done, len(files))
+        return changed + removeExtra(dst, files.keys() | keep)
+
+
+    def put (self, src:str, parent:str, message:str='', on_progress=None) -> Version:
+        # Lo que ya tenía el padre seguro está subido
+        known = {sha256 for sha256, _ in self.manifest(parent)['files'].values()} if parent else set()
+        files = {}
+        local = listFiles(src)
+        for done, (relpath, sha256) in enumerate(sorted(local.items()), 1):
+            path = os.path.join(src, relpath)
+            files[relpath] = [sha256, os.path.getsize(path)]
+            key = self.objectKey(sha256)
+            if sha256 not in known:
+                self.round_trips += 1
+                if not self._exists(key):
+                    data = readFile(path)
+                    self.round_trips += 1
+                    self._write(key, data)
+                    self.bytes_sent += len(data)
+                known.add(sha256)
+            if on_progress:
+                on_progress(done, len(local))
+        manifest = {'parent': parent, 'time': time.time(), 'message': message, 'files': files}
+        data = json.dumps(manifest, indent=0, sort_keys=True).encode()
+        version_id = hashlib.sha256(data).hexdigest()
+        self.round_trips += 1
+        self._write(f'versions/{version_id}.json', data)
+        return Version(version_id, parent, manifest['time'], message)
+
+
+    def compareAndSwap (self, expected:str, new:str) -> bool:
+        self.round_trips += 1
+        return self._swapHead(expected, new)
+
+
+
+class DirectoryBackend(ObjectBackend):
+    """Backend sobre una carpeta local o de red. HEAD se cambia bajo un
+    `HEAD.lock` creado con `O_EXCL`, que es atómico también en SMB; un lock
+    de más de `stale_lock` segundos es de un cliente que se cayó y se rompe."""
+    def __init__(self, root:str, lock_timeout:float=10, stale_lock:float=30):
+        super().__init__()
+        self.root = root
+        self.lock_timeout = lock_timeout
+        self.stale_lock = stale_lock
+
+
+    def path (self, key:str) -> str:
+        return os.path.join(self.root, *key.split('/'))
+
+
+    def _read (self, key:str) -> bytes:
+        try:
+            with open(self.path(key), 'rb') as file:
+                return file.read()
+        except FileNotFoundError:
+            raise KeyError(key)
+
+
+    def _write (self, key:str, data:bytes) -> None:
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as file:
+            file.write(data)
+        os.replace(temp_path, path)
+
+
+    def _exists (self, key:str) -> bool:
+        return os.path.exists(self.path(key))
+
+
+    def _readHead (self) -> str:
+        try:
+            return self._read('HEAD').decode().strip() or None
+        except KeyError:
+            return None
+
+
+    def _swapHead (self, expected:str, new:str) -> bool:
+        lock_path = self.path('HEAD.lock')
+        os.makedirs(self.root, exist_ok=True)
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            try:
+                os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(lock_path) > self.stale_lock:
+                        os.remove(lock_path)
+                        continue
+                except FileNotFoundError:
+                    continue
+                if time.monotonic() > deadline:
+                    raise StorageError(f'{lock_path} is locked by another client')
+                time.sleep(0.01)
+        try:
+            if self._readHead() != expected:
+                return False
+            self._write('HEAD', new.encode())
+            return True
+        finally:
+            os.remove(lock_path)
+
+
+
+class S3Backend(ObjectBackend):
+    """Backend sobre un bucket S3 o compatible (MinIO, R2, etc.) con
+    `boto3`, que es opcional. HEAD se cambia con escrituras condicionales
+    (`If-Match` con el ETag leído, `If-None-Match: *` si no existe), así el
+    compare-and-swap lo resuelve el servidor. `client` permite pasar un
+    cliente ya armado, p. ej. `LocalS3Client` para probar sin red."""
+    def __init__(self, bucket:str, prefix:str='', client=None, endpoint_url:str=None, **client_options):
+        super().__init__()
+        if client is None:
+            import boto3
+            client = boto3.client('s3', endpoint_url=endpoint_url, **client_options)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip('/') + '/' if prefix.strip('/') else ''
+
+
+    def errorCode (self, error:Exception) -> str:
+        return str(getattr(error, 'response', {}).get('Error', {}).get('Code', ''))
+
+
+    def call (self, method:str, key:str, **kwargs) -> dict:
+        try:
+            return getattr(self.client, method)(Bucket=self.bucket, Key=self.prefix + key, **kwargs)
+        except self.client.exceptions.ClientError as e:
+            if self.errorCode(e) in ('NoSuchKey', 'NotFound', '404'):
+                raise KeyError(key)
+            raise StorageError(f'S3 {method} {key} failed: {e}')
+
+
+    def _read (self, key:str) -> bytes:
+        return self.call('get_object', key)['Body'].read()
+
+
+    def _write (self, key:str, data:bytes) -> None:
+        self.call('put_object', key, Body=data)
+
+
+    def _exists (self, key:str) -> bool:
+        try:
+            self.call('head_object', key)
+            return True
+        except KeyError:
+            return False
+
+
+    def _readHead (self) -> str:
+        try:
+            return self._read('HEAD').decode().strip() or None
+        except KeyError:
+            return None
+
+
+    def _swapHead (self, expected:str, new:str) -> bool:
+        if expected is None:
+            condition = {'IfNoneMatch': '*'}
+        else:
+            try:
+                response = self.call('get_object', 'HEAD')
+            except KeyError:
+                return False
+            if response['Body'].read().decode().strip() != expected:
+                return False
+            condition = {'IfMatch': response['ETag']}
+        try:
+            self.client.put_object(Bucket=self.bucket, Key=self.prefix + 'HEAD', Body=new.encode(), **condition)
+        except self.client.exceptions.ClientError as e:
+            if self.errorCode(e) in ('PreconditionFailed', 'ConditionalRequestConflict', '412', '409'):
+                return False
+            raise StorageError(f'S3 put_object HEAD failed: {e}')
+        return True
+
+
+
+class LocalS3ClientError(Exception):
+    """Misma forma que `botocore.exceptions.ClientError`."""
+    def __init__(self, code:str, operation:str):
+        self.response = {'Error': {'Code': code, 'Message': code}}
+        super().__init__(f'An error occurred ({code}) when calling the {operation} operation')
+
+
+
+class LocalS3Client:
+    """Cliente S3 en memoria con la interfaz de `boto3` que usa `S3Backend`,
+    incluidas las escrituras condicionales. Sirve de stand-in local: con
+    `latency` cada petición espera esos segundos, como un viaje de red."""
+    class exceptions:
+        ClientError = LocalS3ClientError
+
+    def __init__(self, latency:float=0):
+        self.latency = latency
+        self.objects = {}
+        self.lock = threading.Lock()
+        self.requests = 0
+
+
+    def request (self, bucket:str, key:str) -> tuple:
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return self.objects.get((bucket, key))
+
+
+    def get_object (self, Bucket:str, Key:str) -> dict:
+        with self.lock:
+            stored = self.request(Bucket, Key)
+        if stored is None:
+            raise LocalS3ClientError('NoSuchKey', 'GetObject')
+        data, etag = stored
+        return {'Body': io.BytesIO(data), 'ETag': etag, 'ContentLength': len(data)}
+
+
+    def head_object (self, Bucket:str, Key:str) -> dict:
+        with self.lock:
+            stored = self.request(Bucket, Key)
+        if stored is None:
+            raise LocalS3ClientError('404', 'HeadObject')
+        return {'ETag': stored[1], 'ContentLength': len(stored[0])}
+
+
+    def put_object (self, Bucket:str, Key:str, Body:bytes, IfMatch:str=None, IfNoneMatch:str=None) -> dict:
+        etag = f'"{hashlib.md5(Body).hexdigest()}"'
+        # La condición y la escritura son atómicas, como en el servidor
+        with self.lock:
+            stored = self.request(Bucket, Key)
+            if IfNoneMatch == '*' and stored is not None:
+                raise LocalS3ClientError('PreconditionFailed', 'PutObject')
+            if IfMatch is not None and (stored is None or stored[1] != IfMatch):
+                raise LocalS3ClientError('PreconditionFailed', 'PutObject')
+            self.objects[(Bucket, Key)] = (bytes(Body), etag)
+        return {'ETag': etag}
+
+
+
+class GitBackend(StorageBackend):
+    """El remoto de git actual como `StorageBackend`. Cada versión es un
+    commit del branch y `subdir` es la carpeta del repo con las partidas.
+    `put` arma el commit con un índice temporal, sin tocar el worktree ni el
+    índice del repo, y `compareAndSwap` es un push con `--force-with-lease`,
+    que el servidor rechaza si el branch ya no está donde se esperaba."""
+    def __init__(self, engine:GitEngine, remote:str='origin', branch:str='main', subdir:str=''):
+        self.engine = engine
+        self.remote = remote
+        self.branch = branch
+        self.subdir = subdir.strip('/')
+        self.round_trips = 0
+
+
+    def git (self, *args, input:str=None, env:dict=None) -> str:
+        result = subprocess.run(
+            ['git', '-C', self.engine.path, *args], input=input, capture_output=True, text=True,
+            env={**os.environ, **env} if env else None, creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+        )
+        if result.returncode != 0:
+            # push --porcelain informa los rechazos por stdout
+            raise StorageError(f'git {args[0]} failed: {(result.stderr + result.stdout).strip()}')
+        return result.stdout
+
+
+    def head (self) -> str:
+        self.round_trips += 1
+        output = self.git('ls-remote', self.remote, f'refs/heads/{self.branch}')
+        return output.split()[0] if output.strip() else None
+
+
+    def commit (self, version_id:str) -> 'git.Commit':
+        """El commit `version_id`, trayendo el branch si todavía no está en local."""
+        import git
+        with self.engine.lock:
+            for attempt in range(2):
+                try:
+                    commit = self.engine.repo.commit(version_id)
+                    # GitPython lee el objeto recién al usarlo
+                    commit.tree
+                    return commit
+                except (ValueError, git.BadName, git.BadObject):
+                    if attempt:
+                        raise StorageError(f'Unknown version {version_id}')
+                self.round_trips += 1
+                self.engine.fetch(None, self.remote, self.branch)
+
+
+    def listVersions (self, limit:int=None) -> list:
+        head = self.head()
+        if not head:
+            return []
+        with self.engine.lock:
+            commit = self.commit(head)
+            commits = commit.iter_parents(first_parent=True)
+            versions = []
+            while commit and (limit is None or len(versions) < limit):
+                parent = commit.parents[0].hexsha if commit.parents else None
+                versions.append(Version(commit.hexsha, parent, commit.committed_date, commit.message.strip()))
+                commit = next(commits, None)
+        return versions
+
+
+    def fetch (self, version_id:str, dst:str, on_progress=None, keep:set=frozenset()) -> list:
+        with self.engine.lock:
+            tree = self.commit(version_id).tree
+            if self.subdir:
+                try:
+                    tree = tree / self.subdir
+                except KeyError:
+                    tree = None
+            blobs = [blob for blob in tree.traverse() if blob.type == 'blob'] if tree else []
+            prefix = self.subdir + '/' if self.subdir else ''
+            expected = set()
+            changed = []
+            for done, blob in enumerate(blobs, 1):
+                relpath = blob.path[len(prefix):]
+                expected.add(relpath)
+                path = safePath(dst, relpath)
+                data = blob.data_stream.read()
+                if relpath not in keep and (not os.path.exists(path) or readFile(path) != data):
+                    writeFile(path, data, hashlib.sha256(data).hexdigest())
+                    changed.append(relpath)
+                if on_progress:
+                    on_progress(done, len(blobs))
+        return changed + removeExtra(dst, expected | keep)
+
+
+    def put (self, src:str, parent:str, message:str='', on_progress=None) -> Version:
+        if parent:
+            self.commit(parent)
+        index_path = os.path.join(self.engine.repo.git_dir, f'factorionline-storage-{threading.get_ident()}.index')
+        env = {'GIT_INDEX_FILE': index_path}
+        prefix = self.subdir + '/' if self.subdir else ''
+        try:
+            if parent:
+                self.git('read-tree', parent, env=env)
+                self.git('rm', '-r', '--cached', '--quiet', '--ignore-unmatch', '--', self.subdir or '.', env=env)
+            else:
+                self.git('read-tree', '--empty', env=env)
+            relpaths = sorted(listFiles(src))
+            paths = '\n'.join(os.path.join(src, relpath) for relpath in relpaths)
+            shas = self.git('hash-object', '-w', '--stdin-paths', input=paths).split() if relpaths else []
+            if on_progress:
+                on_progress(len(relpaths), len(relpaths))
+            entries = ''.join(f'100644 {sha}\t{prefix}{relpath}\n' for sha, relpath in zip(shas, relpaths))
+            self.git('update-index', '--add', '--index-info', input=entries, env=env)
+            tree = self.git('write-tree', env=env).strip()
+            parents = ['-p', parent] if parent else []
+            commit = self.git('commit-tree', tree, *parents, '-m', message or 'Saved', env=env).strip()
+        finally:
+            if os.path.exists(index_path):
+                os.remove(index_path)
+        return Version(commit, parent, time.time(), message)
+
+
+    def compareAndSwap (self, expected:str, new:str) -> bool:
+        self.round_trips += 1
+        ref = f'refs/heads/{self.branch}'
+        try:
+            self.git('push', '--porcelain', f'--force-with-lease={ref}:{expected or ""}', self.remote, f'{new}:{ref}')
+        except StorageError as e:
+            # Lo último es otro push que ganó mientras se actualizaba la referencia
+            if any(reason in str(e) for reason in ('stale info', 'rejected', 'fetch first', 'cannot lock ref')):
+                return False
+            raise
+        return True
+
+
+
+class StorageTransport(Transport):
+    """Sincroniza la carpeta de partidas con un `StorageBackend`.
+
+    Recuerda en `state_path` la versión en la que se basa la copia local.
+    El push sube una versión hija de esa y la publica con compare-and-swap:
+    si otro cliente publicó entremedio falla en lugar de pisarlo, y hay que
+    hacer pull primero. El pull no pisa ni borra los archivos que cambiaron
+    desde la última sincronización. git queda como historia local."""
+    def __init__(self, local_root:str, backend:StorageBackend, state_path:str=None):
+        self.local_root = local_root
+        self.backend = backend
+        self.state_path = state_path
+        self.last_report = None
+        self.base, self.files = None, {}
+        if state_path and os.path.exists(state_path):
+            with open(state_path, 'r', encoding='utf-8') as file:
+                state = json.load(file)
+            self.base, self.files = state['base'], state['files']
+
+
+    def setBase (self, version_id:str, files:dict) -> None:
+        self.base, self.files = version_id, files
+        if self.state_path:
+            temp_path = self.state_path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                json.dump({'base': version_id, 'files': files}, file)
+            os.replace(temp_path, self.state_path)
+
+
+    def progress (self, on_progress, phase:str):
+        if not on_progress:
+            return None
+        return lambda done, total: on_progress(GitProgress(phase, done * 100 // total if total else 100, done, total))
+
+
+    def push (self, on_progress=None) -> bool:
+        report = SyncReport()
+        sent, received = self.backend.bytes_sent, self.backend.bytes_received
+        local = listFiles(self.local_root)
+        report.changed = sorted(path for path in local.keys() | self.files.keys() if local.get(path) != self.files.get(path))
+        if not report.changed and self.base:
+            report.unchanged = len(local)
+            self.last_report = report
+            return True
+        version = self.backend.put(self.local_root, self.base, f'Saved {datetime.now().isoformat()}',
+                                   self.progress(on_progress, 'Writing objects'))
+        if not self.backend.compareAndSwap(self.base, version.id):
+            raise StorageError(f'Remote head moved from {self.base}, pull before pushing')
+        self.setBase(version.id, local)
+        report.deleted = len([path for path in report.changed if path not in local])
+        report.files = len(report.changed) - report.deleted
+        report.unchanged = len(local) - report.files
+        report.full_bytes = sum(os.path.getsize(os.path.join(self.local_root, path)) for path in report.changed if path in local)
+        report.bytes_sent = self.backend.bytes_sent - sent
+        report.bytes_received = self.backend.bytes_received - received
+        report.payload_bytes = report.bytes_sent
+        self.last_report = report
+        return True
+
+
+    def pull (self, on_progress=None, depth:int=None) -> bool:
+        report = SyncReport('pull')
+        sent, received = self.backend.bytes_sent, self.backend.bytes_received
+        head = self.backend.head()
+        # Lo que difiere de la última sincronización no se subió todavía
+        modified = {path for path, sha256 in listFiles(self.local_root).items() if self.files.get(path) != sha256}
+        if head and head != self.base:
+            report.changed = self.backend.fetch(head, self.local_root, self.progress(on_progress, 'Receiving objects'), modified)
+            report.conflicts = sorted(modified)
+        local = listFiles(self.local_root)
+        if head:
+            files = {path: sha256 for path, sha256 in local.items() if path not in modified}
+            files.update({path: self.files[path] for path in modified if path in self.files})
+            self.setBase(head, files)
+        report.deleted = len([path for path in report.changed if path not in local])
+        report.files = len(report.changed) - report.deleted
+        report.unchanged = len(local) - report.files
+        report.full_bytes = sum(os.path.getsize(os.path.join(self.local_root, path)) for path in report.changed if path in local)
+        report.bytes_sent = self.backend.bytes_sent - sent
+        report.bytes_received = self.backend.bytes_received - received
+        report.payload_bytes = report.bytes_received
+        self.last_report = report
+        return True
@@ -0,0 +1,648 @@
+import os
+import json
+import math
+import time
+import socket
+import struct
+import hashlib
+import threading
+import socketserver
+
+from itertools import accumulate
+from dataclasses import dataclass, field
+
+from .gitengine import GitEngine, GitProgress
+from .compression import Compressor, BandwidthMeter
+
+name = 'Transport' # For log
+STRONG_SIZE = 16
+# Si el delta tendría más de esta fracción de datos literales se manda el archivo entero
+MAX_LITERAL_RATIO = 0.5
+# Bytes que `delta` rueda de a uno en Python (~1 MB/s) antes de probar sólo bloques alineados
+MAX_ROLL_BYTES = 1024 * 1024
+
+
+def blockSize (size:int) -> int:
+    """Como rsync: raíz cuadrada del tamaño, entre 2 KiB y 64 KiB."""
+    return max(2048, min(65536, 1 << max(0, math.isqrt(size).bit_length() - 1)))
+
+
+def weakChecksum (block:bytes) -> tuple:
+    """Checksum débil de rsync `(a, b)`. `b` es la suma de las sumas
+    parciales, así se calcula en C con `accumulate` en lugar de un bucle."""
+    return sum(block) & 0xffff, sum(accumulate(block)) & 0xffff
+
+
+def strongHash (block:bytes) -> bytes:
+    return hashlib.blake2b(block, digest_size=STRONG_SIZE).digest()
+
+
+def signature (data:bytes, block_size:int=None) -> bytes:
+    """Firma de la versión que ya tiene el otro lado: por cada bloque su
+    checksum débil y su hash fuerte."""
+    block_size = block_size or blockSize(len(data))
+    parts = [struct.pack('>I', block_size)]
+    for offset in range(0, len(data), block_size):
+        block = data[offset:offset + block_size]
+        a, b = weakChecksum(block)
+        parts.append(struct.pack('>I', a | b << 16) + strongHash(block))
+    return b''.join(parts)
+
+
+def parseSignature (sig:bytes) -> tuple:
+    block_size = struct.unpack_from('>I', sig)[0]
+    table = {}
+    record = 4 + STRONG_SIZE
+    for index, offset in enumerate(range(4, len(sig), record)):
+        weak = struct.unpack_from('>I', sig, offset)[0]
+        table.setdefault(weak, {})[sig[offset + 4:offset + record]] = index
+    return block_size, table
+
+
+def delta (data:bytes, sig:bytes) -> bytes:
+    """Delta de `data` contra la firma `sig`. Busca cada bloque de la firma
+    con el checksum rodante; en las zonas sin cambios salta de bloque en
+    bloque y sólo rueda byte a byte donde hay diferencias. Retorna `None` si
+    casi todo sería literal y conviene mandar el archivo entero.
+
+    Rodar byte a byte es lento en Python, así que sólo se hace durante
+    `MAX_ROLL_BYTES`. Después se prueban sólo los bloques alineados con el
+    último encontrado: siguen apareciendo las zonas reescritas, pero lo que
+    va detrás de una inserción nueva viaja como literal. Así el tiempo queda
+    acotado aunque la partida pese cientos de MB.
+
+    Formato: `C<inicio><cuenta>` copia bloques de la versión anterior,
+    `D<largo><datos>` son bytes nuevos."""
+    block_size, table = parseSignature(sig)
+    size = len(data)
+    ops = []
+    literal_start = 0
+    literal_bytes = 0
+    max_literal = size * MAX_LITERAL_RATIO
+    copy_start, copy_count = None, 0
+    rolled = 0
+
+    def flush (end:int) -> None:
+        nonlocal copy_start, copy_count, literal_bytes
+        if end > literal_start:
+            if copy_count:
+                ops.append(b'C' + struct.pack('>II', copy_start, copy_count))
+                copy_start, copy_count = None, 0
+            ops.append(b'D' + struct.pack('>I', end - literal_start) + data[literal_start:end])
+            literal_bytes += end - literal_start
+
+    def match (offset:int, weak:int) -> int:
+        candidates = table.get(weak)
+        if candidates:
+            return candidates.get(strongHash(data[offset:offset + block_size]))
+        return None
+
+    offset = 0
+    while offset + block_size <= size:
+        a, b = weakChecksum(data[offset:offset + block_size])
+        index = match(offset, a | b << 16)
+        # Rodar byte a byte hasta reencontrar un bloque conocido
+        while index is None and offset + block_size < size and rolled < MAX_ROLL_BYTES:
+            out, new = data[offset], data[offset + block_size]
+            a = (a - out + new) & 0xffff
+            b = (b - block_size * out + a) & 0xffff
+            offset += 1
+            rolled += 1
+            index = match(offset, a | b << 16)
+            if literal_bytes + offset - literal_start > max_literal:
+                return None
+        if index is None:
+            if rolled < MAX_ROLL_BYTES:
+                break
+            # Sin presupuesto para rodar: el bloque entero va como literal
+            offset += block_size
+            if literal_bytes + offset - literal_start > max_literal:
+                return None
+            continue
+        flush(offset)
+        if copy_count and copy_start + copy_count == index:
+            copy_count += 1
+        else:
+            if copy_count:
+                ops.append(b'C' + struct.pack('>II', copy_start, copy_count))
+            copy_start, copy_count = index, 1
+        offset += block_size
+        literal_start = offset
+    flush(size)
+    if copy_count:
+        ops.append(b'C' + struct.pack('>II', copy_start, copy_count))
+    if literal_bytes > max_literal:
+        return None
+    return struct.pack('>I', block_size) + b''.join(ops)
+
+
+def patch (basis:bytes, patch_data:bytes) -> bytes:
+    """Aplica un `delta` sobre la versión anterior `basis`."""
+    block_size = struct.unpack_from('>I', patch_data)[0]
+    parts = []
+    offset = 4
+    while offset < len(patch_data):
+        op = patch_data[offset:offset + 1]
+        if op == b'C':
+            start, count = struct.unpack_from('>II', patch_data, offset + 1)
+            parts.append(basis[start * block_size:(start + count) * block_size])
+            offset += 9
+        elif op == b'D':
+            length = struct.unpack_from('>I', patch_data, offset + 1)[0]
+            parts.append(patch_data[offset + 5:offset + 5 + length])
+            offset += 5 + length
+        else:
+            raise ValueError(f'Corrupted delta, unknown op {op!r}')
+    return b''.join(parts)
+
+
+def readFile (path:str) -> bytes:
+    try:
+        with open(path, 'rb') as file:
+            return file.read()
+    except FileNotFoundError:
+        return b''
+
+
+def writeFile (path:str, data:bytes, sha256:str) -> None:
+    if hashlib.sha256(data).hexdigest() != sha256:
+        raise ValueError(f'{os.path.basename(path)} does not match its hash after patching')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(data)
+    os.replace(temp_path, path)
+
+
+def listFiles (root:str) -> dict:
+    """`{ruta_relativa: sha256}` de los archivos de `root`."""
+    files = {}
+    if not os.path.isdir(root):
+        return files
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            files[os.path.relpath(path, root).replace(os.sep, '/')] = hashlib.sha256(readFile(path)).hexdigest()
+    return files
+
+
+
+@dataclass
+class SyncReport:
+    direction:str = 'push'
+    files:int = 0
+    unchanged:int = 0
+    deleted:int = 0
+    # Lo que se hubiera mandado con los archivos enteros
+    full_bytes:int = 0
+    bytes_sent:int = 0
+    bytes_received:int = 0
+    # Lo que se hubiera transferido sin comprimir, y cómo se comprimió lo último
+    payload_bytes:int = 0
+    compression:str = 'none'
+    changed:list = field(default_factory=list)
+    # Archivos con cambios locales sin subir que el pull no tocó
+    conflicts:list = field(default_factory=list)
+
+    @property
+    def transferred (self) -> int:
+        """Bytes de datos que viajaron en el sentido de la sincronización."""
+        return self.bytes_sent if self.direction == 'push' else self.bytes_received
+
+    @property
+    def ratio (self) -> float:
+        return self.transferred / self.full_bytes if self.full_bytes else 0.0
+
+    def __str__ (self) -> str:
+        return (f'{self.direction}: {self.files} file(s) synced, {self.unchanged} unchanged, {self.deleted} deleted, '
+                f'{self.transferred} bytes transferred of {self.full_bytes} full ({self.ratio:.1%}); '
+                f'{self.payload_bytes} before {self.compression}; {self.bytes_sent} sent, {self.bytes_received} received'
+                + (f'; kept local changes in {", ".join(self.conflicts)}' if self.conflicts else ''))
+
+
+
+class DirectoryRemote:
+    """Lado remoto de `DeltaTransport` sobre una carpeta (disco compartido,
+    carpeta local o el otro extremo de `LoopbackServer`). Los payloads
+    viajan comprimidos; los diccionarios que suben los clientes se guardan
+    en `dictionary_dir`, por defecto una carpeta hermana de `root`."""
+    def __init__(self, root:str, dictionary_dir:str=None):
+        self.root = root
+        self.lock = threading.Lock()
+        self.codec = Compressor(dictionary_dir or os.path.normpath(root) + '.dictionaries')
+
+
+    def path (self, relpath:str) -> str:
+        path = os.path.normpath(os.path.join(self.root, relpath))
+        if not path.startswith(os.path.normpath(self.root) + os.sep):
+            raise ValueError(f'Path outside the remote: {relpath}')
+        return path
+
+
+    def list (self) -> dict:
+        with self.lock:
+            return listFiles(self.root)
+
+
+    def capabilities (self) -> dict:
+        return {'methods': self.codec.methods, 'dictionaries': self.codec.dictionaryIds()}
+
+
+    def dictionary (self, dict_id:int) -> bytes:
+        return self.codec.dictionaryData(dict_id)
+
+
+    def putDictionary (self, dict_id:int, data:bytes) -> None:
+        with self.lock:
+            self.codec.addDictionary(dict_id, data)
+
+
+    def signature (self, relpath:str) -> bytes:
+        return signature(readFile(self.path(relpath)))
+
+
+    def delta (self, relpath:str, sig:bytes, method:str='none', level:int=0, dict_id:int=None) -> bytes:
+        """Delta de la versión remota contra la firma del cliente, comprimido
+        como pide el cliente. Si no conviene, el archivo entero precedido de `F`."""
+        data = readFile(self.path(relpath))
+        result = delta(data, sig) if sig else None
+        payload = b'F' + data if result is None else b'P' + result
+        if dict_id not in self.codec.dictionaryIds():
+            dict_id = None
+        return self.codec.compress(payload, method, level, dict_id)
+
+
+    def put (self, relpath:str, payload:bytes, sha256:str) -> None:
+        """Guarda una versión nueva: `P` + delta contra la actual o `F` +
+        archivo entero, comprimido por el cliente."""
+        path = self.path(relpath)
+        payload = self.codec.decompress(payload)
+        with self.lock:
+            data = patch(readFile(path), payload[1:]) if payload[:1] == b'P' else payload[1:]
+            writeFile(path, data, sha256)
+
+
+    def delete (self, relpath:str) -> None:
+        with self.lock:
+            try:
+                os.remove(self.path(relpath))
+            except FileNotFoundError:
+                pass
+
+
+
+class LoopbackServer(socketserver.ThreadingTCPServer):
+    """Sirve un `DirectoryRemote` por TCP en localhost, para probar el
+    transporte con bytes reales por un socket. Cada mensaje es un header
+    JSON y un payload binario, ambos con su largo delante."""
+    daemon_threads = True
+    allow_reuse_address = True
+    def __init__(self, root:str, port:int=0):
+        self.remote = DirectoryRemote(root)
+        super().__init__(('127.0.0.1', port), LoopbackHandler)
+        self.thread = None
+
+
+    def start (self) -> tuple:
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self.server_address
+
+
+    def stop (self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+
+def sendMessage (sock:socket.socket, header:dict, payload:bytes=b'') -> int:
+    header = json.dumps(header).encode()
+    message = struct.pack('>II', len(header), len(payload)) + header + payload
+    sock.sendall(message)
+    return len(message)
+
+
+def receiveExact (sock:socket.socket, size:int) -> bytes:
+    parts = []
+    while size:
+        part = sock.recv(min(size, 1 << 20))
+        if not part:
+            raise ConnectionError('Connection closed by peer')
+        parts.append(part)
+        size -= len(part)
+    return b''.join(parts)
+
+
+def receiveMessage (sock:socket.socket) -> tuple:
+    header_size, payload_size = struct.unpack('>II', receiveExact(sock, 8))
+    header = json.loads(receiveExact(sock, header_size))
+    payload = receiveExact(sock, payload_size)
+    return header, payload, 8 + header_size + payload_size
+
+
+
+class LoopbackHandler(socketserver.BaseRequestHandler):
+    def handle (self):
+        remote = self.server.remote
+        while True:
+            try:
+                header, payload, _ = receiveMessage(self.request)
+            except ConnectionError:
+                return
+            try:
+                match (header['op']):
+                    case 'capabilities':
+                        sendMessage(self.request, remote.capabilities())
+                    case 'dictionary':
+                        sendMessage(self.request, {}, remote.dictionary(header['id']))
+                    case 'putDictionary':
+                        remote.putDictionary(header['id'], payload)
+                        sendMessage(self.request, {})
+                    case 'list':
+                        sendMessage(self.request, {'files': remote.list()})
+                    case 'signature':
+                        sendMessage(self.request, {}, remote.signature(header['path']))
+                    case 'delta':
+                        sendMessage(self.request, {}, remote.delta(
+                            header['path'], payload, header['method'], header['level'], header['dictionary']
+                        ))
+                    case 'put':
+                        remote.put(header['path'], payload, header['sha256'])
+                        sendMessage(self.request, {})
+                    case 'delete':
+                        remote.delete(header['path'])
+                        sendMessage(self.request, {})
+                    case _:
+                        sendMessage(self.request, {'error': f'Unknown op {header.get("op")!r}'})
+            except KeyError as e:
+                sendMessage(self.request, {'error': f'Missing field {e} in {header.get("op")!r}'})
+            except (OSError, ValueError) as e:
+                sendMessage(self.request, {'error': str(e)})
+
+
+
+class LoopbackRemote:
+    """Cliente de `LoopbackServer` con la misma interfaz que `DirectoryRemote`.
+    Cuenta los bytes que pasan por el socket en cada sentido."""
+    def __init__(self, host:str, port:int, timeout:float=30):
+        self.address = (host, port)
+        self.timeout = timeout
+        self.sock = None
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+
+    def call (self, header:dict, payload:bytes=b'') -> tuple:
+        if self.sock is None:
+            self.sock = socket.create_connection(self.address, self.timeout)
+        try:
+            self.bytes_sent += sendMessage(self.sock, header, payload)
+            response, data, size = receiveMessage(self.sock)
+        except OSError:
+            self.close()
+            raise
+        self.bytes_received += size
+        if 'error' in response:
+            raise ValueError(response['error'])
+        return response, data
+
+
+    def capabilities (self) -> dict:
+        return self.call({'op': 'capabilities'})[0]
+
+
+    def dictionary (self, dict_id:int) -> bytes:
+        return self.call({'op': 'dictionary', 'id': dict_id})[1]
+
+
+    def putDictionary (self, dict_id:int, data:bytes) -> None:
+        self.call({'op': 'putDictionary', 'id': dict_id}, data)
+
+
+    def list (self) -> dict:
+        return self.call({'op': 'list'})[0]['files']
+
+
+    def signature (self, relpath:str) -> bytes:
+        return self.call({'op': 'signature', 'path': relpath})[1]
+
+
+    def delta (self, relpath:str, sig:bytes, method:str='none', level:int=0, dict_id:int=None) -> bytes:
+        header = {'op': 'delta', 'path': relpath, 'method': method, 'level': level, 'dictionary': dict_id}
+        return self.call(header, sig)[1]
+
+
+    def put (self, relpath:str, payload:bytes, sha256:str) -> None:
+        self.call({'op': 'put', 'path': relpath, 'sha256': sha256}, payload)
+
+
+    def delete (self, relpath:str) -> None:
+        self.call({'op': 'delete', 'path': relpath})
+
+
+    def close (self) -> None:
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+
+
+
+class Transport:
+    """Cómo viajan las partidas entre este cliente y el remoto compartido.
+    `push` y `pull` reciben `on_progress(GitProgress)` y retornan `True` si
+    terminaron bien. `last_report` tiene el `SyncReport` de la última
+    sincronización, si el transporte lo mide."""
+    last_report:SyncReport = None
+
+    def push (self, on_progress=None) -> bool:
+        raise NotImplementedError
+
+    def pull (self, on_progress=None, depth:int=None) -> bool:
+        raise NotImplementedError
+
+
+
+class GitTransport(Transport):
+    """El remoto es el repo de git: push y pull normales."""
+    def __init__(self, engine:GitEngine):
+        self.engine = engine
+
+
+    def push (self, on_progress=None) -> bool:
+        return self.engine.push(on_progress)
+
+
+    def pull (self, on_progress=None, depth:int=None) -> bool:
+        return self.engine.pull(depth, on_progress)
+
+
+
+class DeltaTransport(Transport):
+    """Sincroniza la carpeta de partidas con un remoto (`DirectoryRemote` o
+    `LoopbackRemote`) al estilo rsync: por cada archivo distinto se pide la
+    firma de la versión que ya tiene el otro lado y sólo viajan los rangos
+    que cambiaron. git queda como historia local.
+
+    Los payloads viajan comprimidos con el nivel que elige `Compressor`
+    según el ancho de banda medido en cada sentido. Con `dictionary_dir`
+    cada `train_interval` segundos se entrena un diccionario zstd con las
+    partidas, se sube al remoto y lo usan todos los clientes.
+
+    `synced` (guardado en `state_path`) es `{ruta: sha256}` de la última
+    sincronización. Lo que difiere de ahí son cambios locales sin subir: el
+    pull no los pisa ni los borra, y el push sólo manda eso. Si el remoto
+    también cambió uno de esos archivos el push falla sin tocar nada, como
+    el compare-and-swap de `StorageTransport`, y hay que hacer pull primero."""
+    def __init__(self, local_root:str, remote, dictionary_dir:str=None, train_interval:float=7 * 86400, state_path:str=None):
+        self.local_root = local_root
+        self.remote = remote
+        self.codec = Compressor(dictionary_dir)
+        self.train_interval = train_interval
+        self.upload = BandwidthMeter()
+        self.download = BandwidthMeter()
+        self.last_report = None
+        self.state_path = state_path
+        self.synced = {}
+        if state_path and os.path.exists(state_path):
+            with open(state_path, 'r', encoding='utf-8') as file:
+                self.synced = json.load(file)
+
+
+    def setSynced (self, synced:dict) -> None:
+        self.synced = synced
+        if self.state_path:
+            temp_path = self.state_path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                json.dump(synced, file)
+            os.replace(temp_path, self.state_path)
+
+
+    def negotiate (self, report:SyncReport) -> tuple:
+        """Métodos que entienden los dos lados y diccionario a usar. Si el
+        remoto tiene un diccionario más nuevo que los nuestros, se baja."""
+        capabilities = self.remote.capabilities()
+        methods = [method for method in self.codec.methods if method in capabilities['methods']]
+        if 'zstd' not in methods or not self.codec.dictionary_dir:
+            return methods, None
+        local = self.codec.dictionaryIds()
+        remote = capabilities['dictionaries']
+        if remote and remote[-1] not in local:
+            data = self.remote.dictionary(remote[-1])
+            self.codec.addDictionary(remote[-1], data)
+            report.bytes_received += len(data)
+        elif local and local[-1] not in remote:
+            data = self.codec.dictionaryData(local[-1])
+            self.remote.putDictionary(local[-1], data)
+            report.bytes_sent += len(data)
+        return methods, self.codec.current
+
+
+    def trainDictionary (self) -> int:
+        """Entrena un diccionario nuevo si el actual es viejo. Se sube en la
+        próxima sincronización."""
+        if not self.codec.needsTraining(self.train_interval):
+            return None
+        paths = [os.path.join(self.local_root, relpath) for relpath in listFiles(self.local_root)]
+        return self.codec.train(paths)
+
+
+    def progress (self, on_progress, phase:str, done:int, total:int) -> None:
+        if on_progress and total:
+            on_progress(GitProgress(phase, done * 100 // total, done, total))
+
+
+    def push (self, on_progress=None) -> bool:
+        report = SyncReport()
+        methods, dict_id = self.negotiate(report)
+        local = listFiles(self.local_root)
+        remote = self.remote.list()
+        report.bytes_received += len(json.dumps(remote))
+        # Lo que cambió acá desde la última sincronización; lo demás, si difiere, es más nuevo en el remoto
+        modified = {relpath for relpath in local.keys() | self.synced.keys()
+                    if local.get(relpath) != self.synced.get(relpath) and remote.get(relpath) != local.get(relpath)}
+        report.conflicts = sorted(relpath for relpath in modified if remote.get(relpath) != self.synced.get(relpath))
+        if report.conflicts:
+            self.last_report = report
+            raise ValueError(f'Remote changed {", ".join(report.conflicts)} since the last sync, pull before pushing')
+        for done, (relpath, sha256) in enumerate(sorted(local.items()), 1):
+            if relpath not in modified:
+                report.unchanged += 1
+                continue
+            data = readFile(os.path.join(self.local_root, relpath))
+            sig = self.remote.signature(relpath) if relpath in remote else b''
+            result = delta(data, sig) if sig else None
+            payload = b'F' + data if result is None else b'P' + result
+            method, level = self.codec.choose(self.upload.bandwidth, methods)
+            compressed = self.codec.compress(payload, method, level, dict_id)
+            start = time.perf_counter()
+            self.remote.put(relpath, compressed, sha256)
+            self.upload.record(len(compressed), time.perf_counter() - start)
+            report.files += 1
+            report.full_bytes += len(data)
+            report.payload_bytes += len(payload)
+            report.bytes_sent += len(compressed)
+            report.compression = f'{method}-{level}' + ('+dict' if dict_id and method == 'zstd' else '')
+            report.bytes_received += len(sig)
+            report.changed.append(relpath)
+            self.progress(on_progress, 'Writing objects', done, len(local))
+        for relpath in sorted(modified - local.keys()):
+            self.remote.delete(relpath)
+            report.deleted += 1
+            report.changed.append(relpath)
+        self.progress(on_progress, 'Writing objects', 1, 1)
+        self.setSynced(local)
+        self.last_report = report
+        self.trainDictionary()
+        return True
+
+
+    def pull (self, on_progress=None, depth:int=None) -> bool:
+        report = SyncReport('pull')
+        methods, dict_id = self.negotiate(report)
+        local = listFiles(self.local_root)
+        remote = self.remote.list()
+        report.bytes_received += len(json.dumps(remote))
+        synced = dict(self.synced)
+        for done, (relpath, sha256) in enumerate(sorted(remote.items()), 1):
+            if local.get(relpath) == sha256:
+                synced[relpath] = sha256
+                report.unchanged += 1
+                continue
+            if relpath in local and local[relpath] != self.synced.get(relpath):
+                # Guardado acá y todavía sin subir
+                report.conflicts.append(relpath)
+                continue
+            path = os.path.join(self.local_root, relpath)
+            basis = readFile(path)
+            sig = signature(basis) if basis else b''
+            method, level = self.codec.choose(self.download.bandwidth, methods)
+            start = time.perf_counter()
+            compressed = self.remote.delta(relpath, sig, method, level, dict_id)
+            self.download.record(len(compressed), time.perf_counter() - start)
+            payload = self.codec.decompress(compressed)
+            data = patch(basis, payload[1:]) if payload[:1] == b'P' else payload[1:]
+            writeFile(path, data, sha256)
+            synced[relpath] = sha256
+            report.files += 1
+            report.full_bytes += len(data)
+            report.payload_bytes += len(payload)
+            report.bytes_sent += len(sig)
+            report.bytes_received += len(compressed)
+            report.compression = f'{method}-{level}' + ('+dict' if dict_id and method == 'zstd' else '')
+            report.changed.append(relpath)
+            self.progress(on_progress, 'Receiving objects', done, len(remote))
+        for relpath in local.keys() - remote.keys():
+            # Sólo se borra lo que estaba subido y no cambió; lo demás es nuevo de acá
+            if self.synced.get(relpath) != local[relpath]:
+                report.conflicts.append(relpath)
+                continue
+            os.remove(os.path.join(self.local_root, relpath))
+            synced.pop(relpath, None)
+            report.deleted += 1
+            report.changed.append(relpath)
+        for relpath in synced.keys() - remote.keys():
+            synced.pop(relpath)
+        self.progress(on_progress, 'Receiving objects', 1, 1)
+        self.setSynced(synced)
+        self.last_report = report
+        return True
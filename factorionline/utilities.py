@@ -1,14 +1,16 @@
 import time
-import windows_toasts as wt
 
 class Notification:
     appname = 'Factorionline'
-    durations = {
-        'short': wt.ToastDuration.Short,
-        'long': wt.ToastDuration.Long,
-        'default': wt.ToastDuration.Default
-    }
     def __init__ (self, message:str, title:str, config:dict=None):
+        # windows_toasts es pesado, se carga con la primera notificación
+        import windows_toasts as wt
+        self.wt = wt
+        self.durations = {
+            'short': wt.ToastDuration.Short,
+            'long': wt.ToastDuration.Long,
+            'default': wt.ToastDuration.Default
+        }
         self.message = message
         self.title = title
         self.config = config if config else {
@@ -46,6 +48,7 @@ class Notification:
 
     # Add widwets to the notification body
     def make_widgets (self, widgets):
+        wt = self.wt
         for w in widgets:
             match (w.get('type')):
                 case 'button':
@@ -75,7 +78,7 @@ class Notification:
 
 
     # Enters always when notification is actioned
-    def action (self, activatedEventArgs: wt.ToastActivatedEventArgs):
+    def action (self, activatedEventArgs: 'wt.ToastActivatedEventArgs'):
         if self.on_action:
             self.on_action(activatedEventArgs.arguments)
         else:
@@ -83,7 +86,7 @@ class Notification:
 
 
     # Enters always when notification is dissmised
-    def dissmis (self, dismissdEventArgs: wt.ToastDismissedEventArgs):
+    def dissmis (self, dismissdEventArgs: 'wt.ToastDismissedEventArgs'):
         self.toaster.remove_toast(self.toast)
 
 
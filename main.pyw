@@ -2,7 +2,7 @@ from factorionline.factorionline import Factorionline
 from factorionline.logger import Log
 
 try:
-    app = Factorionline(Log(debug=True))
+    app = Factorionline(Log(debug=False))
     app.run()
 except Exception as e:
     app.stop()
@@ -7,7 +7,7 @@ from rich.text import Text
 
 from factorionline import Log
 
-logger = Log()
+logger = Log(show_locals=True)
 name = 'main_debug' # For log
 
 def run_pytest():
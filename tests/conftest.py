@@ -0,0 +1,5 @@
+import os
+import tempfile
+
+# filemanager arma sus rutas con %APPDATA% al importarse; fuera de Windows no existe
+os.environ.setdefault('APPDATA', tempfile.mkdtemp(prefix='factorionline-appdata-'))
@@ -0,0 +1,98 @@
+import os
+import random
+
+import pytest
+
+from factorionline import chunkstore
+from factorionline.chunkstore import ChunkStore, chunkBoundaries
+
+
+def randomBytes (size:int, seed:int=0) -> bytes:
+    return random.Random(seed).randbytes(size)
+
+
+DATA = randomBytes(2 * 1024 * 1024)
+
+
+def chunks (data:bytes, min_size:int=16 * 1024, max_size:int=1024 * 1024) -> list:
+    start, result = 0, []
+    for end in chunkBoundaries(data, min_size, max_size):
+        result.append(data[start:end])
+        start = end
+    return result
+
+
+def write (path, data:bytes) -> str:
+    with open(path, 'wb') as file:
+        file.write(data)
+    return str(path)
+
+
+def test_boundaries_cover_data_within_limits ():
+    parts = chunks(DATA, 4096, 128 * 1024)
+    assert b''.join(parts) == DATA
+    assert all(4096 <= len(part) <= 128 * 1024 for part in parts[:-1])
+    assert len(parts) > 8
+
+
+def test_insertion_only_changes_nearby_chunks ():
+    edited = DATA[:500000] + b'inserted bytes' + DATA[500000:]
+    before, after = set(chunks(DATA)), chunks(edited)
+    assert sum(len(part) for part in after if part not in before) < 300 * 1024
+
+
+def test_zeros_are_cut_at_max_size ():
+    assert [len(part) for part in chunks(bytes(300 * 1024), 4096, 100 * 1024)] == [100 * 1024] * 3
+
+
+@pytest.fixture
+def store (tmp_path):
+    return ChunkStore(str(tmp_path / 'store'))
+
+
+def test_put_materialise_round_trip (store, tmp_path):
+    source = write(tmp_path / 'world.zip', DATA)
+    manifest, written = store.put(source)
+    assert written and sum(size for _, size in manifest.chunks) == len(DATA)
+    target = str(tmp_path / 'restored.zip')
+    store.materialise(manifest, target)
+    with open(target, 'rb') as file:
+        assert file.read() == DATA
+    assert os.stat(target).st_mtime_ns == os.stat(source).st_mtime_ns
+    # La misma versión no escribe nada nuevo
+    assert store.put(source)[1] == []
+
+
+def test_versions_share_chunks (store, tmp_path):
+    store.put(write(tmp_path / 'v1.zip', DATA))
+    _, written = store.put(write(tmp_path / 'v2.zip', DATA[:1000000] + b'edit' + DATA[1000004:]))
+    report = store.report()
+    assert report.versions == 2
+    assert report.logical_bytes == 2 * len(DATA)
+    assert report.stored_bytes < 1.3 * len(DATA)
+    # Sólo los chunks tocados y el manifiesto de la versión
+    assert len(written) < report.unique_chunks
+
+
+def test_corrupted_chunk_is_detected (store, tmp_path):
+    manifest, _ = store.put(write(tmp_path / 'world.zip', DATA))
+    write(store.objectPath(manifest.chunks[0][0]), b'garbage')
+    target = str(tmp_path / 'restored.zip')
+    with pytest.raises(ValueError):
+        store.materialise(manifest, target)
+    assert not os.path.exists(target) and not os.path.exists(target + '.tmp')
+
+
+def test_collect_and_publish (store, tmp_path):
+    saves, repo, restored = tmp_path / 'saves', tmp_path / 'repo', tmp_path / 'restored'
+    saves.mkdir()
+    write(saves / 'world.zip', DATA)
+    touched = chunkstore.collect(str(saves), str(repo), store, ['world.zip'], [])
+    assert str(repo / ('world.zip' + chunkstore.MANIFEST_SUFFIX)) in touched
+    assert chunkstore.publish(str(repo), str(restored), store) == 1
+    with open(restored / 'world.zip', 'rb') as file:
+        assert file.read() == DATA
+    assert chunkstore.publish(str(repo), str(restored), store) == 0
+    chunkstore.collect(str(saves), str(repo), store, [], ['world.zip'])
+    chunkstore.publish(str(repo), str(restored), store)
+    assert os.listdir(restored) == []
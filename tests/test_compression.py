@@ -0,0 +1,102 @@
+import os
+import json
+import random
+
+import pytest
+
+from factorionline.compression import Compressor, BandwidthMeter, MB, zstd
+
+needs_zstd = pytest.mark.skipif(zstd() is None, reason='zstandard is not installed')
+
+
+def sampleSave (seed:int) -> bytes:
+    """Datos comprimibles con estructura repetida, como un level.dat."""
+    rng = random.Random(seed)
+    return json.dumps([{'entity': rng.choice(['belt', 'inserter', 'assembler']), 'x': rng.randrange(500),
+                        'y': rng.randrange(500), 'recipe': rng.choice(['gear', 'circuit', None])}
+                       for _ in range(3000)]).encode()
+
+
+def test_level_follows_bandwidth ():
+    codec = Compressor()
+    method = codec.methods[0]
+    slow, fast = codec.choose(100 * 1024), codec.choose(10 * 1024 * MB)
+    assert slow[0] == method and slow[1] > codec.choose(20 * MB)[1]
+    # En una red muy rápida comprimir cuesta más de lo que ahorra
+    assert fast == ('none', 0)
+    assert codec.choose(None)[0] == method
+
+
+def test_choose_respects_peer_methods ():
+    codec = Compressor()
+    assert codec.choose(100 * 1024, ['zlib', 'none'])[0] == 'zlib'
+    assert codec.choose(100 * 1024, ['none']) == ('none', 0)
+
+
+def test_uncompressed_choice_is_probed_again ():
+    codec = Compressor()
+    choices = [codec.choose(10 * 1024 * MB) for _ in range(16)]
+    assert choices[:15] == [('none', 0)] * 15
+    assert choices[15][0] != 'none'
+
+
+@pytest.mark.parametrize('method', ['none', 'zlib', pytest.param('zstd', marks=needs_zstd)])
+def test_round_trip (method):
+    codec = Compressor()
+    data = sampleSave(0)
+    payload = codec.compress(data, method, None)
+    assert payload[:1] == {'none': b'N', 'zlib': b'Z', 'zstd': b'S'}[method]
+    assert method == 'none' or len(payload) < len(data) / 2
+    assert Compressor().decompress(payload) == data
+
+
+def test_small_payloads_are_not_compressed ():
+    assert Compressor().compress(b'tiny', 'zlib') == b'Ntiny'
+
+
+def test_corrupted_payloads_raise ():
+    codec = Compressor()
+    with pytest.raises(ValueError):
+        codec.decompress(b'Z' + os.urandom(100))
+    with pytest.raises(ValueError):
+        codec.decompress(b'?' + b'data')
+
+
+def test_learn_adapts_ratio ():
+    codec = Compressor(alpha=1)
+    codec.learn('zlib', 6, 100000, 100000, 1)
+    # Datos que no se comprimen: el ratio medido pasa a ~1
+    assert codec.scales['zlib'][1] == pytest.approx(1 / 0.31)
+
+
+def test_bandwidth_meter_ignores_small_transfers ():
+    meter = BandwidthMeter(alpha=0.5, min_bytes=1000)
+    meter.record(10, 1)
+    assert meter.bandwidth is None
+    meter.record(10000, 1)
+    meter.record(20000, 1)
+    assert meter.bandwidth == 15000
+
+
+@needs_zstd
+def test_trained_dictionary_is_shared (tmp_path):
+    paths = []
+    for seed in range(4):
+        paths.append(str(tmp_path / f'{seed}.dat'))
+        with open(paths[-1], 'wb') as file:
+            file.write(sampleSave(seed))
+    sender = Compressor(str(tmp_path / 'sender'))
+    assert sender.needsTraining(max_age=3600)
+    dict_id = sender.train(paths, sample_size=4096)
+    assert dict_id and sender.current == dict_id
+    assert not sender.needsTraining(max_age=3600)
+
+    data = sampleSave(10)[:4000]
+    payload = sender.compress(data, 'zstd', 3, dict_id)
+    assert len(payload) < len(Compressor().compress(data, 'zstd', 3))
+    receiver = Compressor(str(tmp_path / 'receiver'))
+    with pytest.raises(ValueError):
+        receiver.decompress(payload)
+    receiver.addDictionary(dict_id, sender.dictionaryData(dict_id))
+    assert receiver.decompress(payload) == data
+    assert receiver.dictionaryIds() == [dict_id]
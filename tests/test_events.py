@@ -0,0 +1,100 @@
+import pytest
+
+from factorionline.events import EventBus, SessionState, SessionStateMachine, InvalidTransition
+
+
+def test_full_session_cycle ():
+    session = SessionStateMachine()
+    for state in (SessionState.CONNECTING, SessionState.LOCKED, SessionState.PLAYING,
+                  SessionState.FLUSHING, SessionState.IDLE):
+        assert session.transition(state)
+        assert session.state == state
+    assert [new_state for _, new_state, _ in session.history] == [
+        SessionState.IDLE, SessionState.CONNECTING, SessionState.LOCKED,
+        SessionState.PLAYING, SessionState.FLUSHING, SessionState.IDLE]
+
+
+def test_same_state_is_not_a_transition ():
+    session = SessionStateMachine()
+    assert not session.transition(SessionState.IDLE)
+    assert len(session.history) == 1
+
+
+@pytest.mark.parametrize('path, invalid', [
+    ((), SessionState.LOCKED),
+    ((), SessionState.FLUSHING),
+    ((SessionState.CONNECTING,), SessionState.FLUSHING),
+    ((SessionState.PLAYING,), SessionState.IDLE),
+    ((SessionState.PLAYING, SessionState.FLUSHING), SessionState.PLAYING),
+])
+def test_invalid_transition_raises_and_keeps_state (path, invalid):
+    session = SessionStateMachine()
+    for state in path:
+        session.transition(state)
+    before = session.state
+    with pytest.raises(InvalidTransition):
+        session.transition(invalid)
+    assert session.state == before
+    assert len(session.history) == len(path) + 1
+
+
+def test_time_in_current_state_only ():
+    session = SessionStateMachine()
+    session.transition(SessionState.PLAYING)
+    assert session.isIn(SessionState.PLAYING, SessionState.FLUSHING)
+    assert session.timeIn(SessionState.PLAYING) >= 0
+    assert session.timeIn(SessionState.IDLE) == 0
+    assert set(session.timestamps()) == {SessionState.IDLE, SessionState.PLAYING}
+
+
+def test_bus_runs_subscribers_and_queues ():
+    bus = EventBus()
+    seen = []
+    bus.subscribe('x', seen.append)
+    bus.publish('x', 1)
+    bus.unsubscribe('x', seen.append)
+    bus.publish('x', 2)
+    assert [event.data for event in seen] == [1]
+    assert [bus.get(0).data, bus.get(0).data] == [1, 2]
+    assert bus.get(0) is None
+
+
+class RecordingLog:
+    def __init__(self):
+        self.errors = []
+
+    def error (self, text, *args, **kwargs):
+        self.errors.append(text)
+
+    def warning (self, *args, **kwargs):
+        pass
+
+    def debug (self, *args, **kwargs):
+        pass
+
+
+def test_main_loop_survives_handler_errors ():
+    from factorionline.factorionline import Factorionline
+    app = Factorionline.__new__(Factorionline)
+    app.logger = RecordingLog()
+    app.events = EventBus()
+    app.session = SessionStateMachine()
+    app.running = True
+    handled = []
+
+    def handleEvent (event):
+        handled.append(event.id)
+        match (event.id):
+            case 'boom':
+                raise RuntimeError('boom')
+            case 'invalid':
+                app.session.transition(SessionState.FLUSHING)
+            case 'stop':
+                app.running = False
+
+    app.handleEvent = handleEvent
+    for event_id in ('boom', 'invalid', 'stop'):
+        app.events.publish(event_id)
+    app.mainLoop()
+    assert handled == ['boom', 'invalid', 'stop']
+    assert len(app.logger.errors) == 2
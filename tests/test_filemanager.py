@@ -0,0 +1,83 @@
+import os
+import subprocess
+
+import pytest
+
+from factorionline.logger import Log
+from factorionline.events import EventBus
+from factorionline.filemanager import FileManager
+from factorionline.gitengine import GitEngine
+
+pytest.importorskip('git')
+
+
+class FakeTransport:
+    last_report = None
+
+    def __init__(self):
+        self.pushes = 0
+
+    def push (self, on_progress=None) -> bool:
+        self.pushes += 1
+        return True
+
+
+@pytest.fixture
+def filemanager (tmp_path):
+    """FileManager sobre un repo vacío en `tmp_path`, sin notificaciones ni barra de progreso."""
+    repo = str(tmp_path / 'repo')
+    subprocess.run(['git', 'init', '--quiet', repo], check=True)
+    for key, value in (('user.name', 'factorionline'), ('user.email', 'factorionline@localhost')):
+        subprocess.run(['git', '-C', repo, 'config', key, value], check=True)
+    filemanager = FileManager(Log(debug=False), EventBus())
+    filemanager.git = GitEngine(repo)
+    filemanager.transport = FakeTransport()
+    filemanager.git_progress = lambda run, *args, **kwargs: run(None)
+    yield filemanager
+    filemanager.git.close()
+
+
+def save (filemanager:FileManager, data:bytes) -> str:
+    with open(os.path.join(filemanager.git.path, 'world.zip'), 'wb') as file:
+        file.write(data)
+    return filemanager.commitRepo(['world.zip'])
+
+
+def history (filemanager:FileManager) -> list:
+    return [commit.hexsha for commit in filemanager.git.repo.iter_commits()]
+
+
+def test_session_saves_are_squashed (filemanager):
+    filemanager.startSquash()
+    first = save(filemanager, b'v1')
+    second = save(filemanager, b'v2')
+    assert first != second
+    assert history(filemanager) == [second]
+    assert 'Saves: 2' in filemanager.git.head().message
+    assert filemanager.git.head().tree['world.zip'].data_stream.read() == b'v2'
+
+
+def test_each_policy_commits_every_save (filemanager):
+    filemanager.commit_policy = 'each'
+    first = save(filemanager, b'v1')
+    second = save(filemanager, b'v2')
+    assert history(filemanager) == [second, first]
+
+
+def test_no_amend_while_pushing (filemanager):
+    first = save(filemanager, b'v1')
+    with filemanager.push_lock:
+        second = save(filemanager, b'v2')
+    assert history(filemanager) == [second, first]
+
+
+def test_pushed_commit_is_not_amended (filemanager):
+    first = save(filemanager, b'v1')
+    assert filemanager.pushRepo()
+    second = save(filemanager, b'v2')
+    assert history(filemanager) == [second, first]
+
+
+def test_push_on_repo_without_commits (filemanager):
+    assert filemanager.pushRepo()
+    assert filemanager.transport.pushes == 1
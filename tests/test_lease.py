@@ -0,0 +1,68 @@
+import time
+import asyncio
+
+import pytest
+
+from factorionline.lease import InMemoryLeaseBackend, SQLiteLeaseBackend
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def backend (request, tmp_path):
+    """Un backend vacío de cada tipo, con un TTL corto para probar vencimientos."""
+    if request.param == 'memory':
+        return InMemoryLeaseBackend(ttl=0.2)
+    return SQLiteLeaseBackend(str(tmp_path / 'lease.db'), ttl=0.2)
+
+
+def test_acquire_is_exclusive (backend):
+    first = asyncio.run(backend.acquire('pc-a', 'alice'))
+    assert first.token == 1
+    assert asyncio.run(backend.acquire('pc-b', 'bob')) is None
+    # Volver a tomarlo el mismo dueño no cambia el token
+    again = asyncio.run(backend.acquire('pc-a', 'alice'))
+    assert again.token == first.token
+
+
+def test_token_grows_on_every_owner_change (backend):
+    first = asyncio.run(backend.acquire('pc-a', 'alice'))
+    assert asyncio.run(backend.release(first))
+    second = asyncio.run(backend.acquire('pc-b', 'bob'))
+    assert second.token == first.token + 1
+    assert asyncio.run(backend.validate(second.token))
+    assert not asyncio.run(backend.validate(first.token))
+
+
+def test_stale_holder_is_fenced (backend):
+    stale = asyncio.run(backend.acquire('pc-a', 'alice'))
+    time.sleep(0.3)
+    assert asyncio.run(backend.current()) is None
+    fresh = asyncio.run(backend.acquire('pc-b', 'bob'))
+    assert fresh.token > stale.token
+    # El dueño anterior ya no puede renovar, soltar ni escribir con su token
+    assert asyncio.run(backend.renew(stale)) is None
+    assert not asyncio.run(backend.release(stale))
+    assert not asyncio.run(backend.validate(stale.token))
+    assert asyncio.run(backend.current()) == fresh
+
+
+def test_expired_lease_retaken_by_same_holder_gets_new_token (backend):
+    first = asyncio.run(backend.acquire('pc-a', 'alice'))
+    time.sleep(0.3)
+    second = asyncio.run(backend.acquire('pc-a', 'alice'))
+    assert second.token == first.token + 1
+
+
+def test_renew_extends_expiry (backend):
+    lease = asyncio.run(backend.acquire('pc-a', 'alice'))
+    time.sleep(0.1)
+    renewed, online = asyncio.run(backend.heartbeat(lease))
+    assert online
+    assert renewed.token == lease.token
+    assert renewed.expires > lease.expires
+
+
+def test_release_keeps_token_monotonic (backend):
+    lease = asyncio.run(backend.acquire('pc-a', 'alice'))
+    asyncio.run(backend.release(lease))
+    assert asyncio.run(backend.current()) is None
+    assert asyncio.run(backend.acquire('pc-a', 'alice')).token == lease.token + 1
@@ -0,0 +1,35 @@
+import sys
+import subprocess
+
+import pytest
+
+from factorionline.logger import Log
+from factorionline.maintenance import MaintenanceScheduler
+
+
+class ExitedProcess:
+    """Proceso que terminó justo después de que `poll` dijera que seguía vivo."""
+    def __init__(self, pid:int):
+        self.pid = pid
+
+    def poll (self):
+        return None
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='uses process groups')
+def test_cancel_tolerates_a_task_that_just_exited (tmp_path):
+    process = subprocess.Popen(['true'], start_new_session=True)
+    process.wait()
+    scheduler = MaintenanceScheduler(Log(debug=False), str(tmp_path))
+    scheduler.process = ExitedProcess(process.pid)
+    scheduler.setIdle(False)
+    assert not scheduler.cancelled
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='uses process groups')
+def test_cancel_kills_the_running_task (tmp_path):
+    scheduler = MaintenanceScheduler(Log(debug=False), str(tmp_path))
+    scheduler.process = subprocess.Popen(['sleep', '30'], start_new_session=True)
+    scheduler.setIdle(False)
+    assert scheduler.cancelled
+    assert scheduler.process.wait(5) != 0
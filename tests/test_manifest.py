@@ -0,0 +1,62 @@
+import os
+import hashlib
+
+import pytest
+
+from factorionline.manifest import ManifestIndex
+
+
+def write (root, relpath:str, data:bytes) -> None:
+    path = os.path.join(root, relpath)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as file:
+        file.write(data)
+
+
+@pytest.fixture
+def index (tmp_path):
+    index = ManifestIndex(str(tmp_path / 'manifest.db'), workers=2)
+    yield index
+    index.close()
+
+
+def test_refresh_reports_content_changes (index, tmp_path):
+    root = str(tmp_path / 'saves')
+    write(root, 'a.zip', b'a')
+    write(root, 'sub/b.zip', b'b')
+    first = index.refresh(root)
+    assert first.changed == ['a.zip', 'sub/b.zip']
+    assert first.entries['a.zip'].hash == hashlib.sha256(b'a').hexdigest()
+    assert index.refresh(root).empty
+
+    write(root, 'a.zip', b'changed')
+    os.remove(os.path.join(root, 'sub', 'b.zip'))
+    changes = index.refresh(root)
+    assert changes.changed == ['a.zip']
+    assert changes.removed == ['sub/b.zip']
+
+
+def test_rewrite_with_same_content_is_not_a_change (index, tmp_path):
+    root = str(tmp_path / 'saves')
+    write(root, 'a.zip', b'same')
+    index.refresh(root)
+    os.utime(os.path.join(root, 'a.zip'), ns=(1, 1))
+    changes = index.refresh(root)
+    assert changes.empty
+    assert changes.stale == ['a.zip']
+
+
+def test_scan_without_commit_reports_again (index, tmp_path):
+    root = str(tmp_path / 'saves')
+    write(root, 'a.zip', b'a')
+    index.refresh(root)
+    write(root, 'a.zip', b'failed to commit')
+    write(root, 'new.zip', b'new')
+    # Lo que no se commiteó se sigue reportando, incluso desde otra conexión
+    assert index.scan(root).changed == ['a.zip', 'new.zip']
+    reopened = ManifestIndex(index.path)
+    changes = reopened.scan(root)
+    assert changes.changed == ['a.zip', 'new.zip']
+    reopened.commit(changes)
+    reopened.close()
+    assert index.scan(root).empty
@@ -0,0 +1,126 @@
+import os
+import errno
+
+import pytest
+
+from factorionline.mirror import mirror, buildManifest, stagingPath, FileCopier, isLink, linkDir
+
+
+def write (root, relpath:str, data:bytes) -> str:
+    path = os.path.join(root, relpath)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as file:
+        file.write(data)
+    return path
+
+
+def contents (root) -> dict:
+    result = {}
+    for relpath, entry in buildManifest(root).items():
+        with open(entry.path, 'rb') as file:
+            result[relpath.replace(os.sep, '/')] = file.read()
+    return result
+
+
+@pytest.fixture
+def dirs (tmp_path):
+    src, dst = str(tmp_path / 'src'), str(tmp_path / 'dst')
+    write(src, 'a.zip', b'a' * 1000)
+    write(src, 'sub/b.zip', b'b' * 1000)
+    os.makedirs(os.path.join(src, 'empty'))
+    return src, dst
+
+
+def test_first_mirror_copies_everything (dirs):
+    src, dst = dirs
+    stats = mirror(src, dst, 'copy')
+    assert contents(dst) == contents(src)
+    assert os.path.isdir(os.path.join(dst, 'empty'))
+    assert (stats.copied, stats.unchanged, stats.deleted, stats.bytes_copied) == (2, 0, 0, 2000)
+    assert not os.path.exists(stagingPath(dst))
+
+
+def test_second_mirror_only_copies_changes (dirs):
+    src, dst = dirs
+    mirror(src, dst, 'copy')
+    write(src, 'a.zip', b'A' * 1000)
+    write(src, 'new.zip', b'new')
+    os.remove(os.path.join(src, 'sub', 'b.zip'))
+    os.rmdir(os.path.join(src, 'empty'))
+    stats = mirror(src, dst, 'copy')
+    assert contents(dst) == contents(src)
+    assert (stats.copied, stats.unchanged, stats.deleted) == (2, 0, 1)
+    assert not os.path.exists(os.path.join(dst, 'empty'))
+    assert mirror(src, dst, 'copy').copied == 0
+
+
+def test_same_size_different_content_is_copied (dirs):
+    src, dst = dirs
+    mirror(src, dst, 'copy')
+    path = write(src, 'a.zip', b'x' * 1000)
+    stat = os.stat(os.path.join(dst, 'a.zip'))
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert mirror(src, dst, 'copy').copied == 1
+    assert contents(dst)['a.zip'] == b'x' * 1000
+
+
+def test_failed_copy_leaves_destination_intact (dirs, monkeypatch):
+    src, dst = dirs
+    mirror(src, dst, 'copy')
+    before = contents(dst)
+    write(src, 'a.zip', b'changed')
+
+    def fail (*args, **kwargs):
+        raise OSError('disk full')
+
+    monkeypatch.setattr('factorionline.mirror.shutil.copy2', fail)
+    with pytest.raises(OSError):
+        mirror(src, dst, 'copy')
+    assert contents(dst) == before
+    assert not os.path.exists(stagingPath(dst))
+
+
+@pytest.mark.parametrize('method', ['auto', 'copy', 'hardlink', 'reflink'])
+def test_copier_methods_copy_content (tmp_path, method):
+    src = write(str(tmp_path), 'src.zip', os.urandom(10000))
+    dst = str(tmp_path / 'dst.zip')
+    used = FileCopier(method).copy(src, dst)
+    with open(src, 'rb') as a, open(dst, 'rb') as b:
+        assert a.read() == b.read()
+    # Sin soporte (p. ej. reflink en ext4) cae a copia normal
+    assert used in (method, 'copy', 'copy_file_range', 'reflink')
+
+
+def test_unsupported_method_is_not_retried (tmp_path, monkeypatch):
+    copier = FileCopier('reflink')
+    calls = []
+
+    def reflink (src, dst):
+        calls.append(src)
+        raise OSError(errno.EOPNOTSUPP, 'not supported')
+
+    monkeypatch.setattr(copier, 'reflink', reflink)
+    for index in range(2):
+        src = write(str(tmp_path), f'{index}.zip', b'data')
+        assert copier.copy(src, str(tmp_path / f'{index}.copy')) == 'copy'
+    assert len(calls) == 1
+
+
+def test_hardlink_mirror_shares_data (dirs):
+    src, dst = dirs
+    stats = mirror(src, dst, 'hardlink')
+    assert stats.bytes_shared == 2000 and stats.bytes_copied == 0
+    assert os.path.samefile(os.path.join(src, 'a.zip'), os.path.join(dst, 'a.zip'))
+    # Reemplazar el archivo en src no toca la copia publicada
+    write(src, 'a.zip.tmp', b'new')
+    os.replace(os.path.join(src, 'a.zip.tmp'), os.path.join(src, 'a.zip'))
+    assert contents(dst)['a.zip'] == b'a' * 1000
+
+
+def test_link_dir (tmp_path):
+    target = str(tmp_path / 'worktree')
+    write(target, 'a.zip', b'a')
+    link = str(tmp_path / 'saves')
+    linkDir(target, link)
+    assert isLink(link) and not isLink(target)
+    assert contents(link) == {'a.zip': b'a'}
@@ -0,0 +1,119 @@
+import time
+import threading
+
+import pytest
+
+from factorionline.logger import Log
+from factorionline.outbox import PushOutbox
+from factorionline.recovery import RetryPolicy
+
+FAST = RetryPolicy(base_delay=0.05, factor=2, max_delay=0.2)
+
+
+class FlakyPush:
+    """Push que falla las primeras `failures` veces."""
+    def __init__(self, failures:int=0):
+        self.failures = failures
+        self.calls = []
+        self.pushed = threading.Event()
+
+    def __call__ (self) -> bool:
+        self.calls.append(time.monotonic())
+        if len(self.calls) <= self.failures:
+            return False
+        self.pushed.set()
+        return True
+
+
+@pytest.fixture
+def path (tmp_path):
+    return str(tmp_path / 'outbox.json')
+
+
+def startOutbox (outbox:PushOutbox) -> threading.Thread:
+    thread = threading.Thread(target=outbox.run, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_pending_survives_restart (path):
+    outbox = PushOutbox(Log(debug=False), path, FlakyPush())
+    outbox.put('world.zip', 'c1')
+    outbox.put('world.zip', 'c2')
+    restarted = PushOutbox(Log(debug=False), path, FlakyPush())
+    # Sólo queda el último commit de cada partida
+    assert list(restarted.pending) == ['world.zip']
+    assert restarted.pending['world.zip']['commit'] == 'c2'
+
+
+def test_retries_with_backoff_until_pushed (path):
+    push = FlakyPush(failures=2)
+    outbox = PushOutbox(Log(debug=False), path, push, FAST)
+    thread = startOutbox(outbox)
+    try:
+        outbox.put('world.zip', 'c1')
+        assert push.pushed.wait(5)
+    finally:
+        outbox.stop()
+        thread.join(5)
+    assert len(push.calls) == 3
+    # Entre reintentos se espera al menos la mitad del delay de la política
+    gaps = [later - earlier for earlier, later in zip(push.calls, push.calls[1:])]
+    assert gaps[0] >= FAST.delay(0) / 2 and gaps[1] >= FAST.delay(1) / 2
+    assert not outbox.pending and outbox.failures == 0
+    assert PushOutbox(Log(debug=False), path, push).pending == {}
+
+
+def test_hold_and_offline_pause_pushes (path):
+    push = FlakyPush()
+    outbox = PushOutbox(Log(debug=False), path, push, FAST)
+    outbox.hold(True)
+    outbox.setOnline(False)
+    thread = startOutbox(outbox)
+    try:
+        outbox.put('world.zip', 'c1')
+        assert not push.pushed.wait(0.3)
+        outbox.hold(False)
+        assert not push.pushed.wait(0.3)
+        outbox.setOnline(True)
+        assert push.pushed.wait(5)
+    finally:
+        outbox.stop()
+        thread.join(5)
+
+
+def test_batch_delay_groups_saves (path):
+    push = FlakyPush()
+    outbox = PushOutbox(Log(debug=False), path, push, FAST)
+    outbox.batch_delay = 0.3
+    thread = startOutbox(outbox)
+    try:
+        start = time.monotonic()
+        outbox.put('world.zip', 'c1')
+        outbox.put('other.zip', 'c2')
+        assert push.pushed.wait(5)
+    finally:
+        outbox.stop()
+        thread.join(5)
+    assert len(push.calls) == 1
+    assert push.calls[0] - start >= 0.25
+
+
+def test_flush_ignores_hold (path):
+    push = FlakyPush(failures=1)
+    outbox = PushOutbox(Log(debug=False), path, push, FAST)
+    outbox.hold(True)
+    outbox.put('world.zip', 'c1')
+    assert outbox.flush(5)
+    assert len(push.calls) == 2 and not outbox.pending
+
+
+def test_flush_gives_up_at_deadline (path):
+    push = FlakyPush(failures=1000)
+    outbox = PushOutbox(Log(debug=False), path, push, FAST)
+    outbox.put('world.zip', 'c1')
+    start = time.monotonic()
+    assert not outbox.flush(0.5)
+    assert 0.4 <= time.monotonic() - start < 1.5
+    assert len(push.calls) > 1
+    assert PushOutbox(Log(debug=False), path, push).pending['world.zip']['commit'] == 'c1'
@@ -0,0 +1,72 @@
+import sys
+import shutil
+import threading
+import subprocess
+
+import pytest
+
+from factorionline.logger import Log
+from factorionline.events import Event, EventBus
+from factorionline.processwatcher import ProcessWatcher
+
+pytest.importorskip('psutil')
+pytestmark = pytest.mark.skipif(not sys.platform.startswith('linux'), reason='dummy process uses /bin/sleep')
+
+
+@pytest.fixture
+def dummy (tmp_path):
+    """Un `sleep` con nombre propio, para no confundirlo con otros procesos."""
+    path = tmp_path / 'fo-dummy-game'
+    shutil.copy(shutil.which('sleep'), path)
+    return str(path)
+
+
+def expect (events:EventBus, event_id:str):
+    event = events.get(timeout=5)
+    assert event is not None and event.id == event_id
+    return event
+
+
+def startWatcher (watcher:ProcessWatcher) -> threading.Thread:
+    thread = threading.Thread(target=watcher.run, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_publishes_start_and_stop (dummy):
+    events = EventBus()
+    watcher = ProcessWatcher(Log(debug=False), events, 'fo-dummy-game', scan_interval=0.05)
+    thread = startWatcher(watcher)
+    process = subprocess.Popen([dummy, '30'])
+    try:
+        assert expect(events, Event.PROCESS_STARTED).data == process.pid
+        assert watcher.active
+    finally:
+        process.kill()
+        process.wait()
+    expect(events, Event.PROCESS_STOPPED)
+    assert not watcher.active
+    watcher.stop()
+    thread.join(5)
+    assert not thread.is_alive()
+
+
+def test_can_restart_after_stop (dummy):
+    events = EventBus()
+    watcher = ProcessWatcher(Log(debug=False), events, 'fo-dummy-game', scan_interval=0.05)
+    process = subprocess.Popen([dummy, '30'])
+    try:
+        for _ in range(2):
+            thread = startWatcher(watcher)
+            expect(events, Event.PROCESS_STARTED)
+            thread.join(0.3)
+            assert thread.is_alive()
+            # Con el juego abierto está bloqueado esperando su salida; stop lo despierta
+            watcher.stop()
+            thread.join(5)
+            assert not thread.is_alive()
+            assert watcher._wakeup_r is None
+    finally:
+        process.kill()
+        process.wait()
+    assert events.get(timeout=0.2) is None
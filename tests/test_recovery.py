@@ -0,0 +1,72 @@
+import time
+
+from factorionline.logger import Log
+from factorionline.events import Event, EventBus
+from factorionline.recovery import RetryPolicy, CircuitBreaker, RecoveryManager
+
+ERROR = {'id': 'test_error'}
+FAST = RetryPolicy(max_attempts=5, base_delay=0.01, factor=2, max_delay=0.05, deadline=5)
+
+
+def test_policy_delay_is_capped ():
+    policy = RetryPolicy(base_delay=1, factor=2, max_delay=5)
+    assert [policy.delay(attempt) for attempt in range(5)] == [1, 2, 4, 5, 5]
+
+
+def test_breaker_opens_and_half_opens ():
+    breaker = CircuitBreaker('test', failure_threshold=2, reset_timeout=0.1)
+    breaker.failure()
+    assert breaker.allow()
+    breaker.failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    time.sleep(0.15)
+    # Una sola llamada de prueba; si falla se vuelve a abrir
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    time.sleep(0.15)
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+
+
+def test_recovery_retries_until_fixed ():
+    events = EventBus()
+    recovery = RecoveryManager(Log(debug=False), events)
+    attempts = []
+
+    def repair ():
+        attempts.append(time.monotonic())
+        if len(attempts) == 2:
+            raise RuntimeError('flaky')
+        return len(attempts) == 3
+
+    recovery.register(ERROR, repair, FAST)
+    assert recovery.recover(ERROR)
+    event = events.get(timeout=5)
+    assert event.id == Event.ERROR_FIXED and event.data == ERROR
+    assert len(attempts) == 3
+
+
+def test_recovery_gives_up_after_max_attempts ():
+    events = EventBus()
+    recovery = RecoveryManager(Log(debug=False), events)
+    attempts = []
+    recovery.register(ERROR, lambda: attempts.append(1) or False, FAST)
+    recovery.recover(ERROR)
+    assert events.get(timeout=5).id == Event.RECOVERY_FAILED
+    assert len(attempts) == FAST.max_attempts
+
+
+def test_recover_unknown_error_and_cancel ():
+    events = EventBus()
+    recovery = RecoveryManager(Log(debug=False), events)
+    assert not recovery.recover({'id': 'unknown'})
+    recovery.register(ERROR, lambda: False, RetryPolicy(max_attempts=100, base_delay=10, deadline=1000))
+    recovery.recover(ERROR)
+    # Una segunda llamada no lanza otra reparación
+    assert recovery.recover(ERROR)
+    recovery.cancel(ERROR)
+    assert events.get(timeout=0.3) is None
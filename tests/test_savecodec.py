@@ -0,0 +1,78 @@
+import os
+import zlib
+import zipfile
+
+import pytest
+
+from factorionline import savecodec
+
+
+def makeSave (path:str, level_data:bytes, script:bytes=b'print("hi")') -> None:
+    """Un zip con la forma de una partida: `level.dat0` guardado como stream
+    zlib sin comprimir en el zip, el resto deflate, y una carpeta."""
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.comment = b'factorio save'
+        archive.writestr(zipfile.ZipInfo('world/', (2024, 1, 1, 0, 0, 0)), b'')
+        info = zipfile.ZipInfo('world/level.dat0', (2024, 1, 1, 0, 0, 0))
+        archive.writestr(info, zlib.compress(level_data, 9))
+        info = zipfile.ZipInfo('world/script.lua', (2024, 1, 1, 0, 0, 2))
+        info.compress_type = zipfile.ZIP_DEFLATED
+        archive.writestr(info, script)
+
+
+def entries (path:str) -> list:
+    with zipfile.ZipFile(path) as archive:
+        return [(info.filename, info.compress_type, info.date_time, archive.read(info)) for info in archive.infolist()] + [archive.comment]
+
+
+LEVEL = bytes(range(256)) * 400
+
+
+def test_unpack_pack_round_trip (tmp_path):
+    save, unpacked, rebuilt = str(tmp_path / 'a.zip'), str(tmp_path / 'a.zip.unpacked'), str(tmp_path / 'b.zip')
+    makeSave(save, LEVEL)
+    touched = savecodec.unpackSave(save, unpacked)
+    assert sorted(touched) == ['manifest.json', 'world/level.dat0', 'world/script.lua']
+    # Sin comprimir, para que git haga deltas
+    with open(os.path.join(unpacked, 'world', 'level.dat0'), 'rb') as file:
+        assert file.read() == LEVEL
+    savecodec.packSave(unpacked, rebuilt)
+    assert entries(rebuilt) == entries(save)
+
+
+def test_unpack_only_rewrites_changed_entries (tmp_path):
+    save, unpacked = str(tmp_path / 'a.zip'), str(tmp_path / 'a.zip.unpacked')
+    makeSave(save, LEVEL)
+    savecodec.unpackSave(save, unpacked)
+    makeSave(save, LEVEL, b'print("changed")')
+    assert savecodec.unpackSave(save, unpacked) == ['world/script.lua']
+    assert savecodec.unpackSave(save, unpacked) == []
+
+
+def test_unsafe_entry_names_are_rejected (tmp_path):
+    save = str(tmp_path / 'evil.zip')
+    with zipfile.ZipFile(save, 'w') as archive:
+        archive.writestr('../outside.txt', b'x')
+    with pytest.raises(ValueError):
+        savecodec.unpackSave(save, str(tmp_path / 'evil.zip.unpacked'))
+    assert not os.path.exists(tmp_path / 'outside.txt')
+
+
+def test_collect_and_publish (tmp_path):
+    saves, repo, restored = str(tmp_path / 'saves'), str(tmp_path / 'repo'), str(tmp_path / 'restored')
+    os.makedirs(saves)
+    makeSave(os.path.join(saves, 'world.zip'), LEVEL)
+    with open(os.path.join(saves, 'notes.txt'), 'wb') as file:
+        file.write(b'notes')
+    touched = savecodec.collect(saves, repo, ['world.zip', 'notes.txt'], [])
+    assert 'notes.txt' in touched and os.path.join('world.zip.unpacked', 'manifest.json') in touched
+    stats = savecodec.publish(repo, restored)
+    assert (stats.packed, stats.copied) == (1, 1)
+    assert entries(os.path.join(restored, 'world.zip')) == entries(os.path.join(saves, 'world.zip'))
+    # Sin cambios no se rehace nada
+    assert savecodec.publish(repo, restored).unchanged == 2
+
+    touched = savecodec.collect(saves, repo, [], ['world.zip'])
+    assert os.path.join('world.zip.unpacked', 'manifest.json') in touched
+    assert savecodec.publish(repo, restored).deleted == 1
+    assert os.listdir(restored) == ['notes.txt']
@@ -0,0 +1,86 @@
+import os
+import time
+import zipfile
+
+from dataclasses import dataclass
+
+import pytest
+
+from factorionline.savedetector import SaveDetector
+
+
+@dataclass
+class FileEvent:
+    """Lo que usa `SaveDetector.dispatch` de un evento de watchdog."""
+    event_type:str
+    src_path:str
+    dest_path:str = ''
+    is_directory:bool = False
+
+
+def writeZip (path:str, size:int=1000) -> None:
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('level.dat', os.urandom(size))
+
+
+@pytest.fixture
+def detector ():
+    detector = SaveDetector(quiet_period=0.2)
+    detector.activate()
+    yield detector
+    detector.stop()
+
+
+def test_burst_is_delivered_once (detector, tmp_path):
+    world, other = str(tmp_path / 'world.zip'), str(tmp_path / 'other.zip')
+    start = time.monotonic()
+    for index in range(5):
+        writeZip(world, 1000 + index)
+        detector.dispatch(FileEvent('modified', world))
+        time.sleep(0.05)
+    writeZip(other)
+    detector.dispatch(FileEvent('created', other))
+    assert detector.wait(timeout=5) == sorted([other, world])
+    # No antes de un periodo de silencio tras el último evento
+    assert time.monotonic() - start >= 0.25 + detector.quiet_period
+    assert detector.wait(timeout=0.5) is None
+
+
+def test_temp_files_and_renames (detector, tmp_path):
+    temp, world = str(tmp_path / 'world.zip.tmp'), str(tmp_path / 'world.zip')
+    writeZip(temp)
+    detector.dispatch(FileEvent('created', temp))
+    os.replace(temp, world)
+    detector.dispatch(FileEvent('moved', temp, world))
+    assert detector.wait(timeout=5) == [world]
+
+
+def test_deleted_save_is_reported (detector, tmp_path):
+    world = str(tmp_path / 'world.zip')
+    detector.dispatch(FileEvent('deleted', world))
+    assert detector.wait(timeout=5) == [world]
+
+
+def test_corrupted_zip_is_dropped (tmp_path):
+    detector = SaveDetector(quiet_period=0.05)
+    detector.max_verify_attempts = 2
+    detector.activate()
+    try:
+        broken, world = str(tmp_path / 'broken.zip'), str(tmp_path / 'world.zip')
+        with open(broken, 'wb') as file:
+            file.write(b'not a zip')
+        writeZip(world)
+        detector.dispatch(FileEvent('modified', broken))
+        detector.dispatch(FileEvent('modified', world))
+        assert detector.wait(timeout=5) == [world]
+    finally:
+        detector.stop()
+
+
+def test_events_while_inactive_are_ignored (detector, tmp_path):
+    world = str(tmp_path / 'world.zip')
+    writeZip(world)
+    detector.deactivate()
+    detector.dispatch(FileEvent('modified', world))
+    detector.dispatch(FileEvent('modified', str(tmp_path), is_directory=True))
+    assert detector.wait(timeout=0.5) is None
@@ -0,0 +1,67 @@
+import os
+import shutil
+
+import pytest
+
+from factorionline import conformance
+from factorionline.storage import DirectoryBackend, StorageTransport, StorageError
+
+
+@pytest.mark.parametrize('backend', list(conformance.BACKENDS))
+def test_conformance (backend):
+    if backend == 'git' and not shutil.which('git'):
+        pytest.skip('git is not installed')
+    failures = [f'{check}: {error}' for check, error in conformance.run(conformance.BACKENDS[backend]) if error]
+    assert not failures
+
+
+def writeFiles (root, files:dict) -> None:
+    for relpath, data in files.items():
+        path = os.path.join(root, relpath)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(data)
+
+
+def read (root, relpath:str) -> bytes:
+    with open(os.path.join(root, relpath), 'rb') as file:
+        return file.read()
+
+
+@pytest.fixture
+def clients (tmp_path):
+    """Dos clientes con su carpeta y su estado, sincronizando con el mismo backend."""
+    backend = DirectoryBackend(str(tmp_path / 'remote'))
+    return [StorageTransport(str(tmp_path / client), backend, str(tmp_path / f'{client}.json'))
+            for client in ('a', 'b')]
+
+
+def test_pull_keeps_unpushed_saves (clients):
+    a, b = clients
+    writeFiles(a.local_root, {'world.zip': b'v1', 'old.zip': b'old'})
+    a.push()
+    b.pull()
+    writeFiles(b.local_root, {'mine.zip': b'only here', 'world.zip': b'saved here'})
+    writeFiles(a.local_root, {'world.zip': b'v2'})
+    os.remove(os.path.join(a.local_root, 'old.zip'))
+    a.push()
+    b.pull()
+    assert read(b.local_root, 'mine.zip') == b'only here'
+    assert read(b.local_root, 'world.zip') == b'saved here'
+    assert not os.path.exists(os.path.join(b.local_root, 'old.zip'))
+    assert b.last_report.conflicts == ['mine.zip', 'world.zip']
+    # Lo que se conservó se sube en el siguiente push, sobre la versión de `a`
+    assert b.push()
+    a.pull()
+    assert read(a.local_root, 'mine.zip') == b'only here'
+    assert read(a.local_root, 'world.zip') == b'saved here'
+
+
+def test_push_over_a_moved_head_fails (clients):
+    a, b = clients
+    writeFiles(a.local_root, {'world.zip': b'v1'})
+    a.push()
+    writeFiles(b.local_root, {'world.zip': b'other'})
+    with pytest.raises(StorageError):
+        b.push()
+    assert a.backend.head() == a.base
@@ -0,0 +1,139 @@
+import os
+import random
+
+import pytest
+
+from factorionline.transport import delta, patch, signature, listFiles, DirectoryRemote, DeltaTransport
+
+
+def randomBytes (size:int, seed:int=0) -> bytes:
+    return random.Random(seed).randbytes(size)
+
+
+BASIS = randomBytes(200 * 1024)
+
+
+@pytest.mark.parametrize('data', [
+    BASIS,
+    BASIS[:50000] + b'inserted' + BASIS[50000:],
+    BASIS[:1000] + randomBytes(3000, 1) + BASIS[4000:],
+    BASIS[:100000],
+    randomBytes(777, 2) + BASIS + randomBytes(777, 3),
+], ids=['same', 'insert', 'overwrite', 'truncate', 'shifted'])
+def test_delta_patch_round_trip (data):
+    result = delta(data, signature(BASIS))
+    assert result is not None
+    assert len(result) < len(data) // 2
+    assert patch(BASIS, result) == data
+
+
+def test_delta_gives_up_on_rewritten_data ():
+    assert delta(randomBytes(len(BASIS), 4), signature(BASIS)) is None
+
+
+def test_patch_rejects_corrupted_delta ():
+    result = bytearray(delta(BASIS, signature(BASIS)))
+    result[4:5] = b'X'
+    with pytest.raises(ValueError):
+        patch(BASIS, bytes(result))
+
+
+def writeFiles (root, files:dict) -> None:
+    for relpath, data in files.items():
+        path = os.path.join(root, relpath)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(data)
+
+
+def read (root, relpath:str) -> bytes:
+    with open(os.path.join(root, relpath), 'rb') as file:
+        return file.read()
+
+
+@pytest.fixture
+def clients (tmp_path):
+    """Dos clientes con su carpeta y su estado, sincronizando con el mismo remoto."""
+    remote = DirectoryRemote(str(tmp_path / 'remote'))
+    return [DeltaTransport(str(tmp_path / client), remote, state_path=str(tmp_path / f'{client}.json'))
+            for client in ('a', 'b')]
+
+
+def test_pull_applies_remote_changes (clients):
+    a, b = clients
+    writeFiles(a.local_root, {'world.zip': BASIS, 'sub/level.dat': b'level'})
+    a.push()
+    b.pull()
+    assert listFiles(b.local_root) == listFiles(a.local_root)
+    writeFiles(a.local_root, {'world.zip': BASIS[:1000] + b'new' + BASIS[1000:]})
+    os.remove(os.path.join(a.local_root, 'sub', 'level.dat'))
+    a.push()
+    b.pull()
+    assert listFiles(b.local_root) == listFiles(a.local_root)
+    assert b.last_report.deleted == 1
+    assert b.last_report.transferred < len(BASIS) // 2
+
+
+def test_pull_keeps_local_only_files (clients):
+    a, b = clients
+    writeFiles(a.local_root, {'world.zip': BASIS, 'old.zip': b'old'})
+    a.push()
+    b.pull()
+    writeFiles(b.local_root, {'mine.zip': b'only here', 'world.zip': b'saved here'})
+    writeFiles(a.local_root, {'world.zip': BASIS + b'more'})
+    os.remove(os.path.join(a.local_root, 'old.zip'))
+    a.push()
+    b.pull()
+    # Lo nuevo y lo modificado sin subir sobreviven; lo que no cambió se borra
+    assert read(b.local_root, 'mine.zip') == b'only here'
+    assert read(b.local_root, 'world.zip') == b'saved here'
+    assert not os.path.exists(os.path.join(b.local_root, 'old.zip'))
+    assert sorted(b.last_report.conflicts) == ['mine.zip', 'world.zip']
+
+
+def test_push_does_not_delete_files_never_pulled (clients):
+    a, b = clients
+    writeFiles(a.local_root, {'world.zip': BASIS})
+    a.push()
+    writeFiles(b.local_root, {'mine.zip': b'only here'})
+    b.push()
+    assert set(b.remote.list()) == {'world.zip', 'mine.zip'}
+
+
+def test_synced_state_survives_restart (clients):
+    a, _ = clients
+    writeFiles(a.local_root, {'world.zip': BASIS})
+    a.push()
+    restarted = DeltaTransport(a.local_root, a.remote, state_path=a.state_path)
+    assert restarted.synced == listFiles(a.local_root)
+
+
+def test_push_does_not_revert_newer_remote_saves (clients):
+    a, b = clients
+    writeFiles(a.local_root, {'world.zip': b'v1'})
+    a.push()
+    b.pull()
+    writeFiles(b.local_root, {'world.zip': b'v2'})
+    b.push()
+    writeFiles(a.local_root, {'other.zip': b'unrelated'})
+    a.push()
+    assert a.last_report.changed == ['other.zip']
+    assert a.remote.list() == listFiles(b.local_root) | {'other.zip': listFiles(a.local_root)['other.zip']}
+    a.pull()
+    assert read(a.local_root, 'world.zip') == b'v2'
+
+
+def test_push_refuses_when_both_sides_changed (clients):
+    a, b = clients
+    writeFiles(a.local_root, {'world.zip': b'v1', 'old.zip': b'old'})
+    a.push()
+    b.pull()
+    writeFiles(b.local_root, {'world.zip': b'v2', 'old.zip': b'changed'})
+    b.push()
+    remote = a.remote.list()
+    writeFiles(a.local_root, {'world.zip': b'mine'})
+    os.remove(os.path.join(a.local_root, 'old.zip'))
+    with pytest.raises(ValueError):
+        a.push()
+    assert a.last_report.conflicts == ['old.zip', 'world.zip']
+    assert a.remote.list() == remote